@@ -0,0 +1,76 @@
+"""图片卡片渲染基准：冷渲染与缓存命中的耗时对比"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from core.services.card_renderer import CardRenderer
+
+from .common import summarize
+
+
+def _profile_text(i: int) -> str:
+    return (
+        "=== 修仙档案 ===\n"
+        f"道号：道友{i}\n"
+        "境界：筑基初期\n"
+        f"修为：{1000 + i}\n"
+        "灵根：天灵根\n"
+        "宗门：青云门\n"
+        f"总闭关次数：{i % 50}\n"
+        f"总斗法次数：{i % 30} (胜 {i % 17})\n"
+    )
+
+
+def _ranking_text(i: int) -> str:
+    lines = ["=== 修为排行榜 ==="]
+    for rank in range(1, 11):
+        lines.append(f"第{rank}名：道友{i + rank} (筑基初期) - {100000 - rank * 100 - i} 修为")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200, help="每种卡片的渲染次数")
+    parser.add_argument("--font", default="", help="中文字体文件路径，留空时自动查找")
+    parser.add_argument("--cache-mb", type=float, default=50, help="卡片磁盘缓存上限（MB）")
+    args = parser.parse_args()
+
+    config = {"re_xiuxian": {"card_font_path": args.font, "card_cache_max_mb": args.cache_mb}}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        renderer = CardRenderer(cache_dir, config)
+        if not renderer.available:
+            print(json.dumps({"error": "Pillow 或中文字体不可用，请通过 --font 指定字体"}, ensure_ascii=False))
+            return
+
+        results = {"font": renderer.font_path, "iterations": args.iterations}
+        for name, make_text in (("profile", _profile_text), ("ranking", _ranking_text)):
+            keys = [f"{name}:{i}" for i in range(args.iterations)]
+
+            cold = []
+            for i, key in enumerate(keys):
+                start = time.perf_counter()
+                renderer.render(key, make_text(i))
+                cold.append(time.perf_counter() - start)
+
+            # 缓存命中：与处理器一致，先按键查找已生成的卡片
+            warm = []
+            for key in keys:
+                start = time.perf_counter()
+                renderer.lookup(key)
+                warm.append(time.perf_counter() - start)
+
+            results[name] = {"cold": summarize(cold), "warm": summarize(warm)}
+
+        sizes = [os.path.getsize(os.path.join(cache_dir, f)) for f in os.listdir(cache_dir)]
+        results["cache"] = {
+            "files": len(sizes),
+            "total_kb": round(sum(sizes) / 1024, 1),
+            "avg_kb": round(sum(sizes) / len(sizes) / 1024, 1) if sizes else 0,
+        }
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""领域模型内存基准：__slots__ 实体与普通 dataclass 的单个对象大小与缓存总内存"""
+import argparse
+import dataclasses
+import gc
+import json
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from core.domain.models import User, Item, UserItem, Sect, Log
+
+from .common import environment, write_results
+
+
+def unslotted(cls: type) -> type:
+    """按同样的字段生成带 __dict__ 的普通 dataclass，作为对照"""
+    specs = []
+    for f in dataclasses.fields(cls):
+        if f.default is not dataclasses.MISSING:
+            specs.append((f.name, f.type, dataclasses.field(default=f.default)))
+        elif f.default_factory is not dataclasses.MISSING:
+            specs.append((f.name, f.type, dataclasses.field(default_factory=f.default_factory)))
+        else:
+            specs.append((f.name, f.type))
+    return dataclasses.make_dataclass(f"Plain{cls.__name__}", specs)
+
+
+def _make_user(cls: type, i: int, now: datetime):
+    """与从数据库读出的用户相同的字段取值"""
+    return cls(
+        id=i, user_id=f"user_{i}", nickname=f"道友{i}", created_at=now, last_login_at=now,
+        cultivation=float(i * 7 % 100000), realm="筑基初期", talent="金木", dao_name=f"道号{i}",
+        sect_id=i % 6 + 1, sect_position="弟子", last_closing_time=now - timedelta(seconds=i),
+        total_closing_count=i % 500, total_battle_count=i % 200, total_battle_win_count=i % 90,
+        total_exp_gained=i * 3, unified_msg_origin=f"aiocqhttp:GroupMessage:{i % 100}", version=i % 10
+    )
+
+
+# 模型 -> 构造一个典型实例的函数
+SAMPLES: Dict[type, Callable[[type, int, datetime], object]] = {
+    User: _make_user,
+    Item: lambda cls, i, now: cls(id=i, name=f"丹药{i}", type="丹药", description="服用后增加修为",
+                                  effect="增加修为", effect_type="增益", effect_value=1.0, created_at=now),
+    UserItem: lambda cls, i, now: cls(id=i, user_id=f"user_{i}", item_id=i % 9 + 1, quantity=3, obtained_at=now),
+    Sect: lambda cls, i, now: cls(id=i, name=f"宗门{i}", description="名门正派", founder_id=f"user_{i}",
+                                  created_at=now, member_count=120, contribution=5000.0),
+    Log: lambda cls, i, now: cls(id=i, user_id=f"user_{i}", type="闭关", content="闭关修炼获得 120 点修为",
+                                 created_at=now),
+}
+
+
+def object_size(obj) -> int:
+    """对象自身占用的字节数，含实例 __dict__，不含字段值"""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def heap_usage(factory: Callable[[int], object], count: int) -> int:
+    """构造 count 个对象并常驻列表时增加的堆内存（含字段值）"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects: List[object] = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000, help="缓存的用户数")
+    parser.add_argument("--output", help="结果文件路径，默认保存到 benchmarks/results/")
+    args = parser.parse_args()
+
+    now = datetime.now()
+    objects = {}
+    for model, make in SAMPLES.items():
+        plain = unslotted(model)
+        slotted_size = object_size(make(model, 1, now))
+        plain_size = object_size(make(plain, 1, now))
+        objects[model.__name__] = {
+            "slots_bytes": slotted_size,
+            "dict_bytes": plain_size,
+            "saved_percent": round((1 - slotted_size / plain_size) * 100, 1),
+        }
+
+    plain_user = unslotted(User)
+    slotted_heap = heap_usage(lambda i: _make_user(User, i, now), args.users)
+    plain_heap = heap_usage(lambda i: _make_user(plain_user, i, now), args.users)
+    results = {
+        "environment": environment(),
+        "objects": objects,
+        "cached_users": {
+            "count": args.users,
+            "slots_mb": round(slotted_heap / 1024 / 1024, 2),
+            "dict_mb": round(plain_heap / 1024 / 1024, 2),
+            "slots_bytes_per_user": round(slotted_heap / args.users, 1),
+            "dict_bytes_per_user": round(plain_heap / args.users, 1),
+            "saved_percent": round((1 - slotted_heap / plain_heap) * 100, 1),
+        },
+    }
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"结果已保存: {write_results('memory', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""仓储与服务的微基准：在合成的大规模数据库上逐项计时"""
+import argparse
+import json
+import os
+import random
+
+from core.domain.models import User
+from core.repositories.sqlite_user_repo import SqliteUserRepository
+from core.repositories.sqlite_inventory_repo import SqliteInventoryRepository
+from core.repositories.sqlite_log_repo import SqliteLogRepository
+from core.repositories.sqlite_cooldown_repo import SqliteCooldownRepository
+from core.repositories.sqlite_stats_repo import SqliteStatsRepository
+from core.services.cooldown_service import CooldownService
+from core.services.arena_service import ArenaService
+from core.services.cultivation_service import CultivationService
+from core.services.stats_service import StatsService
+
+from .common import ROOT_DIR, compare, environment, measure, write_results
+from .synthetic_db import build_database, user_id_of
+
+DATA_DIR = os.path.join(ROOT_DIR, "benchmarks", "data")
+
+
+def run_benchmarks(db_path: str, users: int, iterations: int, seed: int) -> dict:
+    """逐项运行基准，返回 {基准名: 汇总}"""
+    rng = random.Random(seed)
+    # 斗法冷却设为0，同一批用户可以反复斗法
+    config = {"re_xiuxian": {"battle_cooldown": 0}}
+
+    user_repo = SqliteUserRepository(db_path)
+    inventory_repo = SqliteInventoryRepository(db_path)
+    log_repo = SqliteLogRepository(db_path)
+    cooldown_service = CooldownService(SqliteCooldownRepository(db_path), config)
+    stats_service = StatsService(SqliteStatsRepository(db_path), user_repo, config)
+    arena_service = ArenaService(user_repo, inventory_repo, log_repo, cooldown_service, config, stats_service)
+    cultivation_service = CultivationService(user_repo, inventory_repo, log_repo, cooldown_service, config, stats_service)
+
+    def random_user_id() -> str:
+        return user_id_of(rng.randrange(users))
+
+    # 写入类基准使用预先加载的用户，update_user 会同步更新其版本号
+    loaded = [user_repo.get_by_user_id(user_id_of(i)) for i in rng.sample(range(users), min(users, 100))]
+    profile: User = loaded[0]
+
+    def update_user(i: int):
+        user = loaded[i % len(loaded)]
+        user.cultivation += 1
+        user_repo.update_user(user)
+
+    def battle(i: int):
+        attacker = loaded[i % len(loaded)]
+        attacker.is_hermit = False
+        arena_service.battle(attacker, random_user_id())
+
+    benches = {
+        "user_repo.get_by_user_id": lambda i: user_repo.get_by_user_id(random_user_id()),
+        "user_repo.update_user": update_user,
+        "user_repo.get_cultivation_ranking": lambda i: user_repo.get_cultivation_ranking(10),
+        "inventory_repo.get_user_inventory": lambda i: inventory_repo.get_user_inventory(random_user_id()),
+        "log_repo.add_log": lambda i: log_repo.add_log(random_user_id(), "基准", f"第{i}次写入"),
+        "arena_service.battle": battle,
+        "cultivation_service._calculate_deep_exp_gain": lambda i: cultivation_service._calculate_deep_exp_gain(profile),
+    }
+
+    results = {}
+    for name, fn in benches.items():
+        results[name] = measure(fn, iterations)
+        print(f"{name}: p50 {results[name]['p50_ms']}ms p99 {results[name]['p99_ms']}ms "
+              f"({results[name]['ops_per_sec']} 次/秒)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10000, help="合成数据库的用户数，例如 10000 / 100000 / 1000000")
+    parser.add_argument("--db", help="数据库路径，默认为 benchmarks/data/bench_<用户数>.db，不存在时自动生成")
+    parser.add_argument("--rebuild", action="store_true", help="重新生成数据库（写入类基准会修改数据）")
+    parser.add_argument("--iterations", type=int, default=1000, help="每项基准的计时次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", help="结果文件路径，默认保存到 benchmarks/results/")
+    parser.add_argument("--baseline", help="用于比较的历史结果文件")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(DATA_DIR, f"bench_{args.users}.db")
+    build = None
+    if args.rebuild or not os.path.exists(db_path):
+        print(f"正在生成 {args.users} 名用户的数据库: {db_path}")
+        build = build_database(db_path, args.users, args.seed)
+        print(json.dumps(build, ensure_ascii=False))
+
+    benchmarks = run_benchmarks(db_path, args.users, args.iterations, args.seed)
+    results = {
+        "environment": environment(),
+        "users": args.users,
+        "iterations": args.iterations,
+        "build": build,
+        "benchmarks": benchmarks,
+    }
+    print(f"结果已保存: {write_results(f'suite_{args.users}', results, args.output)}")
+
+    if args.baseline:
+        print("\n".join(compare(benchmarks, args.baseline)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""基准测试的公共工具：计时、汇总与结果文件"""
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# 插件根目录
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(ROOT_DIR, "core", "database", "migrations")
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """汇总耗时样本（秒），输出毫秒"""
+    total = sum(samples)
+    return {
+        "count": len(samples),
+        "ops_per_sec": round(len(samples) / total, 1) if total else 0.0,
+        "mean_ms": round(total / len(samples) * 1000, 4),
+        "p50_ms": round(percentile(samples, 0.5) * 1000, 4),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 4),
+        "max_ms": round(max(samples) * 1000, 4),
+    }
+
+
+def measure(fn: Callable[[int], object], iterations: int, warmup: int = 10) -> Dict[str, float]:
+    """逐次计时执行 fn(i)，先预热若干次"""
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def environment() -> Dict[str, Optional[str]]:
+    """记录运行环境，便于比较不同次的结果"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def write_results(name: str, results: dict, output: Optional[str] = None) -> str:
+    """写入结果文件，默认保存到 benchmarks/results/<名称>_<时间>.json"""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return output
+
+
+def compare(results: Dict[str, dict], baseline_path: str, tolerance: float = 0.1) -> List[str]:
+    """与基线结果比较 p50，超出容差的标记为退化"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f).get("benchmarks", {})
+    lines = []
+    for name, summary in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("p50_ms"):
+            lines.append(f"{name}: p50 {summary['p50_ms']}ms (基线中无此项)")
+            continue
+        change = summary["p50_ms"] / base["p50_ms"] - 1
+        flag = " ← 退化" if change > tolerance else ""
+        lines.append(f"{name}: p50 {summary['p50_ms']}ms，基线 {base['p50_ms']}ms ({change:+.1%}){flag}")
+    return lines
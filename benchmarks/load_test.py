@@ -0,0 +1,259 @@
+"""端到端压测：用模拟的 AstrBot 上下文与消息事件驱动插件，统计吞吐、延迟与事件循环卡顿"""
+import argparse
+import asyncio
+import importlib
+import random
+import shutil
+import sys
+import tempfile
+import time
+import types
+from typing import Dict, List, Optional, Tuple
+
+from astrbot.api.message_components import At, Plain
+from astrbot.api.star import StarTools
+
+from .common import ROOT_DIR, environment, percentile, summarize, write_results
+
+# 以独立的包名加载插件，插件内的相对导入才能生效
+PLUGIN_PACKAGE = "xiuxian_load_test"
+
+# 指令 -> (插件方法名, 是否@一名其他修士)
+COMMANDS: Dict[str, Tuple[str, bool]] = {
+    "检测灵根": ("detect_talent", False),
+    "我的灵根": ("my_talent", False),
+    "闭关修炼": ("closed_door_cultivation", False),
+    "斗法": ("battle", True),
+    "储物袋": ("inventory", False),
+    "修为榜": ("cultivation_ranking", False),
+}
+DEFAULT_MIX = "检测灵根=1,闭关修炼=3,斗法=2,储物袋=3,修为榜=2"
+
+
+class FakeContext:
+    """模拟的插件上下文，主动消息只计数不发送"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, unified_msg_origin, chain) -> bool:
+        self.sent += 1
+        return True
+
+
+class FakeResult:
+    """模拟的消息结果"""
+    __slots__ = ("text", "image")
+
+    def __init__(self, text: Optional[str] = None, image: Optional[str] = None):
+        self.text = text
+        self.image = image
+
+
+class FakeEvent:
+    """模拟的群消息事件，实现插件用到的 AstrMessageEvent 接口"""
+
+    def __init__(self, text: str, sender_id: str, sender_name: str, group_id: str,
+                 mentions: Tuple[str, ...] = ()):
+        self.message_str = text
+        self.unified_msg_origin = f"load_test:GroupMessage:{group_id}"
+        self._sender_id = sender_id
+        self._sender_name = sender_name
+        self._group_id = group_id
+        self._messages = [Plain(text=text)] + [At(qq=user_id) for user_id in mentions]
+        self._extras = {}
+
+    def get_sender_id(self) -> str:
+        return self._sender_id
+
+    def get_sender_name(self) -> str:
+        return self._sender_name
+
+    def get_group_id(self) -> str:
+        return self._group_id
+
+    def get_self_id(self) -> str:
+        return "load_test_bot"
+
+    def get_messages(self) -> list:
+        return self._messages
+
+    def plain_result(self, text: str) -> FakeResult:
+        return FakeResult(text=text)
+
+    def image_result(self, path: str) -> FakeResult:
+        return FakeResult(image=path)
+
+    def set_extra(self, key, value):
+        self._extras[key] = value
+
+    def get_extra(self, key=None, default=None):
+        return self._extras.get(key, default)
+
+
+def parse_mix(mix: str) -> List[Tuple[str, float]]:
+    """解析指令比例，例如 "斗法=2,储物袋=3" """
+    weights = []
+    for part in mix.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in COMMANDS:
+            raise SystemExit(f"不支持的指令: {name}，可选: {'/'.join(COMMANDS)}")
+        weights.append((name, float(weight or 1)))
+    return weights
+
+
+def load_plugin_class(data_dir: str):
+    """加载插件主模块，数据目录指向临时目录"""
+    # 替换框架的数据目录，压测数据不写入真实的 AstrBot 数据目录
+    StarTools.get_data_dir = lambda *args, **kwargs: data_dir
+    package = types.ModuleType(PLUGIN_PACKAGE)
+    package.__path__ = [ROOT_DIR]
+    sys.modules[PLUGIN_PACKAGE] = package
+    return importlib.import_module(f"{PLUGIN_PACKAGE}.main").XiuxianPlugin
+
+
+async def _consume(plugin, command: str, event: FakeEvent) -> int:
+    """执行一条指令，返回回复条数"""
+    count = 0
+    async for _ in getattr(plugin, COMMANDS[command][0])(event):
+        count += 1
+    return count
+
+
+async def _monitor_loop(interval: float, lags: List[float], stop: asyncio.Event):
+    """定时唤醒并记录实际唤醒时间比预期晚了多久，即事件循环卡顿"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run_load(args) -> dict:
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+
+    settings = {"rate_limit_user_burst": 0, "rate_limit_group_burst": 0}
+    if args.rate_limit:
+        settings = {}
+    if args.no_cooldowns:
+        settings.update({"closed_door_cooldown": 0, "battle_cooldown": 0})
+    # AstrBotConfig 即插件配置字典
+    config = {"re_xiuxian": settings}
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="xiuxian_load_")
+    plugin_class = load_plugin_class(data_dir)
+    context = FakeContext()
+    plugin = plugin_class(context, config)
+    await plugin.initialize()
+
+    users = [(f"load_{i}", f"压测修士{i}", f"group_{i % args.groups}") for i in range(args.users)]
+
+    def make_event(command: str, user: Tuple[str, str, str]) -> FakeEvent:
+        mentions = ()
+        if COMMANDS[command][1]:
+            mentions = (rng.choice(users)[0],)
+        return FakeEvent(command, user[0], user[1], user[2], mentions)
+
+    # 预热：所有虚拟用户先检测灵根，检测偶尔失败时重试
+    if not args.no_warmup:
+        for user in users:
+            for _ in range(5):
+                replies = []
+                async for result in plugin.detect_talent(make_event("检测灵根", user)):
+                    replies.append(result.text)
+                if replies and "失败" not in replies[0]:
+                    break
+
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    lags: List[float] = []
+    stop = asyncio.Event()
+    deadline = time.perf_counter() + args.duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            command = rng.choices(names, weights)[0]
+            event = make_event(command, rng.choice(users))
+            start = time.perf_counter()
+            try:
+                await _consume(plugin, command, event)
+            except Exception:
+                errors[command] += 1
+            latencies[command].append(time.perf_counter() - start)
+            # 模拟用户的思考时间，同时让出事件循环
+            await asyncio.sleep(rng.uniform(0, args.think_time) if args.think_time else 0)
+
+    monitor = asyncio.create_task(_monitor_loop(args.monitor_interval, lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    await plugin.terminate()
+    if not args.data_dir:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    all_samples = [sample for samples in latencies.values() for sample in samples]
+    total = len(all_samples)
+    return {
+        "environment": environment(),
+        "settings": {
+            "users": args.users, "groups": args.groups, "concurrency": args.concurrency,
+            "duration": args.duration, "think_time": args.think_time, "mix": args.mix,
+            "rate_limit": args.rate_limit, "no_cooldowns": args.no_cooldowns,
+        },
+        "throughput_per_sec": round(total / elapsed, 1),
+        "requests": total,
+        "errors": sum(errors.values()),
+        "latency": summarize(all_samples) if all_samples else None,
+        "commands": {
+            name: dict(summarize(samples), errors=errors[name])
+            for name, samples in latencies.items() if samples
+        },
+        "event_loop": {
+            "samples": len(lags),
+            "lag_p50_ms": round(percentile(lags, 0.5) * 1000, 3) if lags else 0.0,
+            "lag_p99_ms": round(percentile(lags, 0.99) * 1000, 3) if lags else 0.0,
+            "lag_max_ms": round(max(lags) * 1000, 3) if lags else 0.0,
+            # 事件循环无法及时响应的总时长占压测时长的比例
+            "stall_ratio": round(sum(lags) / elapsed, 4),
+        },
+        "proactive_messages": context.sent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000, help="虚拟用户数")
+    parser.add_argument("--groups", type=int, default=20, help="虚拟群数")
+    parser.add_argument("--concurrency", type=int, default=50, help="同时发送指令的并发数")
+    parser.add_argument("--duration", type=float, default=30, help="压测时长（秒）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"指令比例，默认 {DEFAULT_MIX}")
+    parser.add_argument("--think-time", type=float, default=0.0, help="每个并发两次指令之间的最长随机间隔（秒）")
+    parser.add_argument("--monitor-interval", type=float, default=0.01, help="事件循环卡顿的采样间隔（秒）")
+    parser.add_argument("--rate-limit", action="store_true", help="保留默认的指令限流")
+    parser.add_argument("--no-cooldowns", action="store_true", help="关闭闭关与斗法冷却，更多指令走完整写入路径")
+    parser.add_argument("--no-warmup", action="store_true", help="跳过压测前的批量检测灵根")
+    parser.add_argument("--data-dir", help="插件数据目录，默认使用临时目录并在结束后删除")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", help="结果文件路径，默认保存到 benchmarks/results/")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load(args))
+    latency = results["latency"] or {}
+    loop_stats = results["event_loop"]
+    print(f"吞吐 {results['throughput_per_sec']} 条/秒，共 {results['requests']} 条，出错 {results['errors']} 条")
+    print(f"延迟 p50 {latency.get('p50_ms')}ms p99 {latency.get('p99_ms')}ms 最大 {latency.get('max_ms')}ms")
+    for name, summary in results["commands"].items():
+        print(f"  {name}: {summary['count']} 条 p50 {summary['p50_ms']}ms p99 {summary['p99_ms']}ms")
+    print(f"事件循环卡顿 p99 {loop_stats['lag_p99_ms']}ms 最大 {loop_stats['lag_max_ms']}ms "
+          f"卡顿占比 {loop_stats['stall_ratio']:.1%}")
+    print(f"结果已保存: {write_results('load', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
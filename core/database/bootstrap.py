@@ -0,0 +1,80 @@
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, List
+from astrbot.api import logger
+from .connection import Transaction, get_connection
+from .migration import apply_migrations, discover_migrations
+
+
+class BootstrapReport:
+    """数据库启动过程的耗时"""
+
+    def __init__(self):
+        self.fast_path = False
+        self.applied: List[str] = []
+        # 阶段 -> 耗时（秒）
+        self.phases: Dict[str, float] = {}
+
+    def format(self) -> str:
+        parts = [f"{name}{seconds * 1000:.1f}ms" for name, seconds in self.phases.items()]
+        mode = "已是最新，跳过迁移与初始数据" if self.fast_path else f"应用迁移{len(self.applied)}个"
+        return f"{mode}（{' '.join(parts)}）"
+
+
+def bootstrap_database(db_path: str, migrations_path: str, seed_version: str,
+                       setup: Callable[[Transaction], None]) -> BootstrapReport:
+    """启动时准备数据库：指纹未变时跳过，否则应用迁移并执行 setup 写入初始数据"""
+    report = BootstrapReport()
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+    started = time.perf_counter()
+    conn = get_connection(db_path)
+    try:
+        report.phases["连接"] = time.perf_counter() - started
+
+        step = time.perf_counter()
+        # 迁移文件的校验和计入指纹，已应用的迁移被修改时不会走快速路径，由迁移校验报错
+        migrations = [f"{m.name}:{m.checksum}" for m in discover_migrations(migrations_path)]
+        fingerprint = hashlib.sha1("\n".join(migrations + [seed_version]).encode("utf-8")).hexdigest()
+        report.fast_path = _read_fingerprint(conn) == fingerprint
+        report.phases["检查"] = time.perf_counter() - step
+        if report.fast_path:
+            return report
+
+        step = time.perf_counter()
+        report.applied = apply_migrations(conn, migrations_path)
+        report.phases["迁移"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        tx = Transaction(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            setup(tx)
+            conn.execute('''
+                INSERT OR REPLACE INTO bootstrap_state (key, value, updated_at)
+                VALUES ('fingerprint', ?, CURRENT_TIMESTAMP)
+            ''', (fingerprint,))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        for callback in tx._after_commit:
+            callback()
+        report.phases["初始数据"] = time.perf_counter() - step
+    finally:
+        conn.close()
+        report.phases["总计"] = time.perf_counter() - started
+
+    logger.info(f"数据库启动完成: {report.format()}")
+    return report
+
+
+def _read_fingerprint(conn: sqlite3.Connection) -> str:
+    """读取上次启动记录的指纹，新数据库尚无记录表时返回空字符串"""
+    try:
+        row = conn.execute("SELECT value FROM bootstrap_state WHERE key = 'fingerprint'").fetchone()
+    except sqlite3.OperationalError:
+        return ""
+    return row[0] if row else ""
@@ -0,0 +1,50 @@
+import sqlite3
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+from .profiling import ProfiledConnection
+
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """获取数据库连接并配置WAL模式"""
+    conn = sqlite3.connect(db_path, factory=ProfiledConnection)
+    conn.execute("PRAGMA journal_mode=WAL;")  # 启用WAL模式
+    conn.execute("PRAGMA synchronous=NORMAL;")  # 平衡性能和数据安全
+    conn.execute("PRAGMA cache_size=10000;")  # 增加缓存大小
+    conn.execute("PRAGMA temp_store=MEMORY;")  # 在内存中存储临时数据
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class Transaction:
+    """跨仓储的数据库事务，作为 tx 参数传给仓储的写方法"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self._after_commit: List[Callable[[], None]] = []
+
+    def cursor(self) -> sqlite3.Cursor:
+        return self.conn.cursor()
+
+    def after_commit(self, callback: Callable[[], None]):
+        """注册事务提交后执行的回调"""
+        self._after_commit.append(callback)
+
+
+@contextmanager
+def transaction(db_path: str) -> Iterator[Transaction]:
+    """开启事务，正常退出时提交，出现异常时回滚"""
+    conn = get_connection(db_path)
+    tx = Transaction(conn)
+    try:
+        # 立即获取写锁，避免事务中途升级锁时与其他写入者冲突
+        conn.execute("BEGIN IMMEDIATE")
+        yield tx
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    for callback in tx._after_commit:
+        callback()
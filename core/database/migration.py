@@ -1,26 +1,90 @@
+import hashlib
+import importlib.util
+import re
 import sqlite3
 import os
-from typing import List
+import time
+from typing import List, Optional
 from astrbot.api import logger
+from .connection import get_connection
 
 
-def run_migrations(db_path: str, migrations_path: str):
-    """运行数据库迁移脚本"""
-    # 确保数据库目录存在
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    
-    # 连接数据库
-    conn = sqlite3.connect(db_path)
-    
-    # 配置WAL模式和其他性能优化
-    conn.execute("PRAGMA journal_mode=WAL;")  # 启用WAL模式提高并发性能
-    conn.execute("PRAGMA synchronous=NORMAL;")  # 平衡性能和数据安全
-    conn.execute("PRAGMA cache_size=10000;")  # 增加缓存大小
-    conn.execute("PRAGMA temp_store=MEMORY;")  # 在内存中存储临时数据
-    
-    cursor = conn.cursor()
-    
-    # 创建 migrations 表来跟踪已应用的迁移
+class MigrationError(Exception):
+    """迁移失败，或已应用的迁移脚本被修改"""
+
+
+# 迁移文件名：三位版本号_说明.sql 或 .py
+_MIGRATION_FILE = re.compile(r"^(\d+)_.+\.(sql|py)$")
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+
+
+def split_statements(script: str) -> List[str]:
+    """把 SQL 脚本拆成单条语句，触发器等包含分号的语句保持完整"""
+    statements = []
+    buffer = ""
+    for piece in script.split(";"):
+        buffer += piece + ";"
+        if sqlite3.complete_statement(buffer):
+            if _COMMENT.sub("", buffer).strip(" \t\r\n;"):
+                statements.append(buffer.strip())
+            buffer = ""
+    if _COMMENT.sub("", buffer).strip(" \t\r\n;"):
+        raise MigrationError(f"语句不完整: {buffer.strip()[:100]}")
+    return statements
+
+
+class Migration:
+    """一个迁移脚本（.sql，或定义 upgrade / BACKFILL_TABLE 与 backfill 的 .py）"""
+
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, "rb") as f:
+            self.checksum = hashlib.sha256(f.read()).hexdigest()
+        self._module = None
+
+    @property
+    def module(self):
+        """.py 迁移对应的模块，首次使用时加载"""
+        if self._module is None and self.path.endswith(".py"):
+            spec = importlib.util.spec_from_file_location(f"xiuxian_migration_{self.version}", self.path)
+            self._module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self._module)
+        return self._module
+
+    @property
+    def backfill_table(self) -> Optional[str]:
+        return getattr(self.module, "BACKFILL_TABLE", None) if self.module else None
+
+    def upgrade(self, cursor: sqlite3.Cursor):
+        """执行结构变更（调用方负责事务）"""
+        if self.module is None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for statement in split_statements(f.read()):
+                    cursor.execute(statement)
+        elif hasattr(self.module, "upgrade"):
+            self.module.upgrade(cursor)
+
+
+def discover_migrations(migrations_path: str) -> List[Migration]:
+    """按版本号排序的迁移脚本"""
+    if not os.path.exists(migrations_path):
+        return []
+    migrations = []
+    for name in sorted(os.listdir(migrations_path)):
+        match = _MIGRATION_FILE.match(name)
+        path = os.path.join(migrations_path, name)
+        if match and os.path.isfile(path):
+            migrations.append(Migration(int(match.group(1)), name, path))
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise MigrationError(f"迁移版本号重复: {', '.join(m.name for m in migrations)}")
+    return migrations
+
+
+def _ensure_history_table(cursor: sqlite3.Cursor):
+    """迁移记录表，旧版本的记录表缺少校验和与数据迁移进度字段"""
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS migrations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -28,49 +92,164 @@ def run_migrations(db_path: str, migrations_path: str):
             applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
-    # 获取已应用的迁移
-    cursor.execute('SELECT name FROM migrations')
-    applied_migrations = {row[0] for row in cursor.fetchall()}
-    
-    # 获取所有迁移文件
+    cursor.execute("PRAGMA table_info(migrations)")
+    columns = {row[1] for row in cursor.fetchall()}
+    for column, definition in (("checksum", "TEXT"),
+                               ("backfill_position", "INTEGER DEFAULT 0"),
+                               ("backfill_done", "BOOLEAN DEFAULT TRUE")):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE migrations ADD COLUMN {column} {definition}")
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations_path: str) -> List[str]:
+    """在给定连接上逐个事务地应用尚未应用的迁移，返回本次应用的迁移"""
     if not os.path.exists(migrations_path):
         os.makedirs(migrations_path)
         logger.info(f"创建迁移目录: {migrations_path}")
-        return
-    
-    migration_files = sorted([
-        f for f in os.listdir(migrations_path) 
-        if f.endswith('.sql') and os.path.isfile(os.path.join(migrations_path, f))
-    ])
-    
-    # 应用未应用的迁移
-    for migration_file in migration_files:
-        migration_name = migration_file
-        if migration_name not in applied_migrations:
-            migration_path = os.path.join(migrations_path, migration_file)
+    migrations = discover_migrations(migrations_path)
+
+    cursor = conn.cursor()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _ensure_history_table(cursor)
+        cursor.execute("SELECT name, checksum FROM migrations")
+        recorded = {row[0]: row[1] for row in cursor.fetchall()}
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+
+        # 旧版本只在 migrations 表中按文件名记录，首次运行时据此确定当前版本
+        if version == 0 and recorded:
+            version = max((m.version for m in migrations if m.name in recorded), default=0)
+            cursor.execute(f"PRAGMA user_version = {version}")
+
+        for migration in migrations:
+            if migration.version > version:
+                continue
+            checksum = recorded.get(migration.name)
+            if checksum is None:
+                # 旧版本没有记录校验和，以当前文件为准
+                cursor.execute('''
+                    INSERT OR REPLACE INTO migrations (name, checksum) VALUES (?, ?)
+                ''', (migration.name, migration.checksum))
+            elif checksum != migration.checksum:
+                raise MigrationError(f"已应用的迁移 {migration.name} 被修改，请改为新增迁移")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    applied = []
+    for migration in migrations:
+        if migration.version <= version:
+            continue
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration.upgrade(cursor)
+            cursor.execute('''
+                INSERT OR REPLACE INTO migrations (name, checksum, backfill_position, backfill_done)
+                VALUES (?, ?, 0, ?)
+            ''', (migration.name, migration.checksum, migration.backfill_table is None))
+            cursor.execute(f"PRAGMA user_version = {migration.version}")
+            conn.commit()
+        except BaseException as e:
+            conn.rollback()
+            logger.error(f"应用迁移 {migration.name} 失败，已回滚: {e}")
+            raise MigrationError(f"应用迁移 {migration.name} 失败: {e}") from e
+        version = migration.version
+        applied.append(migration.name)
+        logger.info(f"成功应用迁移: {migration.name} ({(time.perf_counter() - started) * 1000:.1f}ms)")
+    return applied
+
+
+def run_migrations(db_path: str, migrations_path: str):
+    """运行数据库迁移脚本"""
+    # 确保数据库目录存在
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+    conn = get_connection(db_path)
+    try:
+        apply_migrations(conn, migrations_path)
+    finally:
+        conn.close()
+    logger.info("数据库迁移完成")
+
+
+class DataMigrationRunner:
+    """分批执行迁移中的数据回填"""
+
+    def __init__(self, db_path: str, migrations_path: str, config: dict):
+        self.db_path = db_path
+        self.migrations_path = migrations_path
+        self.config = config
+        self.batch_size = self.config.get("re_xiuxian", {}).get("data_migration_batch_size", 2000)
+
+        # 待回填的迁移，首次使用时从数据库读取
+        self._pending: Optional[List[Migration]] = None
+        # 迁移名 -> (当前进度, 目标 rowid)
+        self._progress = {}
+        self._reported = {}
+
+    def _load_pending(self) -> List[Migration]:
+        if self._pending is None:
+            conn = get_connection(self.db_path)
             try:
-                with open(migration_path, 'r', encoding='utf-8') as f:
-                    sql_script = f.read()
-                
-                # 执行迁移脚本
-                cursor.executescript(sql_script)
-                
-                # 记录已应用的迁移
-                cursor.execute(
-                    'INSERT INTO migrations (name) VALUES (?)',
-                    (migration_name,)
-                )
-                
-                logger.info(f"成功应用迁移: {migration_name}")
-            except Exception as e:
-                logger.error(f"应用迁移 {migration_name} 失败: {e}")
-                conn.rollback()
-                raise
-        else:
-            logger.debug(f"迁移已应用，跳过: {migration_name}")
-    
-    # 提交更改
-    conn.commit()
-    conn.close()
-    logger.info("数据库迁移完成")
\ No newline at end of file
+                names = {row[0] for row in conn.execute(
+                    "SELECT name FROM migrations WHERE backfill_done = 0"
+                ).fetchall()}
+            except sqlite3.OperationalError:
+                names = set()
+            finally:
+                conn.close()
+            self._pending = [m for m in discover_migrations(self.migrations_path) if m.name in names]
+        return self._pending
+
+    def step(self) -> bool:
+        """回填一批数据，仍有剩余时返回 True"""
+        pending = self._load_pending()
+        if not pending:
+            return False
+        migration = pending[0]
+        table = migration.backfill_table
+
+        conn = get_connection(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            position = cursor.execute(
+                "SELECT backfill_position FROM migrations WHERE name = ?", (migration.name,)
+            ).fetchone()[0] or 0
+            target = cursor.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+            end = min(position + self.batch_size, target)
+            if end > position:
+                migration.module.backfill(cursor, position, end)
+            done = end >= target
+            cursor.execute('''
+                UPDATE migrations SET backfill_position = ?, backfill_done = ? WHERE name = ?
+            ''', (end, done, migration.name))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        self._progress[migration.name] = (end, target)
+        self._report(migration.name, end, target, done)
+        if done:
+            pending.pop(0)
+            self._progress.pop(migration.name, None)
+        return bool(pending)
+
+    def _report(self, name: str, position: int, target: int, done: bool):
+        """进度每推进10%输出一次日志"""
+        if done:
+            logger.info(f"数据迁移 {name} 完成，共处理到第 {position} 行")
+            return
+        decile = position * 10 // target if target else 10
+        if decile > self._reported.get(name, 0):
+            self._reported[name] = decile
+            logger.info(f"数据迁移 {name} 进度 {position}/{target} ({decile * 10}%)")
+
+    def get_remaining(self) -> int:
+        """已知的剩余待回填行数（粗略）"""
+        return sum(max(0, target - position) for position, target in self._progress.values())
@@ -0,0 +1,10 @@
+-- 群成员活跃表，用于按群划分的排行榜
+CREATE TABLE IF NOT EXISTS group_members (
+    group_id TEXT NOT NULL,                 -- 群会话标识 (unified_msg_origin)
+    user_id TEXT NOT NULL,                  -- 平台用户ID
+    last_active_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (group_id, user_id),
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_group_members_user_id ON group_members(user_id);
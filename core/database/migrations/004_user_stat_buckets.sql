@@ -0,0 +1,8 @@
+-- 玩家统计小时桶，用于日榜/周榜等滚动时间窗口排行
+CREATE TABLE IF NOT EXISTS user_stat_buckets (
+    metric TEXT NOT NULL,                   -- 统计项 (exp/battle_win/contribution)
+    bucket INTEGER NOT NULL,                -- 小时桶编号 (Unix时间戳 // 3600)
+    user_id TEXT NOT NULL,                  -- 平台用户ID
+    value REAL DEFAULT 0,                   -- 该小时内的累计值
+    PRIMARY KEY (metric, bucket, user_id)
+) WITHOUT ROWID;
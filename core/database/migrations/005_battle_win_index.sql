@@ -0,0 +1,2 @@
+-- 恶人榜按斗法胜场排序所需的索引
+CREATE INDEX IF NOT EXISTS idx_users_total_battle_win_count ON users(total_battle_win_count);
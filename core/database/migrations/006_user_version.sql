@@ -0,0 +1,2 @@
+-- 用户数据版本号，update_user 以此做乐观并发控制（比较并交换）
+ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,23 @@
+-- 玩家各项行动的冷却记录，由冷却引擎按需加载并同步写入
+CREATE TABLE IF NOT EXISTS user_cooldowns (
+    user_id TEXT NOT NULL,                  -- 平台用户ID
+    action TEXT NOT NULL,                   -- 行动 (closing/deep_closing/battle/roll_call/betray)
+    used_at TIMESTAMP NOT NULL,             -- 上次执行时间，冷却结束时间按配置计算
+    PRIMARY KEY (user_id, action)
+) WITHOUT ROWID;
+
+-- 从用户表中已有的时间字段迁移冷却记录
+INSERT OR IGNORE INTO user_cooldowns (user_id, action, used_at)
+SELECT user_id, 'closing', last_closing_time FROM users WHERE last_closing_time IS NOT NULL;
+
+INSERT OR IGNORE INTO user_cooldowns (user_id, action, used_at)
+SELECT user_id, 'deep_closing', last_closing_time FROM users WHERE last_closing_time IS NOT NULL;
+
+INSERT OR IGNORE INTO user_cooldowns (user_id, action, used_at)
+SELECT user_id, 'battle', last_battle_time FROM users WHERE last_battle_time IS NOT NULL;
+
+INSERT OR IGNORE INTO user_cooldowns (user_id, action, used_at)
+SELECT user_id, 'roll_call', last_sect_roll_call_time FROM users WHERE last_sect_roll_call_time IS NOT NULL;
+
+INSERT OR IGNORE INTO user_cooldowns (user_id, action, used_at)
+SELECT user_id, 'betray', last_sect_roll_call_time FROM users WHERE last_sect_roll_call_time IS NOT NULL;
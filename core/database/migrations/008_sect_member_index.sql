@@ -0,0 +1,2 @@
+-- 宗门成员列表按宗门查找成员，并可直接按修为顺序分页
+CREATE INDEX IF NOT EXISTS idx_users_sect_id_cultivation ON users(sect_id, cultivation);
@@ -0,0 +1,30 @@
+-- 宗门经济：贡献流水、宗门库房与贡献商店
+
+-- 宗门库房，等于成员累计获得的贡献减去已兑换消耗的贡献
+ALTER TABLE sects ADD COLUMN treasury REAL DEFAULT 0;
+UPDATE sects SET treasury = contribution;
+
+-- 成员已兑换消耗的贡献，可用贡献 = contribution - spent
+ALTER TABLE user_sect_contributions ADD COLUMN spent REAL DEFAULT 0;
+
+-- 贡献流水，写入时只追加，由后台任务定期批量结算到贡献表与宗门表
+CREATE TABLE IF NOT EXISTS sect_contribution_ledger (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    sect_id INTEGER NOT NULL,
+    amount REAL NOT NULL,                   -- 正数为获得，负数为消耗
+    reason TEXT NOT NULL,                   -- 来源 (点卯/兑换等)
+    settled BOOLEAN DEFAULT FALSE,          -- 是否已结算
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 未结算流水的查询与结算
+CREATE INDEX IF NOT EXISTS idx_sect_contribution_ledger_pending
+    ON sect_contribution_ledger(sect_id, user_id) WHERE settled = 0;
+
+-- 贡献商店
+CREATE TABLE IF NOT EXISTS sect_shop_items (
+    item_id INTEGER PRIMARY KEY,
+    price REAL NOT NULL,                    -- 兑换所需贡献
+    FOREIGN KEY (item_id) REFERENCES items(id)
+);
@@ -0,0 +1,32 @@
+-- 炼丹：丹方、丹方材料与玩家已学会的丹方
+
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,              -- 丹方名称
+    output_item_id INTEGER NOT NULL,        -- 产出物品
+    output_quantity INTEGER DEFAULT 1,      -- 每炉产出数量
+    requirement TEXT,                       -- 学习要求
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (output_item_id) REFERENCES items(id)
+);
+
+CREATE TABLE IF NOT EXISTS recipe_ingredients (
+    recipe_id INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,               -- 材料物品
+    quantity INTEGER NOT NULL,              -- 每炉消耗数量
+    PRIMARY KEY (recipe_id, item_id),
+    FOREIGN KEY (recipe_id) REFERENCES recipes(id),
+    FOREIGN KEY (item_id) REFERENCES items(id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS user_recipes (
+    user_id TEXT NOT NULL,
+    recipe_id INTEGER NOT NULL,
+    learned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, recipe_id),
+    FOREIGN KEY (user_id) REFERENCES users(user_id),
+    FOREIGN KEY (recipe_id) REFERENCES recipes(id)
+) WITHOUT ROWID;
+
+-- 储物袋按 (玩家, 物品) 查询与扣减
+CREATE INDEX IF NOT EXISTS idx_user_items_user_item ON user_items(user_id, item_id);
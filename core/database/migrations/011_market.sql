@@ -0,0 +1,36 @@
+-- 坊市：挂单与成交记录，以灵石计价
+
+-- 挂单，挂出时即托管卖方的物品或买方的灵石
+CREATE TABLE IF NOT EXISTS market_orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    item_id INTEGER NOT NULL,
+    side TEXT NOT NULL,                     -- 方向 (buy/sell)
+    price INTEGER NOT NULL,                 -- 单价（灵石）
+    quantity INTEGER NOT NULL,              -- 挂单数量
+    remaining INTEGER NOT NULL,             -- 未成交数量
+    status TEXT DEFAULT 'open',             -- 状态 (open/filled/cancelled)
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(user_id),
+    FOREIGN KEY (item_id) REFERENCES items(id)
+);
+
+-- 启动时加载未完成的挂单
+CREATE INDEX IF NOT EXISTS idx_market_orders_open ON market_orders(item_id, id) WHERE status = 'open';
+
+-- 成交记录，撮合时只追加，由后台任务批量交割到双方储物袋
+CREATE TABLE IF NOT EXISTS market_fills (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER NOT NULL,
+    buy_order_id INTEGER NOT NULL,
+    sell_order_id INTEGER NOT NULL,
+    buyer_id TEXT NOT NULL,
+    seller_id TEXT NOT NULL,
+    price INTEGER NOT NULL,                 -- 成交单价（挂单在先一方的价格）
+    quantity INTEGER NOT NULL,              -- 成交数量
+    refund INTEGER DEFAULT 0,               -- 买方托管多出的灵石，交割时退还
+    settled BOOLEAN DEFAULT FALSE,          -- 是否已交割
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_market_fills_pending ON market_fills(id) WHERE settled = 0;
@@ -0,0 +1,6 @@
+-- 启动状态：记录数据库已完成的表结构迁移与初始数据的指纹，指纹一致时启动跳过这两步
+CREATE TABLE IF NOT EXISTS bootstrap_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,12 @@
+"""用户表增加 unified_msg_origin 字段（主动消息的会话标识）
+
+早期版本在仓储初始化时直接 ALTER TABLE 添加该字段，部分数据库中已经存在，
+因此先检查字段再添加。
+"""
+
+
+def upgrade(cursor):
+    cursor.execute("PRAGMA table_info(users)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "unified_msg_origin" not in columns:
+        cursor.execute("ALTER TABLE users ADD COLUMN unified_msg_origin TEXT")
@@ -0,0 +1,17 @@
+"""按用户最近一次在群内闭关的会话补全群成员表
+
+群排行榜上线前的用户只在 users.unified_msg_origin 中留有所在群，
+由后台任务按 users 的 rowid 分批写入 group_members，已有的活跃记录保持不变。
+"""
+
+BACKFILL_TABLE = "users"
+
+
+def backfill(cursor, start, end):
+    cursor.execute('''
+        INSERT OR IGNORE INTO group_members (group_id, user_id, last_active_at)
+        SELECT unified_msg_origin, user_id, COALESCE(last_closing_time, last_login_at, CURRENT_TIMESTAMP)
+        FROM users
+        WHERE rowid > ? AND rowid <= ?
+          AND unified_msg_origin LIKE '%:GroupMessage:%'
+    ''', (start, end))
@@ -0,0 +1,212 @@
+import re
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+from astrbot.api import logger
+
+
+# 归一化语句时去掉的注释与替换的字面量
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """语句形态：去掉注释与多余空白，字面量替换为占位符，IN 列表合并为一项"""
+    shape = _WHITESPACE.sub(" ", _COMMENT.sub(" ", sql)).strip().rstrip(";")
+    shape = _STRING_LITERAL.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    return _PLACEHOLDER_LIST.sub("(?...)", shape)
+
+
+def redact_params(params: Any) -> str:
+    """参数只保留类型，不输出具体值"""
+    if params is None:
+        return "无"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in params) + ")"
+
+
+class _QueryStats:
+    """同一形态语句的累计耗时"""
+    __slots__ = ("count", "total", "max", "slow_count", "plan")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow_count = 0
+        self.plan: Optional[str] = None
+
+
+class SlowQueryLog:
+    """慢查询日志"""
+
+    # 语句形态缓存上限，超出后清空重建
+    MAX_SHAPES = 2048
+    # 日志与报告中语句的最大显示长度
+    MAX_SQL_LENGTH = 200
+
+    def __init__(self, config: dict):
+        self.config = config
+        slow_config = self.config.get("re_xiuxian", {})
+        self.threshold = slow_config.get("slow_query_threshold_ms", 100) / 1000
+        self.top_n = slow_config.get("slow_query_top_n", 10)
+
+        self._shapes: Dict[str, str] = {}
+        self._stats: Dict[str, _QueryStats] = {}
+
+    def observe(self, conn: sqlite3.Connection, sql: str, params: Any, seconds: float,
+                previous: Optional[float] = None) -> float:
+        """记录一次语句执行；读取结果集时传入该语句此前的累计耗时 previous，返回新的累计耗时"""
+        shape = self._shapes.get(sql)
+        if shape is None:
+            if len(self._shapes) >= self.MAX_SHAPES:
+                self._shapes.clear()
+            shape = self._shapes[sql] = normalize_sql(sql)
+
+        stats = self._stats.get(shape)
+        if stats is None:
+            stats = self._stats[shape] = _QueryStats()
+        if previous is None:
+            stats.count += 1
+            previous = 0.0
+        stats.total += seconds
+        elapsed = previous + seconds
+        if elapsed > stats.max:
+            stats.max = elapsed
+
+        # 执行与读取的累计耗时首次越过阈值时记录，同一次执行只记录一次
+        if self.threshold <= 0 or elapsed < self.threshold or previous >= self.threshold:
+            return elapsed
+        stats.slow_count += 1
+        if stats.plan is None and conn is not None:
+            stats.plan = self._explain(conn, sql, params)
+        message = f"慢查询 {elapsed * 1000:.1f}ms: {shape[:self.MAX_SQL_LENGTH]}\n参数: {redact_params(params)}"
+        if stats.plan:
+            message += f"\n执行计划: {stats.plan}"
+        logger.warning(message)
+        return elapsed
+
+    def _explain(self, conn: sqlite3.Connection, sql: str, params: Any) -> str:
+        """采集执行计划，使用原始游标，避免再次被计时"""
+        try:
+            rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+            return " | ".join(row[3] for row in rows) or "无"
+        except sqlite3.Error as e:
+            return f"无法获取 ({e})"
+
+    def get_top(self, n: Optional[int] = None) -> List[tuple]:
+        """按总耗时排序的语句形态：(形态, 次数, 总耗时, 最大耗时, 慢查询次数, 执行计划)"""
+        ranked = sorted(self._stats.items(), key=lambda kv: kv[1].total, reverse=True)[:n or self.top_n]
+        return [(shape, s.count, s.total, s.max, s.slow_count, s.plan) for shape, s in ranked]
+
+    def format_report(self) -> str:
+        """格式化慢查询报告"""
+        lines = []
+        for i, (shape, count, total, longest, slow_count, plan) in enumerate(self.get_top(), 1):
+            lines.append(
+                f"{i}. 共{total * 1000:.0f}ms {count}次 最大{longest * 1000:.1f}ms 慢查询{slow_count}次\n"
+                f"   {shape[:self.MAX_SQL_LENGTH]}"
+            )
+            if plan:
+                lines.append(f"   执行计划: {plan}")
+        return "\n".join(lines)
+
+
+# 当前启用的慢查询日志，未启用时不计时
+_active_log: Optional[SlowQueryLog] = None
+
+
+def install_slow_query_log(log: Optional[SlowQueryLog]):
+    """启用（或传入 None 关闭）慢查询日志"""
+    global _active_log
+    _active_log = log
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """对执行与读取结果计时的游标"""
+
+    # 最近一次 execute 的 (语句, 参数, 累计耗时)，读取结果集的耗时累加到该语句上
+    _last = None
+
+    def execute(self, sql, parameters=()):
+        log = _active_log
+        if log is None:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = log.observe(self.connection, sql, parameters, time.perf_counter() - start)
+            self._last = (sql, parameters, elapsed)
+
+    def executemany(self, sql, seq_of_parameters):
+        log = _active_log
+        if log is None:
+            return super().executemany(sql, seq_of_parameters)
+        # 参数可能是生成器，转成列表以便取第一组用于执行计划
+        seq_of_parameters = list(seq_of_parameters)
+        self._last = None
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            log.observe(self.connection, sql, seq_of_parameters[0] if seq_of_parameters else None,
+                        time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        log = _active_log
+        if log is None:
+            return super().executescript(sql_script)
+        self._last = None
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            # 脚本包含多条语句，只计时，不采集执行计划
+            log.observe(None, sql_script, None, time.perf_counter() - start)
+
+    def _timed_fetch(self, fetch, *args):
+        """读取结果集并将耗时计入最近一次执行的语句"""
+        log = _active_log
+        last = self._last
+        if log is None or last is None:
+            return fetch(*args)
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            sql, parameters, elapsed = last
+            elapsed = log.observe(self.connection, sql, parameters, time.perf_counter() - start, previous=elapsed)
+            self._last = (sql, parameters, elapsed)
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._timed_fetch(super().fetchmany)
+        return self._timed_fetch(super().fetchmany, size)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """语句经由 ProfiledCursor 执行的连接，用作 sqlite3.connect 的 factory"""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
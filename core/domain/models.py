@@ -2,8 +2,11 @@ from dataclasses import dataclass, field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+# 实体均使用 __slots__，不为每个实例分配 __dict__；
+# 物品、丹方与宗门属于只读的目录数据，冻结后可以在缓存与各服务之间安全共享。
 
-@dataclass
+
+@dataclass(slots=True)
 class User:
     """修仙用户实体"""
     id: int
@@ -41,9 +44,12 @@ class User:
     
     # 会话信息，用于发送主动消息
     unified_msg_origin: Optional[str] = None  # 用户会话标识符
+    
+    # 数据版本号，每次写入递增，用于乐观并发控制
+    version: int = 0
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Item:
     """物品模板实体"""
     id: int
@@ -58,7 +64,7 @@ class Item:
     created_at: datetime = field(default_factory=datetime.now)
 
 
-@dataclass
+@dataclass(slots=True)
 class UserItem:
     """用户物品实体"""
     id: int
@@ -68,7 +74,47 @@ class UserItem:
     obtained_at: datetime = field(default_factory=datetime.now)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class Recipe:
+    """丹方实体"""
+    id: int
+    name: str                              # 丹方名称
+    output_item_id: int                    # 产出物品ID
+    output_quantity: int = 1               # 每炉产出数量
+    ingredients: Dict[int, int] = field(default_factory=dict)  # 材料物品ID -> 每炉消耗数量
+    requirement: Optional[str] = None      # 学习要求
+    created_at: datetime = field(default_factory=datetime.now)
+
+
+@dataclass(slots=True)
+class MarketOrder:
+    """坊市挂单实体"""
+    id: int
+    user_id: str
+    item_id: int
+    side: str                              # 方向 (buy/sell)
+    price: int                             # 单价（灵石）
+    quantity: int                          # 挂单数量
+    remaining: int                         # 未成交数量
+    status: str = "open"                   # 状态 (open/filled/cancelled)
+    created_at: datetime = field(default_factory=datetime.now)
+
+
+@dataclass(slots=True)
+class MarketFill:
+    """坊市成交记录"""
+    id: int
+    item_id: int
+    buy_order_id: int
+    sell_order_id: int
+    buyer_id: str
+    seller_id: str
+    price: int                             # 成交单价
+    quantity: int                          # 成交数量
+    refund: int = 0                        # 退还买方的托管灵石
+
+
+@dataclass(frozen=True, slots=True)
 class Sect:
     """宗门实体"""
     id: int
@@ -79,9 +125,10 @@ class Sect:
     member_count: int = 1                  # 成员数量
     contribution: float = 0.0              # 宗门贡献
     is_active: bool = True                 # 是否激活
+    treasury: float = 0.0                  # 宗门库房
 
 
-@dataclass
+@dataclass(slots=True)
 class UserSectContribution:
     """用户宗门贡献实体"""
     id: int
@@ -89,13 +136,46 @@ class UserSectContribution:
     sect_id: int
     contribution: float = 0.0              # 对该宗门的贡献
     last_contribution_at: datetime = field(default_factory=datetime.now)
+    spent: float = 0.0                     # 已兑换消耗的贡献
 
 
-@dataclass
+@dataclass(slots=True)
 class Log:
     """日志实体"""
     id: int
     user_id: str
     type: str                              # 日志类型 (闭关/斗法/宗门等)
     content: str                           # 日志内容
-    created_at: datetime = field(default_factory=datetime.now)
\ No newline at end of file
+    created_at: datetime = field(default_factory=datetime.now)
+
+
+@dataclass(slots=True)
+class RankEntry:
+    """排行榜条目（仅包含展示所需字段）"""
+    user_id: str
+    nickname: Optional[str]
+    dao_name: Optional[str]
+    realm: str
+    cultivation: float
+
+    @classmethod
+    def from_user(cls, user: User) -> "RankEntry":
+        return cls(
+            user_id=user.user_id,
+            nickname=user.nickname,
+            dao_name=user.dao_name,
+            realm=user.realm,
+            cultivation=user.cultivation
+        )
+
+
+@dataclass(slots=True)
+class SectMember:
+    """宗门成员列表中的一行"""
+    user_id: str
+    nickname: Optional[str]
+    dao_name: Optional[str]
+    realm: str
+    cultivation: float
+    sect_position: Optional[str]
+    contribution: float = 0.0              # 对该宗门的贡献
\ No newline at end of file
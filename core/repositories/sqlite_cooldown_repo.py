@@ -0,0 +1,35 @@
+from typing import Dict, List
+from datetime import datetime
+from ..database.connection import get_connection
+
+
+class SqliteCooldownRepository:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def _get_connection(self):
+        """获取数据库连接并配置WAL模式"""
+        return get_connection(self.db_path)
+
+    def get_user_cooldowns(self, user_id: str) -> Dict[str, datetime]:
+        """获取玩家所有行动的上次执行时间"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT action, used_at FROM user_cooldowns WHERE user_id = ?
+            ''', (user_id,))
+            
+            return {row[0]: datetime.fromisoformat(row[1]) for row in cursor.fetchall()}
+
+    def set_used_at(self, user_id: str, actions: List[str], used_at: datetime) -> bool:
+        """记录玩家若干行动的执行时间"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO user_cooldowns (user_id, action, used_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(user_id, action)
+                DO UPDATE SET used_at = excluded.used_at
+            ''', [(user_id, action, used_at.isoformat()) for action in actions])
+            conn.commit()
+            return True
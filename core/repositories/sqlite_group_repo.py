@@ -0,0 +1,47 @@
+from typing import List
+from ..domain.models import RankEntry
+from ..database.connection import get_connection
+
+
+class SqliteGroupRepository:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def _get_connection(self):
+        """获取数据库连接并配置WAL模式"""
+        return get_connection(self.db_path)
+
+    def touch_member(self, group_id: str, user_id: str) -> bool:
+        """记录用户在群内活跃"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO group_members (group_id, user_id, last_active_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(group_id, user_id)
+                DO UPDATE SET last_active_at = excluded.last_active_at
+            ''', (group_id, user_id))
+            conn.commit()
+            return True
+
+    def get_member_rank_entries(self, group_id: str) -> List[RankEntry]:
+        """获取群内所有成员的排行数据"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT u.user_id, u.nickname, u.dao_name, u.realm, u.cultivation
+                FROM group_members g
+                JOIN users u ON u.user_id = g.user_id
+                WHERE g.group_id = ?
+            ''', (group_id,))
+
+            return [
+                RankEntry(
+                    user_id=row[0],
+                    nickname=row[1],
+                    dao_name=row[2],
+                    realm=row[3] or "凡人",
+                    cultivation=row[4] or 0.0
+                )
+                for row in cursor.fetchall()
+            ]
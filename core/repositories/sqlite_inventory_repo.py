@@ -1,107 +1,201 @@
-import sqlite3
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
-from ..domain.models import UserItem
+from ..domain.models import UserItem, Item
+from ..database.connection import Transaction, get_connection
 
 
 class SqliteInventoryRepository:
     def __init__(self, db_path: str):
         self.db_path = db_path
-        self._init_table()
 
     def _get_connection(self):
         """获取数据库连接并配置WAL模式"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("PRAGMA journal_mode=WAL;")  # 启用WAL模式
-        conn.execute("PRAGMA synchronous=NORMAL;")  # 平衡性能和数据安全
-        conn.execute("PRAGMA cache_size=10000;")  # 增加缓存大小
-        conn.execute("PRAGMA temp_store=MEMORY;")  # 在内存中存储临时数据
-        conn.row_factory = sqlite3.Row
-        return conn
-
-    def _init_table(self):
-        """初始化用户物品表"""
+        return get_connection(self.db_path)
+
+    def add_item(self, user_id: str, item_id: int, quantity: int = 1,
+                 tx: Optional[Transaction] = None) -> bool:
+        """给用户添加物品，传入 tx 时在该事务中执行"""
+        if tx is not None:
+            self._add_item(tx.cursor(), user_id, item_id, quantity)
+            return True
+        
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            self._add_item(cursor, user_id, item_id, quantity)
+            conn.commit()
+            return True
+
+    def _add_item(self, cursor, user_id: str, item_id: int, quantity: int):
+        """添加物品（在给定游标上执行，不提交）"""
+        # 检查用户是否已有该物品
+        cursor.execute('''
+            SELECT id, quantity FROM user_items 
+            WHERE user_id = ? AND item_id = ?
+        ''', (user_id, item_id))
+        
+        row = cursor.fetchone()
+        if row:
+            # 更新数量
+            new_quantity = row[1] + quantity
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    item_id INTEGER NOT NULL,
-                    quantity INTEGER DEFAULT 1,
-                    obtained_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id),
-                    FOREIGN KEY (item_id) REFERENCES items(id)
-                )
-            ''')
+                UPDATE user_items 
+                SET quantity = ? 
+                WHERE id = ?
+            ''', (new_quantity, row[0]))
+        else:
+            # 插入新记录
+            cursor.execute('''
+                INSERT INTO user_items (user_id, item_id, quantity)
+                VALUES (?, ?, ?)
+            ''', (user_id, item_id, quantity))
+
+    def remove_item(self, user_id: str, item_id: int, quantity: int = 1,
+                    tx: Optional[Transaction] = None) -> bool:
+        """从用户库存中移除物品，数量不足时不做修改并返回False；传入 tx 时在该事务中执行"""
+        if tx is not None:
+            return self._remove_item(tx.cursor(), user_id, item_id, quantity)
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            removed = self._remove_item(cursor, user_id, item_id, quantity)
             conn.commit()
+            return removed
 
-    def add_item(self, user_id: str, item_id: int, quantity: int = 1) -> bool:
-        """给用户添加物品"""
+    def _remove_item(self, cursor, user_id: str, item_id: int, quantity: int) -> bool:
+        """移除物品（在给定游标上执行，不提交）"""
+        # 数量检查与扣减在同一条语句中完成
+        cursor.execute('''
+            UPDATE user_items 
+            SET quantity = quantity - ? 
+            WHERE user_id = ? AND item_id = ? AND quantity >= ?
+        ''', (quantity, user_id, item_id, quantity))
+        if cursor.rowcount == 0:
+            return False
+        
+        # 用完的物品删除记录
+        cursor.execute('''
+            DELETE FROM user_items 
+            WHERE user_id = ? AND item_id = ? AND quantity <= 0
+        ''', (user_id, item_id))
+        return True
+
+    def add_items(self, user_id: str, items: Dict[int, int],
+                  tx: Optional[Transaction] = None) -> bool:
+        """批量给用户添加物品 {物品ID: 数量}，传入 tx 时在该事务中执行"""
+        if tx is not None:
+            for item_id, quantity in items.items():
+                self._add_item(tx.cursor(), user_id, item_id, quantity)
+            return True
+        
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            
-            # 检查用户是否已有该物品
-            cursor.execute('''
-                SELECT id, quantity FROM user_items 
-                WHERE user_id = ? AND item_id = ?
-            ''', (user_id, item_id))
-            
-            row = cursor.fetchone()
-            if row:
-                # 更新数量
-                new_quantity = row[1] + quantity
-                cursor.execute('''
-                    UPDATE user_items 
-                    SET quantity = ? 
-                    WHERE id = ?
-                ''', (new_quantity, row[0]))
-            else:
-                # 插入新记录
-                cursor.execute('''
-                    INSERT INTO user_items (user_id, item_id, quantity)
-                    VALUES (?, ?, ?)
-                ''', (user_id, item_id, quantity))
-            
+            for item_id, quantity in items.items():
+                self._add_item(cursor, user_id, item_id, quantity)
             conn.commit()
             return True
 
-    def remove_item(self, user_id: str, item_id: int, quantity: int = 1) -> bool:
-        """从用户库存中移除物品"""
+    def remove_items(self, user_id: str, items: Dict[int, int],
+                     tx: Optional[Transaction] = None) -> bool:
+        """批量移除物品 {物品ID: 数量}，任一物品数量不足时全部不扣并返回False"""
+        if tx is not None:
+            return self._remove_items(tx.cursor(), user_id, items)
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            removed = self._remove_items(cursor, user_id, items)
+            conn.commit()
+            return removed
+
+    def _remove_items(self, cursor, user_id: str, items: Dict[int, int]) -> bool:
+        """批量移除物品（在给定游标上执行，不提交）"""
+        # 用保存点撤销已扣减的部分，不影响外层事务中的其他写入
+        cursor.execute("SAVEPOINT remove_items")
+        for item_id, quantity in items.items():
+            if not self._remove_item(cursor, user_id, item_id, quantity):
+                cursor.execute("ROLLBACK TO remove_items")
+                cursor.execute("RELEASE remove_items")
+                return False
+        cursor.execute("RELEASE remove_items")
+        return True
+
+    def transfer_items(self, sender_id: str, receiver_id: str, items: Dict[int, int],
+                       tx: Optional[Transaction] = None) -> bool:
+        """在两名用户之间转移物品 {物品ID: 数量}
+
+        扣减与增加在同一事务中完成；发送方任一物品数量不足时全部不转并返回False。
+        传入 tx 时在该事务中执行，便于与审计日志等一并提交。
+        """
+        if tx is not None:
+            return self._transfer_items(tx.cursor(), sender_id, receiver_id, items)
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            transferred = self._transfer_items(cursor, sender_id, receiver_id, items)
+            conn.commit()
+            return transferred
+
+    def transfer_item(self, sender_id: str, receiver_id: str, item_id: int, quantity: int = 1,
+                      tx: Optional[Transaction] = None) -> bool:
+        """在两名用户之间转移单种物品"""
+        return self.transfer_items(sender_id, receiver_id, {item_id: quantity}, tx)
+
+    def _transfer_items(self, cursor, sender_id: str, receiver_id: str, items: Dict[int, int]) -> bool:
+        """转移物品（在给定游标上执行，不提交）"""
+        if not self._remove_items(cursor, sender_id, items):
+            return False
+        for item_id, quantity in items.items():
+            self._add_item(cursor, receiver_id, item_id, quantity)
+        return True
+
+    def get_item_quantities(self, user_id: str) -> Dict[int, int]:
+        """获取用户各物品的数量 {物品ID: 数量}"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            
-            # 检查用户是否有足够数量的物品
             cursor.execute('''
-                SELECT id, quantity FROM user_items 
-                WHERE user_id = ? AND item_id = ?
-            ''', (user_id, item_id))
+                SELECT item_id, SUM(quantity) FROM user_items 
+                WHERE user_id = ? 
+                GROUP BY item_id
+            ''', (user_id,))
+            return {row[0]: row[1] for row in cursor.fetchall()}
+
+    def get_user_inventory(self, user_id: str) -> List[Tuple[Item, UserItem]]:
+        """联表查询用户的所有物品及物品模板"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT ui.id AS ui_id, ui.user_id, ui.item_id, ui.quantity, ui.obtained_at, i.*
+                FROM user_items ui
+                JOIN items i ON i.id = ui.item_id
+                WHERE ui.user_id = ?
+                ORDER BY ui.id
+            ''', (user_id,))
             
-            row = cursor.fetchone()
-            if not row:
-                return False
-                
-            current_quantity = row[1]
-            if current_quantity < quantity:
-                return False
-                
-            if current_quantity == quantity:
-                # 删除记录
-                cursor.execute('''
-                    DELETE FROM user_items 
-                    WHERE id = ?
-                ''', (row[0],))
-            else:
-                # 更新数量
-                new_quantity = current_quantity - quantity
-                cursor.execute('''
-                    UPDATE user_items 
-                    SET quantity = ? 
-                    WHERE id = ?
-                ''', (new_quantity, row[0]))
+            inventory = []
+            for row in cursor.fetchall():
+                item = Item(
+                    id=row["id"],
+                    name=row["name"],
+                    type=row["type"],
+                    description=row["description"],
+                    rarity=row["rarity"] or 1,
+                    effect=row["effect"],
+                    effect_type=row["effect_type"],
+                    effect_value=row["effect_value"],
+                    requirement=row["requirement"],
+                    created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None
+                )
+                user_item = UserItem(
+                    id=row["ui_id"],
+                    user_id=row["user_id"],
+                    item_id=row["item_id"],
+                    quantity=row["quantity"],
+                    obtained_at=datetime.fromisoformat(row["obtained_at"]) if row["obtained_at"] else None
+                )
+                inventory.append((item, user_item))
             
-            conn.commit()
-            return True
+            return inventory
 
     def get_user_items(self, user_id: str) -> List[UserItem]:
         """获取用户的所有物品"""
@@ -1,63 +1,57 @@
 import sqlite3
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from ..domain.models import Item
+from ..database.connection import Transaction, get_connection
 
 
 class SqliteItemRepository:
     def __init__(self, db_path: str):
         self.db_path = db_path
-        self._init_table()
 
     def _get_connection(self):
         """获取数据库连接并配置WAL模式"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("PRAGMA journal_mode=WAL;")  # 启用WAL模式
-        conn.execute("PRAGMA synchronous=NORMAL;")  # 平衡性能和数据安全
-        conn.execute("PRAGMA cache_size=10000;")  # 增加缓存大小
-        conn.execute("PRAGMA temp_store=MEMORY;")  # 在内存中存储临时数据
-        conn.row_factory = sqlite3.Row
-        return conn
+        return get_connection(self.db_path)
 
-    def _init_table(self):
-        """初始化物品表"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL,
-                    type TEXT NOT NULL,
-                    description TEXT,
-                    rarity INTEGER DEFAULT 1,
-                    effect TEXT,
-                    effect_type TEXT,
-                    effect_value REAL,
-                    requirement TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            conn.commit()
-
-    def create_item(self, item: Item) -> bool:
-        """创建物品模板"""
+    def create_item(self, item: Item, tx: Optional[Transaction] = None) -> bool:
+        """创建物品模板，传入 tx 时在该事务中执行"""
+        sql = '''
+            INSERT INTO items (
+                name, type, description, rarity, 
+                effect, effect_type, effect_value, requirement
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+        params = (
+            item.name, item.type, item.description, item.rarity,
+            item.effect, item.effect_type, item.effect_value, item.requirement
+        )
+        if tx is not None:
+            try:
+                tx.cursor().execute(sql, params)
+                return True
+            except sqlite3.IntegrityError:
+                return False
+        
         with self._get_connection() as conn:
             cursor = conn.cursor()
             try:
-                cursor.execute('''
-                    INSERT INTO items (
-                        name, type, description, rarity, 
-                        effect, effect_type, effect_value, requirement
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    item.name, item.type, item.description, item.rarity,
-                    item.effect, item.effect_type, item.effect_value, item.requirement
-                ))
+                cursor.execute(sql, params)
                 conn.commit()
                 return True
             except sqlite3.IntegrityError:
                 return False
 
+    def get_name_ids(self, tx: Optional[Transaction] = None) -> Dict[str, int]:
+        """物品名称到ID的映射"""
+        sql = 'SELECT name, id FROM items'
+        if tx is not None:
+            return {row[0]: row[1] for row in tx.cursor().execute(sql).fetchall()}
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            return {row[0]: row[1] for row in cursor.fetchall()}
+
     def get_by_id(self, item_id: int) -> Optional[Item]:
         """根据ID获取物品"""
         with self._get_connection() as conn:
@@ -0,0 +1,113 @@
+from typing import List, Tuple
+from datetime import datetime
+from ..domain.models import MarketOrder, MarketFill
+from ..database.connection import Transaction, get_connection
+
+
+class SqliteMarketRepository:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def _get_connection(self):
+        """获取数据库连接并配置WAL模式"""
+        return get_connection(self.db_path)
+
+    def create_order(self, order: MarketOrder, tx: Transaction) -> int:
+        """在事务中写入挂单，返回挂单ID"""
+        cursor = tx.cursor()
+        cursor.execute('''
+            INSERT INTO market_orders (user_id, item_id, side, price, quantity, remaining, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (order.user_id, order.item_id, order.side, order.price,
+              order.quantity, order.remaining, order.status))
+        return cursor.lastrowid
+
+    def update_orders(self, updates: List[Tuple[int, str, int]], tx: Transaction):
+        """在事务中批量更新挂单的 (未成交数量, 状态, 挂单ID)"""
+        tx.cursor().executemany('''
+            UPDATE market_orders SET remaining = ?, status = ? WHERE id = ?
+        ''', updates)
+
+    def cancel_order(self, order_id: int, tx: Transaction) -> bool:
+        """在事务中撤销未完成的挂单"""
+        cursor = tx.cursor()
+        cursor.execute('''
+            UPDATE market_orders SET status = 'cancelled' WHERE id = ? AND status = 'open'
+        ''', (order_id,))
+        return cursor.rowcount > 0
+
+    def add_fills(self, fills: List[MarketFill], tx: Transaction):
+        """在事务中追加成交记录"""
+        tx.cursor().executemany('''
+            INSERT INTO market_fills (
+                item_id, buy_order_id, sell_order_id, buyer_id, seller_id,
+                price, quantity, refund
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(fill.item_id, fill.buy_order_id, fill.sell_order_id, fill.buyer_id, fill.seller_id,
+               fill.price, fill.quantity, fill.refund) for fill in fills])
+
+    def get_open_orders(self) -> List[MarketOrder]:
+        """获取所有未完成的挂单，按挂单先后排序"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, user_id, item_id, side, price, quantity, remaining, status, created_at
+                FROM market_orders
+                WHERE status = 'open'
+                ORDER BY id
+            ''')
+
+            return [MarketOrder(
+                id=row["id"],
+                user_id=row["user_id"],
+                item_id=row["item_id"],
+                side=row["side"],
+                price=row["price"],
+                quantity=row["quantity"],
+                remaining=row["remaining"],
+                status=row["status"],
+                created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None
+            ) for row in cursor.fetchall()]
+
+    def get_unsettled_fills(self, limit: int, tx: Transaction) -> List[MarketFill]:
+        """在事务中读取一批未交割的成交记录"""
+        cursor = tx.cursor()
+        cursor.execute('''
+            SELECT id, item_id, buy_order_id, sell_order_id, buyer_id, seller_id, price, quantity, refund
+            FROM market_fills
+            WHERE settled = 0
+            ORDER BY id
+            LIMIT ?
+        ''', (limit,))
+
+        return [MarketFill(
+            id=row["id"],
+            item_id=row["item_id"],
+            buy_order_id=row["buy_order_id"],
+            sell_order_id=row["sell_order_id"],
+            buyer_id=row["buyer_id"],
+            seller_id=row["seller_id"],
+            price=row["price"],
+            quantity=row["quantity"],
+            refund=row["refund"] or 0
+        ) for row in cursor.fetchall()]
+
+    def mark_fills_settled(self, fill_ids: List[int], tx: Transaction):
+        """在事务中将成交记录标记为已交割"""
+        tx.cursor().executemany('''
+            UPDATE market_fills SET settled = 1 WHERE id = ?
+        ''', [(fill_id,) for fill_id in fill_ids])
+
+    def delete_settled_fills(self, retention_days: int, batch_size: int) -> int:
+        """删除一批超过保留天数的已交割成交记录，返回删除条数"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM market_fills WHERE id IN (
+                    SELECT id FROM market_fills
+                    WHERE settled = 1 AND created_at < datetime('now', ?)
+                    ORDER BY id LIMIT ?
+                )
+            ''', (f"-{retention_days} days", batch_size))
+            conn.commit()
+            return cursor.rowcount
@@ -0,0 +1,104 @@
+import sqlite3
+from typing import List, Optional, Set
+from datetime import datetime
+from ..domain.models import Recipe
+from ..database.connection import Transaction, get_connection
+
+
+class SqliteRecipeRepository:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def _get_connection(self):
+        """获取数据库连接并配置WAL模式"""
+        return get_connection(self.db_path)
+
+    def create_recipe(self, recipe: Recipe, tx: Optional[Transaction] = None) -> bool:
+        """创建丹方及其材料，传入 tx 时在该事务中执行"""
+        if tx is not None:
+            return self._insert_recipe(tx.cursor(), recipe)
+        
+        with self._get_connection() as conn:
+            if not self._insert_recipe(conn.cursor(), recipe):
+                return False
+            conn.commit()
+            return True
+
+    def _insert_recipe(self, cursor: sqlite3.Cursor, recipe: Recipe) -> bool:
+        """写入丹方及其材料，名称重复时返回False"""
+        try:
+            cursor.execute('''
+                INSERT INTO recipes (name, output_item_id, output_quantity, requirement)
+                VALUES (?, ?, ?, ?)
+            ''', (recipe.name, recipe.output_item_id, recipe.output_quantity, recipe.requirement))
+        except sqlite3.IntegrityError:
+            return False
+        
+        recipe_id = cursor.lastrowid
+        cursor.executemany('''
+            INSERT INTO recipe_ingredients (recipe_id, item_id, quantity)
+            VALUES (?, ?, ?)
+        ''', [(recipe_id, item_id, quantity) for item_id, quantity in recipe.ingredients.items()])
+        return True
+
+    def get_names(self, tx: Optional[Transaction] = None) -> Set[str]:
+        """所有丹方名称"""
+        sql = 'SELECT name FROM recipes'
+        if tx is not None:
+            return {row[0] for row in tx.cursor().execute(sql).fetchall()}
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            return {row[0] for row in cursor.fetchall()}
+
+    def exists(self, name: str) -> bool:
+        """丹方是否已存在"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM recipes WHERE name = ?', (name,))
+            return cursor.fetchone() is not None
+
+    def get_all_recipes(self) -> List[Recipe]:
+        """获取所有丹方（包含材料）"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, name, output_item_id, output_quantity, requirement, created_at
+                FROM recipes
+            ''')
+            recipes = {}
+            for row in cursor.fetchall():
+                recipes[row["id"]] = Recipe(
+                    id=row["id"],
+                    name=row["name"],
+                    output_item_id=row["output_item_id"],
+                    output_quantity=row["output_quantity"] or 1,
+                    requirement=row["requirement"],
+                    created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None
+                )
+            
+            cursor.execute('SELECT recipe_id, item_id, quantity FROM recipe_ingredients')
+            for row in cursor.fetchall():
+                recipe = recipes.get(row[0])
+                if recipe:
+                    recipe.ingredients[row[1]] = row[2]
+            
+            return list(recipes.values())
+
+    def get_user_recipe_ids(self, user_id: str) -> Set[int]:
+        """获取玩家已学会的丹方ID"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT recipe_id FROM user_recipes WHERE user_id = ?', (user_id,))
+            return {row[0] for row in cursor.fetchall()}
+
+    def learn_recipe(self, user_id: str, recipe_id: int) -> bool:
+        """学会丹方，已学会时返回False"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR IGNORE INTO user_recipes (user_id, recipe_id) VALUES (?, ?)
+            ''', (user_id, recipe_id))
+            conn.commit()
+            return cursor.rowcount > 0
@@ -1,77 +1,56 @@
 import sqlite3
-from typing import Optional, List
+from typing import Optional, List, Set, Tuple
 from datetime import datetime
 from ..domain.models import Sect, UserSectContribution
+from ..database.connection import Transaction, get_connection
 
 
 class SqliteSectRepository:
     def __init__(self, db_path: str):
         self.db_path = db_path
-        self._init_table()
 
     def _get_connection(self):
         """获取数据库连接并配置WAL模式"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("PRAGMA journal_mode=WAL;")  # 启用WAL模式
-        conn.execute("PRAGMA synchronous=NORMAL;")  # 平衡性能和数据安全
-        conn.execute("PRAGMA cache_size=10000;")  # 增加缓存大小
-        conn.execute("PRAGMA temp_store=MEMORY;")  # 在内存中存储临时数据
-        conn.row_factory = sqlite3.Row
-        return conn
+        return get_connection(self.db_path)
 
-    def _init_table(self):
-        """初始化宗门相关表"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # 宗门表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sects (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL,
-                    description TEXT,
-                    founder_id TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    member_count INTEGER DEFAULT 1,
-                    contribution REAL DEFAULT 0,
-                    is_active BOOLEAN DEFAULT TRUE
-                )
-            ''')
-            
-            # 用户宗门贡献表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_sect_contributions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    sect_id INTEGER NOT NULL,
-                    contribution REAL DEFAULT 0,
-                    last_contribution_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id),
-                    FOREIGN KEY (sect_id) REFERENCES sects(id),
-                    UNIQUE(user_id, sect_id)
-                )
-            ''')
-            
-            conn.commit()
-
-    def create_sect(self, sect: Sect) -> bool:
-        """创建宗门"""
+    def create_sect(self, sect: Sect, tx: Optional[Transaction] = None) -> bool:
+        """创建宗门，传入 tx 时在该事务中执行"""
+        sql = '''
+            INSERT INTO sects (
+                name, description, founder_id, member_count, contribution
+            ) VALUES (?, ?, ?, ?, ?)
+        '''
+        params = (
+            sect.name, sect.description, sect.founder_id,
+            sect.member_count, sect.contribution
+        )
+        if tx is not None:
+            try:
+                tx.cursor().execute(sql, params)
+                return True
+            except sqlite3.IntegrityError:
+                return False
+        
         with self._get_connection() as conn:
             cursor = conn.cursor()
             try:
-                cursor.execute('''
-                    INSERT INTO sects (
-                        name, description, founder_id, member_count, contribution
-                    ) VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    sect.name, sect.description, sect.founder_id,
-                    sect.member_count, sect.contribution
-                ))
+                cursor.execute(sql, params)
                 conn.commit()
                 return True
             except sqlite3.IntegrityError:
                 return False
 
+    def get_names(self, tx: Optional[Transaction] = None) -> Set[str]:
+        """所有宗门名称（含已解散的宗门）"""
+        sql = 'SELECT name FROM sects'
+        if tx is not None:
+            return {row[0] for row in tx.cursor().execute(sql).fetchall()}
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            return {row[0] for row in cursor.fetchall()}
+
     def get_by_id(self, sect_id: int) -> Optional[Sect]:
         """根据ID获取宗门"""
         with self._get_connection() as conn:
@@ -90,7 +69,8 @@ class SqliteSectRepository:
                 created_at=datetime.fromisoformat(row[4]) if row[4] else None,
                 member_count=row[5] or 1,
                 contribution=row[6] or 0.0,
-                is_active=bool(row[7]) if row[7] is not None else True
+                is_active=bool(row[7]) if row[7] is not None else True,
+                treasury=row["treasury"] or 0.0
             )
 
     def get_by_name(self, name: str) -> Optional[Sect]:
@@ -111,7 +91,8 @@ class SqliteSectRepository:
                 created_at=datetime.fromisoformat(row[4]) if row[4] else None,
                 member_count=row[5] or 1,
                 contribution=row[6] or 0.0,
-                is_active=bool(row[7]) if row[7] is not None else True
+                is_active=bool(row[7]) if row[7] is not None else True,
+                treasury=row["treasury"] or 0.0
             )
 
     def get_all_sects(self) -> List[Sect]:
@@ -130,7 +111,8 @@ class SqliteSectRepository:
                     created_at=datetime.fromisoformat(row[4]) if row[4] else None,
                     member_count=row[5] or 1,
                     contribution=row[6] or 0.0,
-                    is_active=bool(row[7]) if row[7] is not None else True
+                    is_active=bool(row[7]) if row[7] is not None else True,
+                    treasury=row["treasury"] or 0.0
                 ))
             
             return sects
@@ -158,42 +140,60 @@ class SqliteSectRepository:
             conn.commit()
             return cursor.rowcount > 0
 
-    def add_user_contribution(self, user_id: str, sect_id: int, contribution: float) -> bool:
-        """添加用户对宗门的贡献"""
+    def add_member_count(self, sect_id: int, delta: int, tx: Optional[Transaction] = None) -> bool:
+        """增减宗门成员数，传入 tx 时与成员变动在同一事务中执行"""
+        sql = '''
+            UPDATE sects SET member_count = MAX(0, member_count + ?) WHERE id = ?
+        '''
+        if tx is not None:
+            cursor = tx.cursor()
+            cursor.execute(sql, (delta, sect_id))
+            return cursor.rowcount > 0
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (delta, sect_id))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def get_sect_ids_after(self, last_id: int, limit: int) -> List[int]:
+        """按ID顺序获取一批宗门ID，用于分批对账"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            
-            # 检查是否已有贡献记录
             cursor.execute('''
-                SELECT id, contribution FROM user_sect_contributions 
-                WHERE user_id = ? AND sect_id = ?
-            ''', (user_id, sect_id))
-            
-            row = cursor.fetchone()
-            if row:
-                # 更新贡献值
-                new_contribution = (row[1] or 0.0) + contribution
-                cursor.execute('''
-                    UPDATE user_sect_contributions 
-                    SET contribution = ?, last_contribution_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (new_contribution, row[0]))
-            else:
-                # 插入新记录
-                cursor.execute('''
-                    INSERT INTO user_sect_contributions (user_id, sect_id, contribution)
-                    VALUES (?, ?, ?)
-                ''', (user_id, sect_id, contribution))
-            
-            # 更新宗门总贡献
+                SELECT id FROM sects WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last_id, limit))
+            return [row[0] for row in cursor.fetchall()]
+
+    def reconcile_sect(self, sect_id: int) -> bool:
+        """根据成员表与贡献表重新计算宗门的成员数、总贡献与库房，返回是否有偏差被修正"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # 单条语句内完成读取与写入，不会覆盖并发的增量更新
             cursor.execute('''
-                UPDATE sects 
-                SET contribution = contribution + ? 
+                UPDATE sects SET
+                    member_count = (SELECT COUNT(*) FROM users WHERE sect_id = sects.id),
+                    contribution = (
+                        SELECT COALESCE(SUM(contribution), 0)
+                        FROM user_sect_contributions WHERE sect_id = sects.id
+                    ),
+                    treasury = (
+                        SELECT COALESCE(SUM(contribution - spent), 0)
+                        FROM user_sect_contributions WHERE sect_id = sects.id
+                    )
                 WHERE id = ?
-            ''', (contribution, sect_id))
-            
+                  AND (member_count != (SELECT COUNT(*) FROM users WHERE sect_id = sects.id)
+                       OR contribution != (
+                           SELECT COALESCE(SUM(contribution), 0)
+                           FROM user_sect_contributions WHERE sect_id = sects.id
+                       )
+                       OR treasury != (
+                           SELECT COALESCE(SUM(contribution - spent), 0)
+                           FROM user_sect_contributions WHERE sect_id = sects.id
+                       ))
+            ''', (sect_id,))
             conn.commit()
-            return True
+            return cursor.rowcount > 0
 
     def get_user_contribution(self, user_id: str, sect_id: int) -> Optional[UserSectContribution]:
         """获取用户对特定宗门的贡献"""
@@ -213,5 +213,144 @@ class SqliteSectRepository:
                 user_id=row[1],
                 sect_id=row[2],
                 contribution=row[3] or 0.0,
-                last_contribution_at=datetime.fromisoformat(row[4]) if row[4] else None
-            )
\ No newline at end of file
+                last_contribution_at=datetime.fromisoformat(row[4]) if row[4] else None,
+                spent=row["spent"] or 0.0
+            )
+
+    def append_ledger(self, user_id: str, sect_id: int, amount: float, reason: str,
+                      tx: Optional[Transaction] = None) -> bool:
+        """追加一条贡献流水（正数为获得，负数为消耗），由结算任务汇总到贡献表"""
+        sql = '''
+            INSERT INTO sect_contribution_ledger (user_id, sect_id, amount, reason)
+            VALUES (?, ?, ?, ?)
+        '''
+        if tx is not None:
+            tx.cursor().execute(sql, (user_id, sect_id, amount, reason))
+            return True
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (user_id, sect_id, amount, reason))
+            conn.commit()
+            return True
+
+    def get_contribution_balance(self, user_id: str, sect_id: int) -> float:
+        """获取可用贡献（已结算余额加未结算流水）"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT
+                    COALESCE((SELECT contribution - spent FROM user_sect_contributions
+                              WHERE user_id = ? AND sect_id = ?), 0)
+                  + COALESCE((SELECT SUM(amount) FROM sect_contribution_ledger
+                              WHERE settled = 0 AND sect_id = ? AND user_id = ?), 0)
+            ''', (user_id, sect_id, sect_id, user_id))
+            return cursor.fetchone()[0] or 0.0
+
+    def get_treasury(self, sect_id: int) -> float:
+        """获取宗门库房余额（已结算余额加未结算流水）"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT
+                    COALESCE((SELECT treasury FROM sects WHERE id = ?), 0)
+                  + COALESCE((SELECT SUM(amount) FROM sect_contribution_ledger
+                              WHERE settled = 0 AND sect_id = ?), 0)
+            ''', (sect_id, sect_id))
+            return cursor.fetchone()[0] or 0.0
+
+    def settle_ledger(self, batch_size: int) -> int:
+        """在一个事务中把最早的一批未结算流水汇总到贡献表与宗门表，返回结算条数"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT MAX(id), COUNT(*) FROM (
+                    SELECT id FROM sect_contribution_ledger
+                    WHERE settled = 0 ORDER BY id LIMIT ?
+                )
+            ''', (batch_size,))
+            max_id, count = cursor.fetchone()
+            if not count:
+                return 0
+            
+            # 按成员汇总获得与消耗
+            cursor.execute('''
+                INSERT INTO user_sect_contributions (user_id, sect_id, contribution, spent)
+                SELECT user_id, sect_id,
+                       SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END),
+                       SUM(CASE WHEN amount < 0 THEN -amount ELSE 0 END)
+                FROM sect_contribution_ledger
+                WHERE settled = 0 AND id <= ?
+                GROUP BY user_id, sect_id
+                ON CONFLICT(user_id, sect_id) DO UPDATE SET
+                    contribution = contribution + excluded.contribution,
+                    spent = spent + excluded.spent,
+                    last_contribution_at = CURRENT_TIMESTAMP
+            ''', (max_id,))
+            
+            # 按宗门汇总总贡献与库房
+            cursor.execute('''
+                UPDATE sects SET
+                    contribution = contribution + COALESCE((
+                        SELECT SUM(amount) FROM sect_contribution_ledger
+                        WHERE settled = 0 AND id <= ? AND sect_id = sects.id AND amount > 0
+                    ), 0),
+                    treasury = treasury + COALESCE((
+                        SELECT SUM(amount) FROM sect_contribution_ledger
+                        WHERE settled = 0 AND id <= ? AND sect_id = sects.id
+                    ), 0)
+                WHERE id IN (
+                    SELECT DISTINCT sect_id FROM sect_contribution_ledger
+                    WHERE settled = 0 AND id <= ?
+                )
+            ''', (max_id, max_id, max_id))
+            
+            cursor.execute('''
+                UPDATE sect_contribution_ledger SET settled = 1
+                WHERE settled = 0 AND id <= ?
+            ''', (max_id,))
+            
+            conn.commit()
+            return count
+
+    def delete_settled_ledger(self, retention_days: int, batch_size: int) -> int:
+        """删除一批超过保留天数的已结算流水，返回删除条数"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM sect_contribution_ledger WHERE id IN (
+                    SELECT id FROM sect_contribution_ledger
+                    WHERE settled = 1 AND created_at < datetime('now', ?)
+                    ORDER BY id LIMIT ?
+                )
+            ''', (f"-{retention_days} days", batch_size))
+            conn.commit()
+            return cursor.rowcount
+
+    def add_shop_item(self, item_id: int, price: float, tx: Optional[Transaction] = None) -> bool:
+        """上架贡献商店物品（已存在时忽略），传入 tx 时在该事务中执行"""
+        sql = '''
+            INSERT OR IGNORE INTO sect_shop_items (item_id, price) VALUES (?, ?)
+        '''
+        if tx is not None:
+            cursor = tx.cursor()
+            cursor.execute(sql, (item_id, price))
+            return cursor.rowcount > 0
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (item_id, price))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def get_shop_items(self) -> List[Tuple[int, str, Optional[str], float]]:
+        """获取贡献商店物品 (物品ID, 名称, 描述, 价格)"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT s.item_id, i.name, i.description, s.price
+                FROM sect_shop_items s
+                JOIN items i ON i.id = s.item_id
+                ORDER BY s.price, s.item_id
+            ''')
+            return [(row[0], row[1], row[2], row[3]) for row in cursor.fetchall()]
\ No newline at end of file
@@ -0,0 +1,73 @@
+from typing import Optional, List, Tuple
+from ..database.connection import get_connection
+
+
+class SqliteStatsRepository:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def _get_connection(self):
+        """获取数据库连接并配置WAL模式"""
+        return get_connection(self.db_path)
+
+    def add_to_bucket(self, user_id: str, metric: str, bucket: int, value: float) -> bool:
+        """累加玩家在某个小时桶内的统计值"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO user_stat_buckets (metric, bucket, user_id, value)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(metric, bucket, user_id)
+                DO UPDATE SET value = value + excluded.value
+            ''', (metric, bucket, user_id, value))
+            conn.commit()
+            return True
+
+    def get_window_ranking(self, metric: str, since_bucket: int, limit: int = 10,
+                           group_id: Optional[str] = None) -> List[Tuple[str, float]]:
+        """合并时间窗口内的小时桶，获取排行"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            if group_id:
+                cursor.execute('''
+                    SELECT user_id, SUM(value) AS total
+                    FROM user_stat_buckets
+                    WHERE metric = ? AND bucket >= ?
+                      AND user_id IN (SELECT user_id FROM group_members WHERE group_id = ?)
+                    GROUP BY user_id
+                    HAVING total > 0
+                    ORDER BY total DESC
+                    LIMIT ?
+                ''', (metric, since_bucket, group_id, limit))
+            else:
+                cursor.execute('''
+                    SELECT user_id, SUM(value) AS total
+                    FROM user_stat_buckets
+                    WHERE metric = ? AND bucket >= ?
+                    GROUP BY user_id
+                    HAVING total > 0
+                    ORDER BY total DESC
+                    LIMIT ?
+                ''', (metric, since_bucket, limit))
+
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+
+    def get_oldest_bucket(self, metric: str) -> Optional[int]:
+        """获取某个统计项最早的小时桶编号"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT MIN(bucket) FROM user_stat_buckets WHERE metric = ?
+            ''', (metric,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def delete_bucket(self, metric: str, bucket: int) -> int:
+        """删除某个小时桶，返回删除的行数"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM user_stat_buckets WHERE metric = ? AND bucket = ?
+            ''', (metric, bucket))
+            conn.commit()
+            return cursor.rowcount
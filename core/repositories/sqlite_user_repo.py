@@ -1,71 +1,69 @@
-import sqlite3
-from typing import Optional, List
+from typing import Optional, List, Callable, Tuple
 from datetime import datetime
-from ..domain.models import User
+from ..domain.models import User, RankEntry, SectMember, Sect
+from ..database.connection import Transaction, get_connection
+
+
+class StaleUserError(Exception):
+    """用户数据已被其他操作修改（版本号不一致）"""
+
+    def __init__(self, user_id: str):
+        super().__init__(f"用户 {user_id} 的数据已被修改")
+        self.user_id = user_id
 
 
 class SqliteUserRepository:
     def __init__(self, db_path: str):
         self.db_path = db_path
-        self._init_table()
+        # 用户写入监听器，用于同步内存中的排行榜、索引等
+        self._listeners: List[Callable[[User], None]] = []
+
+    def add_listener(self, listener: Callable[[User], None]):
+        """注册用户写入监听器（写入提交后调用，监听器不应抛出异常）"""
+        self._listeners.append(listener)
+
+    def _notify(self, user: Optional[User]):
+        """通知所有监听器用户数据已变更"""
+        if user is None:
+            return
+        for listener in self._listeners:
+            listener(user)
 
     def _get_connection(self):
         """获取数据库连接并配置WAL模式"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("PRAGMA journal_mode=WAL;")  # 启用WAL模式
-        conn.execute("PRAGMA synchronous=NORMAL;")  # 平衡性能和数据安全
-        conn.execute("PRAGMA cache_size=10000;")  # 增加缓存大小
-        conn.execute("PRAGMA temp_store=MEMORY;")  # 在内存中存储临时数据
-        conn.row_factory = sqlite3.Row
-        return conn
+        return get_connection(self.db_path)
 
-    def _init_table(self):
-        """初始化用户表"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # 创建用户表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT UNIQUE NOT NULL,
-                    nickname TEXT,
-                    avatar TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    
-                    cultivation REAL DEFAULT 0,
-                    realm TEXT DEFAULT '凡人',
-                    talent TEXT,
-                    dao_name TEXT,
-                    sect_id INTEGER,
-                    sect_position TEXT,
-                    
-                    is_hermit BOOLEAN DEFAULT FALSE,
-                    is_in_closing BOOLEAN DEFAULT FALSE,
-                    closing_start_time TIMESTAMP,
-                    closing_duration INTEGER,
-                    deep_closing_end_time TIMESTAMP,
-                    
-                    last_closing_time TIMESTAMP,
-                    last_battle_time TIMESTAMP,
-                    last_sect_roll_call_time TIMESTAMP,
-                    
-                    total_closing_count INTEGER DEFAULT 0,
-                    total_battle_count INTEGER DEFAULT 0,
-                    total_battle_win_count INTEGER DEFAULT 0,
-                    total_exp_gained INTEGER DEFAULT 0
-                )
-            ''')
-            
-            # 检查并添加 unified_msg_origin 字段（如果不存在）
-            try:
-                cursor.execute("ALTER TABLE users ADD COLUMN unified_msg_origin TEXT")
-            except sqlite3.OperationalError:
-                # 字段已存在，忽略错误
-                pass
-                
-            conn.commit()
+    def _row_to_user(self, row) -> User:
+        """将查询结果行转换为用户实体"""
+        # 按列名取值，新旧数据库中后加字段的列顺序可能不同
+        return User(
+            id=row["id"],
+            user_id=row["user_id"],
+            nickname=row["nickname"],
+            avatar=row["avatar"],
+            created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None,
+            last_login_at=datetime.fromisoformat(row["last_login_at"]) if row["last_login_at"] else None,
+            cultivation=row["cultivation"] or 0.0,
+            realm=row["realm"] or "凡人",
+            talent=row["talent"],
+            dao_name=row["dao_name"],
+            sect_id=row["sect_id"],
+            sect_position=row["sect_position"],
+            is_hermit=bool(row["is_hermit"]),
+            is_in_closing=bool(row["is_in_closing"]),
+            closing_start_time=datetime.fromisoformat(row["closing_start_time"]) if row["closing_start_time"] else None,
+            closing_duration=row["closing_duration"],
+            deep_closing_end_time=datetime.fromisoformat(row["deep_closing_end_time"]) if row["deep_closing_end_time"] else None,
+            last_closing_time=datetime.fromisoformat(row["last_closing_time"]) if row["last_closing_time"] else None,
+            last_battle_time=datetime.fromisoformat(row["last_battle_time"]) if row["last_battle_time"] else None,
+            last_sect_roll_call_time=datetime.fromisoformat(row["last_sect_roll_call_time"]) if row["last_sect_roll_call_time"] else None,
+            total_closing_count=row["total_closing_count"] or 0,
+            total_battle_count=row["total_battle_count"] or 0,
+            total_battle_win_count=row["total_battle_win_count"] or 0,
+            total_exp_gained=row["total_exp_gained"] or 0,
+            unified_msg_origin=row["unified_msg_origin"],
+            version=row["version"] or 0
+        )
 
     def create_user(self, user_id: str, nickname: Optional[str] = None) -> User:
         """创建新用户"""
@@ -77,7 +75,9 @@ class SqliteUserRepository:
             ''', (user_id, nickname))
             conn.commit()
             
-            return self.get_by_user_id(user_id)
+        user = self.get_by_user_id(user_id)
+        self._notify(user)
+        return user
 
     def get_by_user_id(self, user_id: str) -> Optional[User]:
         """根据用户ID获取用户"""
@@ -89,155 +89,148 @@ class SqliteUserRepository:
             if not row:
                 return None
                 
-            # 处理可能缺少 unified_msg_origin 字段的情况
-            unified_msg_origin = None
-            try:
-                unified_msg_origin = row[24]
-            except IndexError:
-                # 字段不存在，使用默认值 None
-                pass
-                
-            return User(
-                id=row[0],
-                user_id=row[1],
-                nickname=row[2],
-                avatar=row[3],
-                created_at=datetime.fromisoformat(row[4]) if row[4] else None,
-                last_login_at=datetime.fromisoformat(row[5]) if row[5] else None,
-                cultivation=row[6] or 0.0,
-                realm=row[7] or "凡人",
-                talent=row[8],
-                dao_name=row[9],
-                sect_id=row[10],
-                sect_position=row[11],
-                is_hermit=bool(row[12]),
-                is_in_closing=bool(row[13]),
-                closing_start_time=datetime.fromisoformat(row[14]) if row[14] else None,
-                closing_duration=row[15],
-                deep_closing_end_time=datetime.fromisoformat(row[16]) if row[16] else None,
-                last_closing_time=datetime.fromisoformat(row[17]) if row[17] else None,
-                last_battle_time=datetime.fromisoformat(row[18]) if row[18] else None,
-                last_sect_roll_call_time=datetime.fromisoformat(row[19]) if row[19] else None,
-                total_closing_count=row[20] or 0,
-                total_battle_count=row[21] or 0,
-                total_battle_win_count=row[22] or 0,
-                total_exp_gained=row[23] or 0,
-                unified_msg_origin=unified_msg_origin
-            )
+            return self._row_to_user(row)
 
-    def update_user(self, user: User) -> bool:
-        """更新用户信息"""
+    def get_with_sect(self, user_id: str) -> Tuple[Optional[User], Optional[Sect]]:
+        """联表查询用户及其所在宗门"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute('''
+                SELECT u.*,
+                       s.id AS s_id, s.name AS s_name, s.description AS s_description,
+                       s.founder_id AS s_founder_id, s.created_at AS s_created_at,
+                       s.member_count AS s_member_count, s.contribution AS s_contribution,
+                       s.is_active AS s_is_active, s.treasury AS s_treasury
+                FROM users u
+                LEFT JOIN sects s ON s.id = u.sect_id
+                WHERE u.user_id = ?
+            ''', (user_id,))
+            row = cursor.fetchone()
             
-            # 检查表结构是否包含 unified_msg_origin 字段
-            cursor.execute("PRAGMA table_info(users)")
-            columns = [column[1] for column in cursor.fetchall()]
+            if not row:
+                return None, None
             
-            if 'unified_msg_origin' in columns:
-                # 如果字段存在，更新所有字段
-                cursor.execute('''
-                    UPDATE users SET
-                        nickname = ?,
-                        avatar = ?,
-                        last_login_at = ?,
-                        cultivation = ?,
-                        realm = ?,
-                        talent = ?,
-                        dao_name = ?,
-                        sect_id = ?,
-                        sect_position = ?,
-                        is_hermit = ?,
-                        is_in_closing = ?,
-                        closing_start_time = ?,
-                        closing_duration = ?,
-                        deep_closing_end_time = ?,
-                        last_closing_time = ?,
-                        last_battle_time = ?,
-                        last_sect_roll_call_time = ?,
-                        total_closing_count = ?,
-                        total_battle_count = ?,
-                        total_battle_win_count = ?,
-                        total_exp_gained = ?,
-                        unified_msg_origin = ?
-                    WHERE user_id = ?
-                ''', (
-                    user.nickname,
-                    user.avatar,
-                    user.last_login_at.isoformat() if user.last_login_at else None,
-                    user.cultivation,
-                    user.realm,
-                    user.talent,
-                    user.dao_name,
-                    user.sect_id,
-                    user.sect_position,
-                    user.is_hermit,
-                    user.is_in_closing,
-                    user.closing_start_time.isoformat() if user.closing_start_time else None,
-                    user.closing_duration,
-                    user.deep_closing_end_time.isoformat() if user.deep_closing_end_time else None,
-                    user.last_closing_time.isoformat() if user.last_closing_time else None,
-                    user.last_battle_time.isoformat() if user.last_battle_time else None,
-                    user.last_sect_roll_call_time.isoformat() if user.last_sect_roll_call_time else None,
-                    user.total_closing_count,
-                    user.total_battle_count,
-                    user.total_battle_win_count,
-                    user.total_exp_gained,
-                    user.unified_msg_origin,
-                    user.user_id
-                ))
-            else:
-                # 如果字段不存在，只更新原有字段
-                cursor.execute('''
-                    UPDATE users SET
-                        nickname = ?,
-                        avatar = ?,
-                        last_login_at = ?,
-                        cultivation = ?,
-                        realm = ?,
-                        talent = ?,
-                        dao_name = ?,
-                        sect_id = ?,
-                        sect_position = ?,
-                        is_hermit = ?,
-                        is_in_closing = ?,
-                        closing_start_time = ?,
-                        closing_duration = ?,
-                        deep_closing_end_time = ?,
-                        last_closing_time = ?,
-                        last_battle_time = ?,
-                        last_sect_roll_call_time = ?,
-                        total_closing_count = ?,
-                        total_battle_count = ?,
-                        total_battle_win_count = ?,
-                        total_exp_gained = ?
-                    WHERE user_id = ?
-                ''', (
-                    user.nickname,
-                    user.avatar,
-                    user.last_login_at.isoformat() if user.last_login_at else None,
-                    user.cultivation,
-                    user.realm,
-                    user.talent,
-                    user.dao_name,
-                    user.sect_id,
-                    user.sect_position,
-                    user.is_hermit,
-                    user.is_in_closing,
-                    user.closing_start_time.isoformat() if user.closing_start_time else None,
-                    user.closing_duration,
-                    user.deep_closing_end_time.isoformat() if user.deep_closing_end_time else None,
-                    user.last_closing_time.isoformat() if user.last_closing_time else None,
-                    user.last_battle_time.isoformat() if user.last_battle_time else None,
-                    user.last_sect_roll_call_time.isoformat() if user.last_sect_roll_call_time else None,
-                    user.total_closing_count,
-                    user.total_battle_count,
-                    user.total_battle_win_count,
-                    user.total_exp_gained,
-                    user.user_id
-                ))
+            sect = None
+            if row["s_id"] is not None:
+                sect = Sect(
+                    id=row["s_id"],
+                    name=row["s_name"],
+                    description=row["s_description"],
+                    founder_id=row["s_founder_id"],
+                    created_at=datetime.fromisoformat(row["s_created_at"]) if row["s_created_at"] else None,
+                    member_count=row["s_member_count"] or 1,
+                    contribution=row["s_contribution"] or 0.0,
+                    is_active=bool(row["s_is_active"]) if row["s_is_active"] is not None else True,
+                    treasury=row["s_treasury"] or 0.0
+                )
+            return self._row_to_user(row), sect
+
+    def update_user(self, user: User, tx: Optional[Transaction] = None) -> bool:
+        """更新用户信息
+
+        仅当数据库中的版本号与 user.version 一致时写入，否则抛出 StaleUserError；
+        传入 tx 时在该事务中执行，提交后再更新版本号并通知监听器
+        """
+        if tx is not None:
+            updated = self._compare_and_update(tx.cursor(), user)
+            if updated:
+                tx.after_commit(lambda: self._on_updated(user))
+            return updated
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            updated = self._compare_and_update(cursor, user)
+            conn.commit()
+            
+        if updated:
+            self._on_updated(user)
+        return updated
+
+    def update_users(self, users: List[User]) -> bool:
+        """在同一事务中更新多个用户，任一用户版本冲突时全部回滚"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for user in users:
+                    if not self._compare_and_update(cursor, user):
+                        conn.rollback()
+                        return False
+            except StaleUserError:
+                conn.rollback()
+                raise
             conn.commit()
-            return cursor.rowcount > 0
+            
+        for user in users:
+            self._on_updated(user)
+        return True
+
+    def _on_updated(self, user: User):
+        """写入提交后同步内存中的版本号并通知监听器"""
+        user.version += 1
+        self._notify(user)
+
+    def _compare_and_update(self, cursor, user: User) -> bool:
+        """按版本号比较并写入，用户不存在时返回 False"""
+        cursor.execute('''
+            UPDATE users SET
+                nickname = ?,
+                avatar = ?,
+                last_login_at = ?,
+                cultivation = ?,
+                realm = ?,
+                talent = ?,
+                dao_name = ?,
+                sect_id = ?,
+                sect_position = ?,
+                is_hermit = ?,
+                is_in_closing = ?,
+                closing_start_time = ?,
+                closing_duration = ?,
+                deep_closing_end_time = ?,
+                last_closing_time = ?,
+                last_battle_time = ?,
+                last_sect_roll_call_time = ?,
+                total_closing_count = ?,
+                total_battle_count = ?,
+                total_battle_win_count = ?,
+                total_exp_gained = ?,
+                unified_msg_origin = ?,
+                version = version + 1
+            WHERE user_id = ? AND version = ?
+        ''', (
+            user.nickname,
+            user.avatar,
+            user.last_login_at.isoformat() if user.last_login_at else None,
+            user.cultivation,
+            user.realm,
+            user.talent,
+            user.dao_name,
+            user.sect_id,
+            user.sect_position,
+            user.is_hermit,
+            user.is_in_closing,
+            user.closing_start_time.isoformat() if user.closing_start_time else None,
+            user.closing_duration,
+            user.deep_closing_end_time.isoformat() if user.deep_closing_end_time else None,
+            user.last_closing_time.isoformat() if user.last_closing_time else None,
+            user.last_battle_time.isoformat() if user.last_battle_time else None,
+            user.last_sect_roll_call_time.isoformat() if user.last_sect_roll_call_time else None,
+            user.total_closing_count,
+            user.total_battle_count,
+            user.total_battle_win_count,
+            user.total_exp_gained,
+            user.unified_msg_origin,
+            user.user_id,
+            user.version
+        ))
+        if cursor.rowcount > 0:
+            return True
+        
+        # 区分用户不存在与版本冲突
+        cursor.execute('SELECT 1 FROM users WHERE user_id = ?', (user.user_id,))
+        if cursor.fetchone():
+            raise StaleUserError(user.user_id)
+        return False
 
     def get_cultivation_ranking(self, limit: int = 10) -> List[User]:
         """获取修为排行榜"""
@@ -250,40 +243,35 @@ class SqliteUserRepository:
                 LIMIT ?
             ''', (limit,))
             
-            users = []
-            for row in cursor.fetchall():
-                # 处理可能缺少 unified_msg_origin 字段的情况
-                unified_msg_origin = None
-                if len(row) > 24:  # 检查是否有 unified_msg_origin 字段
-                    unified_msg_origin = row[24]
-                    
-                users.append(User(
-                    id=row[0],
-                    user_id=row[1],
-                    nickname=row[2],
-                    avatar=row[3],
-                    created_at=datetime.fromisoformat(row[4]) if row[4] else None,
-                    last_login_at=datetime.fromisoformat(row[5]) if row[5] else None,
-                    cultivation=row[6] or 0.0,
-                    realm=row[7] or "凡人",
-                    talent=row[8],
-                    dao_name=row[9],
-                    sect_id=row[10],
-                    sect_position=row[11],
-                    is_hermit=bool(row[12]),
-                    is_in_closing=bool(row[13]),
-                    closing_start_time=datetime.fromisoformat(row[14]) if row[14] else None,
-                    closing_duration=row[15],
-                    deep_closing_end_time=datetime.fromisoformat(row[16]) if row[16] else None,
-                    last_closing_time=datetime.fromisoformat(row[17]) if row[17] else None,
-                    last_battle_time=datetime.fromisoformat(row[18]) if row[18] else None,
-                    last_sect_roll_call_time=datetime.fromisoformat(row[19]) if row[19] else None,
-                    total_closing_count=row[20] or 0,
-                    total_battle_count=row[21] or 0,
-                    total_battle_win_count=row[22] or 0,
-                    total_exp_gained=row[23] or 0,
-                    unified_msg_origin=unified_msg_origin
-                ))
+            users = [self._row_to_user(row) for row in cursor.fetchall()]
+            
+            return users
+
+    def get_battle_win_ranking(self, limit: int = 10) -> List[User]:
+        """获取斗法胜场排行榜"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM users 
+                WHERE total_battle_win_count > 0 
+                ORDER BY total_battle_win_count DESC 
+                LIMIT ?
+            ''', (limit,))
+            
+            users = [self._row_to_user(row) for row in cursor.fetchall()]
+            
+            return users
+
+    def get_battle_candidates(self) -> List[User]:
+        """获取所有可被斗法的修士（已检测灵根且未避世）"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM users 
+                WHERE talent IS NOT NULL AND is_hermit = 0
+            ''')
+            
+            users = [self._row_to_user(row) for row in cursor.fetchall()]
             
             return users
 
@@ -296,39 +284,80 @@ class SqliteUserRepository:
                 WHERE is_in_closing = 1
             ''')
             
-            users = []
-            for row in cursor.fetchall():
-                # 处理可能缺少 unified_msg_origin 字段的情况
-                unified_msg_origin = None
-                if len(row) > 24:  # 检查是否有 unified_msg_origin 字段
-                    unified_msg_origin = row[24]
-                    
-                users.append(User(
-                    id=row[0],
-                    user_id=row[1],
-                    nickname=row[2],
-                    avatar=row[3],
-                    created_at=datetime.fromisoformat(row[4]) if row[4] else None,
-                    last_login_at=datetime.fromisoformat(row[5]) if row[5] else None,
-                    cultivation=row[6] or 0.0,
-                    realm=row[7] or "凡人",
-                    talent=row[8],
-                    dao_name=row[9],
-                    sect_id=row[10],
-                    sect_position=row[11],
-                    is_hermit=bool(row[12]),
-                    is_in_closing=bool(row[13]),
-                    closing_start_time=datetime.fromisoformat(row[14]) if row[14] else None,
-                    closing_duration=row[15],
-                    deep_closing_end_time=datetime.fromisoformat(row[16]) if row[16] else None,
-                    last_closing_time=datetime.fromisoformat(row[17]) if row[17] else None,
-                    last_battle_time=datetime.fromisoformat(row[18]) if row[18] else None,
-                    last_sect_roll_call_time=datetime.fromisoformat(row[19]) if row[19] else None,
-                    total_closing_count=row[20] or 0,
-                    total_battle_count=row[21] or 0,
-                    total_battle_win_count=row[22] or 0,
-                    total_exp_gained=row[23] or 0,
-                    unified_msg_origin=unified_msg_origin
-                ))
+            users = [self._row_to_user(row) for row in cursor.fetchall()]
+            
+            return users
+
+    def get_rank_entries(self, user_ids: List[str]) -> List[RankEntry]:
+        """批量获取用户的排行展示数据"""
+        if not user_ids:
+            return []
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ",".join("?" * len(user_ids))
+            cursor.execute(f'''
+                SELECT user_id, nickname, dao_name, realm, cultivation
+                FROM users
+                WHERE user_id IN ({placeholders})
+            ''', tuple(user_ids))
+            
+            return [
+                RankEntry(
+                    user_id=row[0],
+                    nickname=row[1],
+                    dao_name=row[2],
+                    realm=row[3] or "凡人",
+                    cultivation=row[4] or 0.0
+                )
+                for row in cursor.fetchall()
+            ]
+
+    def get_all_name_entries(self) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """获取所有用户的道号与昵称，用于构建名称索引"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT user_id, dao_name, nickname FROM users
+            ''')
+            
+            return [(row[0], row[1], row[2]) for row in cursor.fetchall()]
+
+    def get_sect_members(self, sect_id: int, order_by: str = "contribution",
+                         limit: int = 10, offset: int = 0) -> List[SectMember]:
+        """分页获取宗门成员及其贡献，order_by 为 contribution 或 cultivation"""
+        if order_by == "cultivation":
+            order_clause = "u.cultivation DESC, u.user_id"
+        else:
+            order_clause = "contribution DESC, u.cultivation DESC, u.user_id"
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT u.user_id, u.nickname, u.dao_name, u.realm, u.cultivation, u.sect_position,
+                       COALESCE(c.contribution, 0) AS contribution
+                FROM users u
+                LEFT JOIN user_sect_contributions c
+                    ON c.user_id = u.user_id AND c.sect_id = u.sect_id
+                WHERE u.sect_id = ?
+                ORDER BY {order_clause}
+                LIMIT ? OFFSET ?
+            ''', (sect_id, limit, offset))
             
-            return users
\ No newline at end of file
+            return [
+                SectMember(
+                    user_id=row[0],
+                    nickname=row[1],
+                    dao_name=row[2],
+                    realm=row[3] or "凡人",
+                    cultivation=row[4] or 0.0,
+                    sect_position=row[5],
+                    contribution=row[6] or 0.0
+                )
+                for row in cursor.fetchall()
+            ]
+
+    def count_sect_members(self, sect_id: int) -> int:
+        """统计宗门成员数量"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM users WHERE sect_id = ?', (sect_id,))
+            return cursor.fetchone()[0]
\ No newline at end of file
@@ -0,0 +1,154 @@
+from typing import Dict, List, Optional, Set, Tuple
+from ..domain.models import User, Recipe
+from ..repositories.sqlite_recipe_repo import SqliteRecipeRepository
+from ..repositories.sqlite_inventory_repo import SqliteInventoryRepository
+from ..repositories.sqlite_item_repo import SqliteItemRepository
+from ..database.connection import transaction
+from .item_effect_engine import compile_requirement
+
+
+class AlchemyService:
+    """炼丹：按材料与产出建立索引的丹方图"""
+
+    # 单次炼制的最大炉数
+    MAX_BATCH = 99
+
+    def __init__(self,
+                 recipe_repo: SqliteRecipeRepository,
+                 inventory_repo: SqliteInventoryRepository,
+                 item_repo: SqliteItemRepository,
+                 config: dict):
+        self.recipe_repo = recipe_repo
+        self.inventory_repo = inventory_repo
+        self.item_repo = item_repo
+        self.config = config
+
+        self._recipes: Dict[int, Recipe] = {}
+        self._by_name: Dict[str, int] = {}
+        # 材料物品ID -> 使用该材料的丹方ID
+        self._by_ingredient: Dict[int, Set[int]] = {}
+        # 产出物品ID -> 产出该物品的丹方ID
+        self._by_output: Dict[int, List[int]] = {}
+        self._requirements = {}
+        self._item_names: Dict[int, str] = {}
+        self._loaded = False
+
+    def find_recipe(self, name: str) -> Optional[Recipe]:
+        """按丹方名称或产出物品名称查找丹方"""
+        self._ensure_loaded()
+        recipe_id = self._by_name.get(name)
+        if recipe_id is None:
+            item = self.item_repo.get_by_name(name)
+            output_ids = self._by_output.get(item.id) if item else None
+            if not output_ids:
+                return None
+            recipe_id = output_ids[0]
+        return self._recipes[recipe_id]
+
+    def get_learned_recipes(self, user_id: str) -> List[Recipe]:
+        """获取玩家已学会的丹方"""
+        self._ensure_loaded()
+        return [self._recipes[recipe_id] for recipe_id in sorted(self.recipe_repo.get_user_recipe_ids(user_id))
+                if recipe_id in self._recipes]
+
+    def get_learnable_recipes(self, user: User) -> List[Recipe]:
+        """获取玩家尚未学会的丹方"""
+        self._ensure_loaded()
+        learned = self.recipe_repo.get_user_recipe_ids(user.user_id)
+        return [recipe for recipe_id, recipe in sorted(self._recipes.items()) if recipe_id not in learned]
+
+    def learn(self, user: User, name: str) -> Tuple[bool, str]:
+        """学习丹方"""
+        recipe = self.find_recipe(name)
+        if not recipe:
+            return False, f"未找到丹方: {name}"
+
+        requirement = self._requirements.get(recipe.id)
+        if requirement and not requirement(user):
+            return False, f"不满足学习条件: {recipe.requirement}"
+
+        if not self.recipe_repo.learn_recipe(user.user_id, recipe.id):
+            return False, f"你已经学会了{recipe.name}"
+        return True, f"你学会了{recipe.name}，可炼制 {self.describe(recipe)}"
+
+    def get_craftable(self, user_id: str,
+                      quantities: Optional[Dict[int, int]] = None) -> List[Tuple[Recipe, int]]:
+        """获取当前可以炼制的丹方及最多可炼炉数，可传入已加载的物品数量"""
+        self._ensure_loaded()
+        learned = self.recipe_repo.get_user_recipe_ids(user_id)
+        if not learned:
+            return []
+        if quantities is None:
+            quantities = self.inventory_repo.get_item_quantities(user_id)
+
+        # 从持有的材料出发查索引，只检查用得上这些材料的丹方
+        candidates = set()
+        for item_id in quantities:
+            candidates |= self._by_ingredient.get(item_id, set())
+        candidates &= learned
+
+        craftable = []
+        for recipe_id in sorted(candidates):
+            recipe = self._recipes[recipe_id]
+            batches = self._max_batches(recipe, quantities)
+            if batches > 0:
+                craftable.append((recipe, batches))
+        return craftable
+
+    def craft(self, user: User, name: str, batches: int = 1) -> Tuple[bool, str]:
+        """炼制丹药，材料扣减与成品发放在同一事务中完成"""
+        if batches <= 0:
+            return False, "炼制数量必须大于0"
+        if batches > self.MAX_BATCH:
+            return False, f"单次最多炼制 {self.MAX_BATCH} 炉"
+
+        recipe = self.find_recipe(name)
+        if not recipe:
+            return False, f"未找到丹方: {name}"
+        if recipe.id not in self.recipe_repo.get_user_recipe_ids(user.user_id):
+            return False, f"你尚未学会{recipe.name}，请先使用「学习 {recipe.name}」"
+
+        consumed = {item_id: quantity * batches for item_id, quantity in recipe.ingredients.items()}
+        produced = recipe.output_quantity * batches
+        with transaction(self.inventory_repo.db_path) as tx:
+            if not self.inventory_repo.remove_items(user.user_id, consumed, tx):
+                return False, f"材料不足，炼制 {batches} 炉{recipe.name}需要：{self._describe_items(consumed)}"
+            self.inventory_repo.add_items(user.user_id, {recipe.output_item_id: produced}, tx)
+
+        return True, f"炼制成功，消耗 {self._describe_items(consumed)}，获得 {self._item_name(recipe.output_item_id)} x{produced}"
+
+    def describe(self, recipe: Recipe) -> str:
+        """丹方说明：材料 -> 产出"""
+        return (f"{self._describe_items(recipe.ingredients)} → "
+                f"{self._item_name(recipe.output_item_id)} x{recipe.output_quantity}")
+
+    def _max_batches(self, recipe: Recipe, quantities: Dict[int, int]) -> int:
+        """按持有材料计算最多可炼炉数"""
+        if not recipe.ingredients:
+            return 0
+        return min(quantities.get(item_id, 0) // quantity for item_id, quantity in recipe.ingredients.items())
+
+    def _describe_items(self, items: Dict[int, int]) -> str:
+        return "、".join(f"{self._item_name(item_id)} x{quantity}" for item_id, quantity in items.items())
+
+    def _item_name(self, item_id: int) -> str:
+        name = self._item_names.get(item_id)
+        if name is None:
+            item = self.item_repo.get_by_id(item_id)
+            name = item.name if item else f"物品{item_id}"
+            self._item_names[item_id] = name
+        return name
+
+    def _ensure_loaded(self):
+        """首次使用时加载丹方并建立索引"""
+        if self._loaded:
+            return
+        for recipe in self.recipe_repo.get_all_recipes():
+            self._recipes[recipe.id] = recipe
+            self._by_name[recipe.name] = recipe.id
+            self._by_output.setdefault(recipe.output_item_id, []).append(recipe.id)
+            for item_id in recipe.ingredients:
+                self._by_ingredient.setdefault(item_id, set()).add(recipe.id)
+            self._requirements[recipe.id] = compile_requirement(recipe.requirement)
+        self._item_names = {item.id: item.name for item in self.item_repo.get_all_items()}
+        self._loaded = True
@@ -1,10 +1,13 @@
 import random
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional, Tuple, List
 from ..domain.models import User
 from ..repositories.sqlite_user_repo import SqliteUserRepository
 from ..repositories.sqlite_inventory_repo import SqliteInventoryRepository
 from ..repositories.sqlite_log_repo import SqliteLogRepository
+from .stats_service import StatsService
+from .cooldown_service import CooldownService
+from .concurrency import retry_on_conflict
 
 
 class ArenaService:
@@ -12,40 +15,60 @@ class ArenaService:
                  user_repo: SqliteUserRepository,
                  inventory_repo: SqliteInventoryRepository,
                  log_repo: SqliteLogRepository,
-                 config: dict):
+                 cooldown_service: CooldownService,
+                 config: dict,
+                 stats_service: StatsService):
         self.user_repo = user_repo
         self.inventory_repo = inventory_repo
         self.log_repo = log_repo
+        self.cooldown_service = cooldown_service
         self.config = config
+        self.stats_service = stats_service
 
+    def check_battle_cooldown(self, user_id: str) -> Tuple[bool, str]:
+        """检查斗法冷却（只查内存，无需加载用户）"""
+        remaining = self.cooldown_service.remaining(user_id, CooldownService.BATTLE)
+        if remaining > 0:
+            return False, f"斗法冷却中，还需等待 {remaining} 秒"
+        return True, ""
+
+    def check_can_battle(self, attacker: User) -> Tuple[bool, str]:
+        """检查攻击方当前能否发起斗法"""
+        # 检查冷却时间
+        can_battle, message = self.check_battle_cooldown(attacker.user_id)
+        if not can_battle:
+            return False, message
+        
+        if attacker.is_hermit:
+            return False, "你处于避世状态，无法攻击他人"
+            
+        return True, ""
+
+    @retry_on_conflict
     def battle(self, attacker: User, defender_user_id: str) -> Tuple[bool, str]:
         """斗法"""
-        # 检查冷却时间
-        cooldown_seconds = self.config.get("re_xiuxian", {}).get("battle_cooldown", 300)
-        if attacker.last_battle_time:
-            if datetime.now() < attacker.last_battle_time + timedelta(seconds=cooldown_seconds):
-                remaining = (attacker.last_battle_time + timedelta(seconds=cooldown_seconds) - datetime.now()).seconds
-                return False, f"斗法冷却中，还需等待 {remaining} 秒"
+        can_battle, message = self.check_can_battle(attacker)
+        if not can_battle:
+            return False, message
         
+        if defender_user_id == attacker.user_id:
+            return False, "不能与自己斗法"
+            
         # 获取防守方
         defender = self.user_repo.get_by_user_id(defender_user_id)
         if not defender:
             return False, "未找到对手"
             
-        # 检查是否可以攻击
-        if attacker.is_hermit:
-            return False, "你处于避世状态，无法攻击他人"
+        if not defender.talent:
+            return False, "对方尚未踏入修仙之路"
             
+        # 检查是否可以攻击
         if defender.is_hermit:
             return False, "对手处于避世状态，无法攻击"
             
-        # 简单的胜负判断（基于修为）
-        attacker_power = attacker.cultivation
-        defender_power = defender.cultivation
-        
-        # 考虑境界差异
-        attacker_power *= self._get_realm_multiplier(attacker.realm)
-        defender_power *= self._get_realm_multiplier(defender.realm)
+        # 简单的胜负判断（基于修为与境界）
+        attacker_power = self.get_effective_power(attacker)
+        defender_power = self.get_effective_power(defender)
         
         # 添加随机因素
         attacker_power *= random.uniform(0.8, 1.2)
@@ -65,11 +88,13 @@ class ArenaService:
             defender.cultivation = max(0, defender.cultivation - reward)
             defender.total_battle_count += 1
             
-            self.user_repo.update_user(attacker)
-            self.user_repo.update_user(defender)
+            # 双方在同一事务中写入，任一方数据已变化时整体重试
+            self.user_repo.update_users([attacker, defender])
+            self.cooldown_service.consume(attacker.user_id, CooldownService.BATTLE, now=attacker.last_battle_time)
             
             self.log_repo.add_log(attacker.user_id, "斗法", f"战胜 {defender.nickname or defender.user_id}，获得 {reward} 点修为")
             self.log_repo.add_log(defender.user_id, "斗法", f"败给 {attacker.nickname or attacker.user_id}，损失 {reward} 点修为")
+            self.stats_service.record_safely(attacker.user_id, "battle_win", 1)
             
             return True, f"斗法胜利！获得 {reward} 点修为"
         else:
@@ -87,11 +112,13 @@ class ArenaService:
             defender.total_battle_count += 1
             defender.total_battle_win_count += 1
             
-            self.user_repo.update_user(attacker)
-            self.user_repo.update_user(defender)
+            # 双方在同一事务中写入，任一方数据已变化时整体重试
+            self.user_repo.update_users([attacker, defender])
+            self.cooldown_service.consume(attacker.user_id, CooldownService.BATTLE, now=attacker.last_battle_time)
             
             self.log_repo.add_log(attacker.user_id, "斗法", f"败给 {defender.nickname or defender.user_id}，损失 {penalty} 点修为")
             self.log_repo.add_log(defender.user_id, "斗法", f"战胜 {attacker.nickname or attacker.user_id}，获得 {reward} 点修为")
+            self.stats_service.record_safely(defender.user_id, "battle_win", 1)
             
             return True, f"斗法失败！损失 {penalty} 点修为"
 
@@ -101,9 +128,11 @@ class ArenaService:
 
     def get_evil_ranking(self, limit: int = 10) -> List[User]:
         """获取恶人排行榜（按胜利次数）"""
-        # 这里需要在user_repo中添加按胜利次数排序的方法
-        # 简化处理，返回修为排行榜
-        return self.user_repo.get_cultivation_ranking(limit)
+        return self.user_repo.get_battle_win_ranking(limit)
+
+    def get_effective_power(self, user: User) -> float:
+        """计算有效战力（修为 × 境界倍数）"""
+        return user.cultivation * self._get_realm_multiplier(user.realm)
 
     def _get_realm_multiplier(self, realm: str) -> float:
         """获取境界倍数"""
@@ -0,0 +1,155 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+from astrbot.api import logger
+
+
+class _TooManyRestarts(Exception):
+    """分步备份期间数据库频繁写入，备份反复从头开始"""
+
+
+class BackupService:
+    """数据库在线热备份"""
+
+    FILE_PREFIX = "re_xiuxian_"
+    FILE_SUFFIX = ".db"
+    # 分步备份允许的最大重启次数
+    MAX_RESTARTS = 3
+
+    def __init__(self, db_path: str, backup_dir: str, config: dict):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.config = config
+
+        backup_config = self.config.get("re_xiuxian", {})
+        self.interval_hours = backup_config.get("backup_interval_hours", 24)
+        self.keep = backup_config.get("backup_keep", 7)
+        self.pages_per_step = backup_config.get("backup_pages_per_step", 256)
+        self.step_pause = backup_config.get("backup_step_pause_ms", 10) / 1000
+
+        # 同一时间只允许一个备份
+        self._lock = threading.Lock()
+
+    def list_backups(self) -> List[str]:
+        """已有的备份文件（按时间从旧到新）"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        return sorted(
+            os.path.join(self.backup_dir, name) for name in os.listdir(self.backup_dir)
+            if name.startswith(self.FILE_PREFIX) and name.endswith(self.FILE_SUFFIX)
+        )
+
+    def seconds_until_due(self) -> Optional[float]:
+        """距离下次定时备份的秒数，未开启定时备份时返回 None"""
+        if self.interval_hours <= 0:
+            return None
+        backups = self.list_backups()
+        if not backups:
+            return 0.0
+        age = time.time() - os.path.getmtime(backups[-1])
+        return max(0.0, self.interval_hours * 3600 - age)
+
+    def backup(self) -> Tuple[bool, str]:
+        """立即备份（阻塞执行，调用方应放到线程中运行）"""
+        if not self._lock.acquire(blocking=False):
+            return False, "已有备份正在进行中"
+        try:
+            return self._backup()
+        finally:
+            self._lock.release()
+
+    def _backup(self) -> Tuple[bool, str]:
+        os.makedirs(self.backup_dir, exist_ok=True)
+        self._remove_temp_files()
+
+        name = f"{self.FILE_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}{self.FILE_SUFFIX}"
+        path = os.path.join(self.backup_dir, name)
+        temp_path = path + ".tmp"
+        started = time.perf_counter()
+        try:
+            restarts = self._copy(temp_path)
+            ok, detail = self._verify(temp_path)
+        except sqlite3.Error as e:
+            self._remove(temp_path)
+            logger.error(f"数据库备份失败: {e}")
+            return False, f"备份失败: {e}"
+        if not ok:
+            self._remove(temp_path)
+            logger.error(f"数据库备份未通过完整性检查: {detail}")
+            return False, f"备份未通过完整性检查: {detail}"
+        os.replace(temp_path, path)
+
+        removed = self._rotate()
+        seconds = time.perf_counter() - started
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        message = f"备份完成: {name}（{size_mb:.1f}MB，耗时{seconds:.1f}秒，完整性检查通过）"
+        if restarts:
+            message += f"，期间因写入重新开始{restarts}次"
+        if removed:
+            message += f"，已轮换删除{removed}个旧备份"
+        logger.info(message)
+        return True, message
+
+    def _copy(self, target_path: str) -> int:
+        """分步复制数据库到目标文件，返回备份重新开始的次数"""
+        source = sqlite3.connect(self.db_path)
+        target = sqlite3.connect(target_path)
+        restarts = 0
+        last_remaining = None
+
+        def progress(status, remaining, total):
+            nonlocal restarts, last_remaining
+            # 剩余页数变多说明源数据库被其他连接修改，备份已从头开始
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts > self.MAX_RESTARTS:
+                    raise _TooManyRestarts()
+            last_remaining = remaining
+            # 两步之间暂停，让出数据库给写入者
+            time.sleep(self.step_pause)
+
+        try:
+            try:
+                source.backup(target, pages=self.pages_per_step, progress=progress)
+            except _TooManyRestarts:
+                source.backup(target)
+            # 备份文件单独使用时不需要 WAL 文件
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+            source.close()
+        return restarts
+
+    def _verify(self, path: str) -> Tuple[bool, str]:
+        """对副本执行完整性检查"""
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute("PRAGMA integrity_check").fetchall()
+        finally:
+            conn.close()
+        detail = "; ".join(str(row[0]) for row in rows[:5])
+        return detail == "ok", detail
+
+    def _rotate(self) -> int:
+        """只保留最新的若干个备份，返回删除的数量"""
+        if self.keep <= 0:
+            return 0
+        expired = self.list_backups()[:-self.keep]
+        for path in expired:
+            self._remove(path)
+        return len(expired)
+
+    def _remove_temp_files(self):
+        """清理上次中断留下的临时文件"""
+        for name in os.listdir(self.backup_dir):
+            if name.startswith(self.FILE_PREFIX) and name.endswith(".tmp"):
+                self._remove(os.path.join(self.backup_dir, name))
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # Pillow 为可选依赖，缺失时回退为文字消息
+    Image = ImageDraw = ImageFont = None
+
+
+# 常见系统中的中文字体，未配置 card_font_path 时依次尝试
+_FONT_CANDIDATES = [
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+    "/usr/share/fonts/wqy-microhei/wqy-microhei.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/System/Library/Fonts/STHeiti Medium.ttc",
+    "C:/Windows/Fonts/msyh.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+]
+
+
+class _DiskLRU:
+    """按磁盘占用淘汰的文件缓存索引"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".tmp"):
+                # 上次写入中断留下的临时文件
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.total_bytes += size
+        self._evict()
+
+    def get(self, name: str) -> Optional[str]:
+        if name not in self._files:
+            return None
+        path = os.path.join(self.directory, name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # 文件被外部清理
+            self.total_bytes -= self._files.pop(name)
+            return None
+        self._files.move_to_end(name)
+        return path
+
+    def put(self, name: str, size: int):
+        self.total_bytes -= self._files.pop(name, 0)
+        self._files[name] = size
+        self.total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        # 至少保留最新的一个文件
+        while self.total_bytes > self.max_bytes and len(self._files) > 1:
+            name, size = self._files.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+class CardRenderer:
+    """修仙档案与排行榜的图片卡片"""
+
+    # 卡片样式变化时递增，使旧卡片失效
+    TEMPLATE_VERSION = 1
+
+    WIDTH = 640
+    PADDING = 32
+    TITLE_SIZE = 30
+    BODY_SIZE = 22
+    LINE_SPACING = 12
+    BACKGROUND = (250, 246, 235)
+    TITLE_COLOR = (120, 60, 20)
+    TEXT_COLOR = (45, 40, 35)
+    RULE_COLOR = (200, 170, 120)
+
+    def __init__(self, cache_dir: str, config: dict):
+        self.config = config
+        card_config = self.config.get("re_xiuxian", {})
+        self.enabled = card_config.get("enable_image_cards", True)
+        max_bytes = int(card_config.get("card_cache_max_mb", 50) * 1024 * 1024)
+
+        self.font_path = self._find_font(card_config.get("card_font_path", ""))
+        self._title_font = None
+        self._body_font = None
+        self._cache = _DiskLRU(cache_dir, max_bytes)
+        self._lock = threading.Lock()
+        self.hit_count = 0
+        self.render_count = 0
+
+    @property
+    def available(self) -> bool:
+        """是否可以生成图片（已启用、已安装 Pillow 且找到中文字体）"""
+        return bool(self.enabled and Image is not None and self.font_path)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """查找已缓存的卡片，返回图片路径"""
+        with self._lock:
+            path = self._cache.get(self._file_name(key))
+            if path:
+                self.hit_count += 1
+            return path
+
+    def render(self, key: str, text: str) -> Optional[str]:
+        """生成文字对应的卡片并缓存，返回图片路径；无法生成图片时返回None
+
+        首行形如 "=== 标题 ===" 时作为卡片标题。渲染较耗时，应在线程中调用。
+        """
+        if not self.available:
+            return None
+
+        name = self._file_name(key)
+        with self._lock:
+            path = self._cache.get(name)
+        if path:
+            return path
+
+        image = self._draw(*self._split_title(text))
+        path = os.path.join(self._cache.directory, name)
+        # 每次渲染使用独立的临时文件，同一张卡片并发渲染时不会发布写了一半的文件
+        with tempfile.NamedTemporaryFile(dir=self._cache.directory, prefix=name, suffix=".tmp",
+                                         delete=False) as tmp:
+            tmp_path = tmp.name
+            try:
+                image.save(tmp, format="PNG")
+            except BaseException:
+                tmp.close()
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._cache.put(name, os.path.getsize(path))
+            self.render_count += 1
+        return path
+
+    def _file_name(self, key: str) -> str:
+        digest = hashlib.sha1(f"{self.TEMPLATE_VERSION}:{key}".encode("utf-8")).hexdigest()
+        return f"{digest}.png"
+
+    def _split_title(self, text: str) -> Tuple[Optional[str], List[str]]:
+        lines = [line for line in text.strip().split("\n")]
+        if lines and lines[0].startswith("===") and lines[0].endswith("==="):
+            return lines[0].strip("= "), lines[1:]
+        return None, lines
+
+    def _draw(self, title: Optional[str], lines: List[str]):
+        title_font, body_font = self._get_fonts()
+        title_height = self.TITLE_SIZE + self.LINE_SPACING * 2 if title else 0
+        line_height = self.BODY_SIZE + self.LINE_SPACING
+        height = self.PADDING * 2 + title_height + line_height * len(lines)
+
+        image = Image.new("RGB", (self.WIDTH, height), self.BACKGROUND)
+        draw = ImageDraw.Draw(image)
+        y = self.PADDING
+        if title:
+            draw.text((self.PADDING, y), title, font=title_font, fill=self.TITLE_COLOR)
+            y += self.TITLE_SIZE + self.LINE_SPACING
+            draw.line((self.PADDING, y, self.WIDTH - self.PADDING, y), fill=self.RULE_COLOR, width=2)
+            y += self.LINE_SPACING
+        for line in lines:
+            draw.text((self.PADDING, y), line, font=body_font, fill=self.TEXT_COLOR)
+            y += line_height
+        return image
+
+    def _get_fonts(self):
+        with self._lock:
+            if self._title_font is None:
+                self._body_font = ImageFont.truetype(self.font_path, self.BODY_SIZE)
+                self._title_font = ImageFont.truetype(self.font_path, self.TITLE_SIZE)
+            return self._title_font, self._body_font
+
+    def _find_font(self, configured: str) -> Optional[str]:
+        """查找可用的中文字体"""
+        for path in ([configured] if configured else []) + _FONT_CANDIDATES:
+            if path and os.path.isfile(path):
+                return path
+        return None
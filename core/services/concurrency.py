@@ -0,0 +1,52 @@
+import asyncio
+import functools
+import zlib
+from dataclasses import fields
+from typing import List
+from ..domain.models import User
+from ..repositories.sqlite_user_repo import StaleUserError
+
+
+class UserLockStripes:
+    """按用户分段的异步锁（同一时刻只持有一把，不可嵌套获取）"""
+
+    # 锁的分段数量
+    STRIPES = 64
+
+    def __init__(self, stripes: int = STRIPES):
+        self._locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(stripes)]
+
+    def lock(self, user_id: str) -> asyncio.Lock:
+        """获取用户所在分段的锁"""
+        return self._locks[zlib.crc32(str(user_id).encode("utf-8")) % len(self._locks)]
+
+
+# 版本冲突时的最大尝试次数
+MAX_ATTEMPTS = 3
+
+
+def retry_on_conflict(method):
+    """服务方法装饰器：用户数据版本冲突时重新加载用户并重试
+
+    被装饰方法的第一个参数须为 User，所在服务须有 user_repo 属性。
+    重新加载的数据会写回传入的 User 对象，调用方持有的对象始终是最新的。
+    """
+    @functools.wraps(method)
+    def wrapper(self, user: User, *args, **kwargs):
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return method(self, user, *args, **kwargs)
+            except StaleUserError:
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                fresh = self.user_repo.get_by_user_id(user.user_id)
+                if fresh is None:
+                    raise
+                refresh_user(user, fresh)
+    return wrapper
+
+
+def refresh_user(user: User, fresh: User):
+    """用最新数据覆盖用户对象"""
+    for f in fields(User):
+        setattr(user, f.name, getattr(fresh, f.name))
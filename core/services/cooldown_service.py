@@ -0,0 +1,77 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from ..repositories.sqlite_cooldown_repo import SqliteCooldownRepository
+
+
+class CooldownService:
+    """统一的冷却引擎"""
+
+    CLOSING = "closing"
+    DEEP_CLOSING = "deep_closing"
+    BATTLE = "battle"
+    ROLL_CALL = "roll_call"
+    BETRAY = "betray"
+
+    # 叛门冷却时间（秒）
+    BETRAY_COOLDOWN = 4 * 3600
+    # 内存中最多保留多少名玩家的冷却记录
+    MAX_USERS = 10000
+
+    def __init__(self, cooldown_repo: SqliteCooldownRepository, config: dict):
+        self.cooldown_repo = cooldown_repo
+        self.config = config
+
+        cooldown_config = self.config.get("re_xiuxian", {})
+        # 行动 -> 固定冷却时长（秒），点卯按自然日计算不在此列
+        self._durations = {
+            self.CLOSING: cooldown_config.get("closed_door_cooldown", 60),
+            self.DEEP_CLOSING: cooldown_config.get("deep_closed_door_cooldown", 79200),
+            self.BATTLE: cooldown_config.get("battle_cooldown", 300),
+            self.BETRAY: self.BETRAY_COOLDOWN,
+        }
+
+        # 玩家 -> {行动: 冷却结束时间}，按最近访问顺序排列
+        self._expires: "OrderedDict[str, Dict[str, datetime]]" = OrderedDict()
+
+    def check(self, user_id: str, action: str) -> bool:
+        """行动是否已冷却完毕"""
+        return self.remaining(user_id, action) <= 0
+
+    def remaining(self, user_id: str, action: str) -> int:
+        """获取剩余冷却时间（秒），已冷却完毕时为0"""
+        expires_at = self._get_user(user_id).get(action)
+        if expires_at is None:
+            return 0
+        return max(0, int((expires_at - datetime.now()).total_seconds()))
+
+    def consume(self, user_id: str, *actions: str, now: Optional[datetime] = None):
+        """执行行动，进入冷却"""
+        now = now or datetime.now()
+        self.cooldown_repo.set_used_at(user_id, list(actions), now)
+        expires = self._get_user(user_id)
+        for action in actions:
+            expires[action] = self._get_expires_at(action, now)
+
+    def _get_user(self, user_id: str) -> Dict[str, datetime]:
+        """获取玩家的冷却记录，不在内存中时从数据库加载"""
+        expires = self._expires.get(user_id)
+        if expires is not None:
+            self._expires.move_to_end(user_id)
+            return expires
+
+        expires = {
+            action: self._get_expires_at(action, used_at)
+            for action, used_at in self.cooldown_repo.get_user_cooldowns(user_id).items()
+        }
+        self._expires[user_id] = expires
+        while len(self._expires) > self.MAX_USERS:
+            self._expires.popitem(last=False)
+        return expires
+
+    def _get_expires_at(self, action: str, used_at: datetime) -> datetime:
+        """根据执行时间计算冷却结束时间"""
+        if action == self.ROLL_CALL:
+            # 点卯每天一次，次日零点冷却结束
+            return datetime.combine(used_at.date() + timedelta(days=1), datetime.min.time())
+        return used_at + timedelta(seconds=self._durations.get(action, 0))
@@ -5,6 +5,9 @@ from ..domain.models import User
 from ..repositories.sqlite_user_repo import SqliteUserRepository
 from ..repositories.sqlite_inventory_repo import SqliteInventoryRepository
 from ..repositories.sqlite_log_repo import SqliteLogRepository
+from .stats_service import StatsService
+from .cooldown_service import CooldownService
+from .concurrency import retry_on_conflict
 
 
 class CultivationService:
@@ -12,12 +15,17 @@ class CultivationService:
                  user_repo: SqliteUserRepository,
                  inventory_repo: SqliteInventoryRepository,
                  log_repo: SqliteLogRepository,
-                 config: dict):
+                 cooldown_service: CooldownService,
+                 config: dict,
+                 stats_service: StatsService):
         self.user_repo = user_repo
         self.inventory_repo = inventory_repo
         self.log_repo = log_repo
+        self.cooldown_service = cooldown_service
         self.config = config
+        self.stats_service = stats_service
 
+    @retry_on_conflict
     def start_closing_door_cultivation(self, user: User) -> Tuple[bool, str]:
         """开始闭关修炼"""
         # 检查是否正在闭关
@@ -25,11 +33,9 @@ class CultivationService:
             return False, "你正在闭关中，无法再次闭关"
             
         # 检查冷却时间
-        if user.last_closing_time:
-            cooldown_seconds = self.config.get("re_xiuxian", {}).get("closed_door_cooldown", 60)
-            if self._get_current_time() < user.last_closing_time + timedelta(seconds=cooldown_seconds):
-                remaining = (user.last_closing_time + timedelta(seconds=cooldown_seconds) - self._get_current_time()).seconds
-                return False, f"闭关冷却中，还需等待 {remaining} 秒"
+        can_close, message = self.check_closing_cooldown(user.user_id)
+        if not can_close:
+            return False, message
         
         # 检查是否处于避世状态
         if user.is_hermit and not user.realm.startswith("炼气"):
@@ -44,6 +50,14 @@ class CultivationService:
         self.user_repo.update_user(user)
         return True, f"开始闭关修炼，需要 {closing_duration} 秒完成"
 
+    def check_closing_cooldown(self, user_id: str) -> Tuple[bool, str]:
+        """检查闭关冷却（只查内存，无需加载用户）"""
+        remaining = self.cooldown_service.remaining(user_id, CooldownService.CLOSING)
+        if remaining > 0:
+            return False, f"闭关冷却中，还需等待 {remaining} 秒"
+        return True, ""
+
+    @retry_on_conflict
     def check_closing_door_cultivation(self, user: User) -> Tuple[bool, str]:
         """检查闭关状态"""
         # 检查是否正在闭关
@@ -68,8 +82,13 @@ class CultivationService:
             self.user_repo.update_user(user)
             return False, "闭关数据异常，已重置状态"
 
+    @retry_on_conflict
     def _complete_closing_door_cultivation(self, user: User) -> Tuple[bool, str]:
         """完成闭关修炼"""
+        # 可能由定时器在用户数据被其他指令修改后调用，重新加载后需再次确认
+        if not user.is_in_closing:
+            return False, "你没有在闭关修炼"
+            
         # 重置闭关状态
         user.is_in_closing = False
         user.closing_start_time = None
@@ -86,7 +105,9 @@ class CultivationService:
             user.total_closing_count += 1
             
             self.user_repo.update_user(user)
+            self._consume_closing(user)
             self.log_repo.add_log(user.user_id, "闭关", f"闭关成功，获得 {exp_gain} 点修为")
+            self.stats_service.record_safely(user.user_id, "exp", exp_gain)
             return True, f"闭关成功，获得 {exp_gain} 点修为"
             
         elif rand < 0.9:  # 20% 失败
@@ -94,6 +115,7 @@ class CultivationService:
             user.total_closing_count += 1
             
             self.user_repo.update_user(user)
+            self._consume_closing(user)
             self.log_repo.add_log(user.user_id, "闭关", "闭关失败，未获得修为")
             return True, "闭关失败，未获得修为"
             
@@ -105,9 +127,11 @@ class CultivationService:
             user.total_closing_count += 1
             
             self.user_repo.update_user(user)
+            self._consume_closing(user)
             self.log_repo.add_log(user.user_id, "闭关", f"走火入魔，损失 {loss} 点修为")
             return True, f"走火入魔，损失 {loss} 点修为"
 
+    @retry_on_conflict
     def start_deep_cultivation(self, user: User) -> Tuple[bool, str]:
         """开始深度闭关"""
         # 检查是否已经在深度闭关
@@ -115,11 +139,9 @@ class CultivationService:
             return False, "你已经在深度闭关中"
             
         # 检查冷却时间
-        if user.last_closing_time:
-            cooldown_seconds = self.config.get("re_xiuxian", {}).get("deep_closed_door_cooldown", 79200)
-            if self._get_current_time() < user.last_closing_time + timedelta(seconds=cooldown_seconds):
-                remaining = (user.last_closing_time + timedelta(seconds=cooldown_seconds) - self._get_current_time()).seconds
-                return False, f"深度闭关冷却中，还需等待 {remaining} 秒"
+        remaining = self.cooldown_service.remaining(user.user_id, CooldownService.DEEP_CLOSING)
+        if remaining > 0:
+            return False, f"深度闭关冷却中，还需等待 {remaining} 秒"
         
         # 开始深度闭关
         duration = self.config.get("re_xiuxian", {}).get("deep_closed_door_duration", 28800)
@@ -127,9 +149,11 @@ class CultivationService:
         user.last_closing_time = self._get_current_time()
         
         self.user_repo.update_user(user)
+        self._consume_closing(user)
         self.log_repo.add_log(user.user_id, "闭关", f"开始深度闭关，将持续 {duration//3600} 小时")
         return True, f"开始深度闭关，将持续 {duration//3600} 小时"
 
+    @retry_on_conflict
     def check_deep_cultivation(self, user: User) -> Tuple[bool, str]:
         """检查深度闭关状态"""
         if not user.deep_closing_end_time:
@@ -145,6 +169,7 @@ class CultivationService:
             
             self.user_repo.update_user(user)
             self.log_repo.add_log(user.user_id, "闭关", f"深度闭关结束，获得 {exp_gain} 点修为")
+            self.stats_service.record_safely(user.user_id, "exp", exp_gain)
             return True, f"深度闭关结束，获得 {exp_gain} 点修为"
         else:
             # 还在闭关中
@@ -153,6 +178,7 @@ class CultivationService:
             minutes = (remaining.seconds % 3600) // 60
             return True, f"深度闭关中，剩余时间: {hours} 小时 {minutes} 分钟"
 
+    @retry_on_conflict
     def force_exit_cultivation(self, user: User) -> Tuple[bool, str]:
         """强行出关"""
         if not user.deep_closing_end_time:
@@ -172,8 +198,10 @@ class CultivationService:
         
         self.user_repo.update_user(user)
         self.log_repo.add_log(user.user_id, "闭关", f"强行出关，获得 {exp_gain} 点修为")
+        self.stats_service.record_safely(user.user_id, "exp", exp_gain)
         return True, f"强行出关，获得 {exp_gain} 点修为"
 
+    @retry_on_conflict
     def toggle_hermit_mode(self, user: User, enable: bool) -> Tuple[bool, str]:
         """切换避世模式"""
         # 检查是否为炼气期
@@ -190,6 +218,12 @@ class CultivationService:
             self.log_repo.add_log(user.user_id, "状态", "关闭避世模式")
             return True, "已关闭避世模式，重新入世"
 
+    def _consume_closing(self, user: User):
+        """闭关与深度闭关的冷却均从上次闭关时间起算"""
+        self.cooldown_service.consume(
+            user.user_id, CooldownService.CLOSING, CooldownService.DEEP_CLOSING, now=user.last_closing_time
+        )
+
     def _get_current_time(self):
         """获取当前时间"""
         return datetime.now()
@@ -1,25 +1,47 @@
-from typing import List
+import hashlib
+from typing import Optional
+from ..database.connection import Transaction
 from ..repositories.sqlite_item_repo import SqliteItemRepository
 from ..repositories.sqlite_sect_repo import SqliteSectRepository
-from ..domain.models import Item, Sect
+from ..repositories.sqlite_recipe_repo import SqliteRecipeRepository
+from ..domain.models import Item, Sect, Recipe
 
 
 class DataSetupService:
-    def __init__(self, item_repo: SqliteItemRepository, sect_repo: SqliteSectRepository):
+    def __init__(self, item_repo: SqliteItemRepository, sect_repo: SqliteSectRepository,
+                 recipe_repo: SqliteRecipeRepository):
         self.item_repo = item_repo
         self.sect_repo = sect_repo
+        self.recipe_repo = recipe_repo
 
-    def setup_initial_data(self):
-        """设置初始数据"""
+    def setup_initial_data(self, tx: Optional[Transaction] = None):
+        """设置初始数据，传入 tx 时在该事务中执行"""
         # 创建初始物品
-        self._create_initial_items()
+        self._create_initial_items(tx)
         
         # 创建初始宗门
-        self._create_initial_sects()
+        self._create_initial_sects(tx)
+        
+        # 上架贡献商店物品
+        self._create_initial_shop_items(tx)
+        
+        # 创建初始丹方
+        self._create_initial_recipes(tx)
 
-    def _create_initial_items(self):
-        """创建初始物品"""
-        initial_items = [
+    def seed_version(self) -> str:
+        """初始数据的指纹，增删初始物品、宗门、商店物品或丹方时改变"""
+        # 初始数据只按名称补齐缺失的记录，指纹只需覆盖名称与商店、丹方的定义
+        seed = (
+            [item.name for item in self._initial_items()],
+            [sect.name for sect in self._initial_sects()],
+            self._shop_items(),
+            self._initial_recipes(),
+        )
+        return hashlib.sha1(repr(seed).encode("utf-8")).hexdigest()
+
+    def _initial_items(self):
+        """初始物品"""
+        return [
             # 丹药类
             Item(
                 id=0,
@@ -78,6 +100,41 @@ class DataSetupService:
                 effect_value=1.0,
                 requirement=None
             ),
+            Item(
+                id=0,
+                name="灵草",
+                type="材料",
+                description="药园中常见的灵草",
+                rarity=1,
+                effect="炼制丹药的基础材料",
+                effect_type="材料",
+                effect_value=1.0,
+                requirement=None
+            ),
+            Item(
+                id=0,
+                name="妖兽内丹",
+                type="材料",
+                description="妖兽体内凝结的内丹",
+                rarity=2,
+                effect="炼制丹药的辅助材料",
+                effect_type="材料",
+                effect_value=1.0,
+                requirement=None
+            ),
+            
+            # 货币
+            Item(
+                id=0,
+                name="灵石",
+                type="货币",
+                description="修仙界通用的货币，可在坊市中交易",
+                rarity=1,
+                effect=None,
+                effect_type=None,
+                effect_value=None,
+                requirement=None
+            ),
             
             # 法宝类
             Item(
@@ -92,16 +149,18 @@ class DataSetupService:
                 requirement=None
             )
         ]
-        
-        for item in initial_items:
-            # 检查是否已存在
-            existing_item = self.item_repo.get_by_name(item.name)
-            if not existing_item:
-                self.item_repo.create_item(item)
 
-    def _create_initial_sects(self):
-        """创建初始宗门"""
-        initial_sects = [
+    def _create_initial_items(self, tx: Optional[Transaction] = None):
+        """创建初始物品"""
+        # 一次读出已有物品，只写入缺失的
+        existing = self.item_repo.get_name_ids(tx)
+        for item in self._initial_items():
+            if item.name not in existing:
+                self.item_repo.create_item(item, tx)
+
+    def _initial_sects(self):
+        """初始宗门"""
+        return [
             Sect(
                 id=0,
                 name="黄枫谷",
@@ -157,9 +216,54 @@ class DataSetupService:
                 is_active=True
             )
         ]
-        
-        for sect in initial_sects:
+
+    def _create_initial_sects(self, tx: Optional[Transaction] = None):
+        """创建初始宗门"""
+        existing = self.sect_repo.get_names(tx)
+        for sect in self._initial_sects():
+            if sect.name not in existing:
+                self.sect_repo.create_sect(sect, tx)
+
+    def _shop_items(self):
+        """贡献商店物品 (物品名称, 价格)"""
+        return [
+            ("聚气丹", 30.0),
+            ("清灵丹", 50.0),
+            ("筑基丹", 300.0),
+            ("灵草", 5.0),
+            ("灵石", 2.0),
+        ]
+
+    def _create_initial_shop_items(self, tx: Optional[Transaction] = None):
+        """上架贡献商店物品"""
+        item_ids = self.item_repo.get_name_ids(tx)
+        for item_name, price in self._shop_items():
+            if item_name in item_ids:
+                self.sect_repo.add_shop_item(item_ids[item_name], price, tx)
+
+    def _initial_recipes(self):
+        """初始丹方 (丹方名称, 产出物品, 产出数量, {材料: 数量}, 学习要求)"""
+        return [
+            ("聚气丹方", "聚气丹", 1, {"灵草": 3}, None),
+            ("清灵丹方", "清灵丹", 1, {"灵草": 2, "妖兽内丹": 1}, None),
+            ("筑基丹方", "筑基丹", 1, {"灵草": 5, "妖兽内丹": 3, "养魂木": 1}, "修为 1000"),
+        ]
+
+    def _create_initial_recipes(self, tx: Optional[Transaction] = None):
+        """创建初始丹方"""
+        existing = self.recipe_repo.get_names(tx)
+        item_ids = self.item_repo.get_name_ids(tx)
+        for name, output_name, output_quantity, ingredients, requirement in self._initial_recipes():
             # 检查是否已存在
-            existing_sect = self.sect_repo.get_by_name(sect.name)
-            if not existing_sect:
-                self.sect_repo.create_sect(sect)
\ No newline at end of file
+            if name in existing:
+                continue
+            if output_name not in item_ids or not all(item_name in item_ids for item_name in ingredients):
+                continue
+            self.recipe_repo.create_recipe(Recipe(
+                id=0,
+                name=name,
+                output_item_id=item_ids[output_name],
+                output_quantity=output_quantity,
+                ingredients={item_ids[item_name]: quantity for item_name, quantity in ingredients.items()},
+                requirement=requirement
+            ), tx)
\ No newline at end of file
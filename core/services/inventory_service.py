@@ -1,94 +1,128 @@
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict
 from ..domain.models import User, Item, UserItem
 from ..repositories.sqlite_inventory_repo import SqliteInventoryRepository
 from ..repositories.sqlite_user_repo import SqliteUserRepository
 from ..repositories.sqlite_item_repo import SqliteItemRepository
+from ..repositories.sqlite_log_repo import SqliteLogRepository
+from .stats_service import StatsService
+from .concurrency import retry_on_conflict
+from .item_effect_engine import ItemEffectEngine
+from ..database.connection import transaction
 
 
 class InventoryService:
+    # 单次赠送或使用每种物品的最大数量
+    MAX_QUANTITY = 1000000
+
     def __init__(self, 
                  inventory_repo: SqliteInventoryRepository,
                  user_repo: SqliteUserRepository,
                  item_repo: SqliteItemRepository,
-                 config: dict):
+                 log_repo: SqliteLogRepository,
+                 config: dict,
+                 stats_service: StatsService):
         self.inventory_repo = inventory_repo
         self.user_repo = user_repo
         self.item_repo = item_repo
+        self.log_repo = log_repo
         self.config = config
+        self.stats_service = stats_service
+        self.effect_engine = ItemEffectEngine(item_repo)
 
     def get_user_inventory(self, user_id: str) -> List[Tuple[Item, UserItem]]:
-        """获取用户库存"""
-        user_items = self.inventory_repo.get_user_items(user_id)
-        inventory = []
-        
-        for user_item in user_items:
-            item = self.item_repo.get_by_id(user_item.item_id)
-            if item:
-                inventory.append((item, user_item))
-                
-        return inventory
+        """获取用户库存（物品模板一并联表查出）"""
+        return self.inventory_repo.get_user_inventory(user_id)
 
+    @retry_on_conflict
     def use_item(self, user: User, item_name: str, quantity: int = 1) -> Tuple[bool, str]:
-        """使用物品"""
+        """使用物品，N 个一次计算、一次事务写入"""
+        if quantity <= 0:
+            return False, "使用数量必须大于0"
+        if quantity > self.MAX_QUANTITY:
+            return False, f"单次最多使用 {self.MAX_QUANTITY} 个"
+        
         # 查找物品
-        item = self.item_repo.get_by_name(item_name)
-        if not item:
+        compiled = self.effect_engine.get(item_name)
+        if not compiled:
             return False, f"未找到物品: {item_name}"
-            
-        # 检查用户是否有足够数量
-        if not self.inventory_repo.has_item(user.user_id, item.id, quantity):
-            return False, f"你没有足够的 {item_name}"
-            
+        item = compiled.item
+        
+        if not compiled.usable:
+            if item.type == "材料":
+                # 材料类物品一般不能直接使用
+                return False, f"{item.name}是材料，无法直接使用"
+            return False, f"未知的物品效果类型: {item.effect_type}"
+        
         # 检查使用条件
-        if item.requirement and not self._check_requirement(user, item.requirement):
-            return False, f"不满足使用条件: {item.requirement}"
-            
-        # 根据物品类型处理效果
-        success, message = self._apply_item_effect(user, item, quantity)
-        if success:
-            # 消耗物品
-            self.inventory_repo.remove_item(user.user_id, item.id, quantity)
-            
-        return success, message
+        if not compiled.meets_requirement(user):
+            if item.requirement:
+                return False, f"不满足使用条件: {item.requirement}"
+            return False, f"当前境界无法服用{item.name}"
+        
+        # 不可叠加的效果（如突破）一次只消耗一个，并在回复中说明
+        note = ""
+        if not compiled.stackable and quantity > 1:
+            quantity = 1
+            note = f"{item.name}一次只能使用一个，本次只使用了一个\n"
+        
+        # 扣减物品与写入用户在同一事务中完成，数量不足时什么也不写
+        with transaction(self.user_repo.db_path) as tx:
+            if not self.inventory_repo.remove_item(user.user_id, item.id, quantity, tx):
+                return False, f"你没有足够的 {item_name}"
+            result = compiled.handler(user, item, quantity)
+            if result.user_changed:
+                self.user_repo.update_user(user, tx)
+        
+        if result.exp_gain:
+            self.stats_service.record_safely(user.user_id, "exp", result.exp_gain)
+        return True, note + result.message
 
-    def _check_requirement(self, user: User, requirement: str) -> bool:
-        """检查使用条件"""
-        # 简化实现，实际应根据requirement字符串解析条件
-        if requirement == "炼气大圆满" and user.realm != "炼气大圆满":
-            return False
-        # 可以添加更多条件检查
-        return True
+    def give_item(self, sender: User, receiver_id: str, item_name: str, quantity: int = 1) -> Tuple[bool, str]:
+        """赠送物品"""
+        return self.give_items(sender, receiver_id, [(item_name, quantity)])
 
-    def _apply_item_effect(self, user: User, item: Item, quantity: int) -> Tuple[bool, str]:
-        """应用物品效果"""
-        if item.type == "丹药":
-            if item.effect_type == "突破":
-                # 处理突破丹药
-                if item.name == "筑基丹":
-                    if user.realm == "炼气大圆满":
-                        user.realm = "筑基初期"
-                        self.user_repo.update_user(user)
-                        return True, f"服用筑基丹成功，境界提升至{user.realm}"
-                    else:
-                        return False, "当前境界无法服用筑基丹"
-                        
-            elif item.effect_type == "增益":
-                # 增加修为
-                exp_gain = int(item.effect_value * 100 * quantity)
-                user.cultivation += exp_gain
-                user.total_exp_gained += exp_gain
-                self.user_repo.update_user(user)
-                return True, f"服用{item.name}，获得 {exp_gain} 点修为"
-                
-            elif item.effect_type == "清理":
-                # 清理效果，这里简化处理
-                return True, f"服用{item.name}，清理了丹毒"
-                
-        elif item.type == "材料":
-            # 材料类物品一般不能直接使用
-            return False, f"{item.name}是材料，无法直接使用"
+    def give_items(self, sender: User, receiver_id: str, stacks: List[Tuple[str, int]]) -> Tuple[bool, str]:
+        """一次赠送多种物品 [(物品名, 数量)]，全部成功或全部不赠送"""
+        if not stacks:
+            return False, "请指定要赠送的物品"
+        if any(quantity <= 0 for _, quantity in stacks):
+            return False, "赠送数量必须大于0"
+        if any(quantity > self.MAX_QUANTITY for _, quantity in stacks):
+            return False, f"每种物品单次最多赠送 {self.MAX_QUANTITY} 个"
+            
+        if receiver_id == sender.user_id:
+            return False, "不能赠送给自己"
             
-        return False, f"未知的物品效果类型: {item.effect_type}"
+        receiver = self.user_repo.get_by_user_id(receiver_id)
+        if not receiver or not receiver.talent:
+            return False, "对方尚未踏入修仙之路"
+            
+        # 查找物品，同名物品合并数量
+        items: Dict[int, int] = {}
+        names: Dict[int, str] = {}
+        for item_name, quantity in stacks:
+            item = self.item_repo.get_by_name(item_name)
+            if not item:
+                return False, f"未找到物品: {item_name}"
+            items[item.id] = items.get(item.id, 0) + quantity
+            names[item.id] = item.name
+            if items[item.id] > self.MAX_QUANTITY:
+                return False, f"每种物品单次最多赠送 {self.MAX_QUANTITY} 个"
+        
+        receiver_name = receiver.dao_name or receiver.nickname or receiver.user_id
+        sender_name = sender.dao_name or sender.nickname or sender.user_id
+        item_list = "、".join(f"{names[item_id]} x{quantity}" for item_id, quantity in items.items())
+        
+        # 转移物品与双方的审计日志在同一事务中写入
+        with transaction(self.inventory_repo.db_path) as tx:
+            if not self.inventory_repo.transfer_items(sender.user_id, receiver.user_id, items, tx):
+                if len(items) == 1:
+                    return False, f"你没有足够的 {next(iter(names.values()))}"
+                return False, f"你的物品不足，无法赠送：{item_list}"
+            self.log_repo.add_log(sender.user_id, "赠送", f"赠送给 {receiver_name}：{item_list}", tx)
+            self.log_repo.add_log(receiver.user_id, "赠送", f"收到 {sender_name} 的赠礼：{item_list}", tx)
+        
+        return True, f"已将 {item_list} 赠送给 {receiver_name}"
 
     def add_item_to_user(self, user_id: str, item_id: int, quantity: int = 1) -> bool:
         """给用户添加物品"""
@@ -0,0 +1,159 @@
+import re
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+from astrbot.api import logger
+from ..domain.models import User, Item
+from ..repositories.sqlite_item_repo import SqliteItemRepository
+
+
+class EffectResult:
+    """一次服用的结果"""
+    __slots__ = ("message", "user_changed", "exp_gain")
+
+    def __init__(self, message: str, user_changed: bool = False, exp_gain: int = 0):
+        self.message = message
+        self.user_changed = user_changed
+        self.exp_gain = exp_gain
+
+
+# 效果处理函数：(用户, 物品, 数量) -> 结果，N 个一次算完
+EffectHandler = Callable[[User, Item, int], EffectResult]
+# 使用条件判断函数
+Requirement = Callable[[User], bool]
+
+# 效果类型 -> (处理函数, 能否一次服用多个, 效果自带的使用条件)
+_EFFECTS: Dict[str, Tuple[EffectHandler, bool, Optional[Requirement]]] = {}
+# (使用条件的格式, 由匹配结果生成判断函数)，按注册顺序匹配
+_REQUIREMENTS: List[Tuple[Pattern, Callable[[re.Match], Requirement]]] = []
+
+# 突破丹药：服用前境界 -> 服用后境界
+BREAKTHROUGHS = {
+    "炼气大圆满": "筑基初期",
+}
+
+
+def effect(effect_type: str, stackable: bool = True, requires: Optional[Requirement] = None):
+    """注册效果类型的处理函数"""
+    def decorator(handler: EffectHandler) -> EffectHandler:
+        _EFFECTS[effect_type] = (handler, stackable, requires)
+        return handler
+    return decorator
+
+
+def requirement(pattern: str):
+    """注册一种使用条件的格式"""
+    def decorator(factory: Callable[[re.Match], Requirement]):
+        _REQUIREMENTS.append((re.compile(pattern), factory))
+        return factory
+    return decorator
+
+
+@effect("增益")
+def _gain_exp(user: User, item: Item, quantity: int) -> EffectResult:
+    """增加修为"""
+    exp_gain = int(item.effect_value * 100 * quantity)
+    user.cultivation += exp_gain
+    user.total_exp_gained += exp_gain
+    return EffectResult(f"服用{item.name} x{quantity}，获得 {exp_gain} 点修为", True, exp_gain)
+
+
+@effect("突破", stackable=False, requires=lambda user: user.realm in BREAKTHROUGHS)
+def _breakthrough(user: User, item: Item, quantity: int) -> EffectResult:
+    """突破境界"""
+    user.realm = BREAKTHROUGHS[user.realm]
+    return EffectResult(f"服用{item.name}成功，境界提升至{user.realm}", True)
+
+
+@effect("清理")
+def _cleanse(user: User, item: Item, quantity: int) -> EffectResult:
+    """清理丹毒，这里简化处理"""
+    return EffectResult(f"服用{item.name} x{quantity}，清理了丹毒")
+
+
+@requirement(r"^修为\s*(\d+)$")
+def _min_cultivation(match: re.Match) -> Requirement:
+    """修为达到指定数值"""
+    threshold = int(match.group(1))
+    return lambda user: user.cultivation >= threshold
+
+
+@requirement(r"^(凡人|\S+(?:层|期|圆满))$")
+def _exact_realm(match: re.Match) -> Requirement:
+    """处于指定境界"""
+    realm = match.group(1)
+    return lambda user: user.realm == realm
+
+
+def compile_requirement(text: Optional[str]) -> Optional[Requirement]:
+    """解析使用条件，无法识别的条件与原先一样不做限制，并记录警告"""
+    if not text:
+        return None
+    text = text.strip()
+    for pattern, factory in _REQUIREMENTS:
+        match = pattern.match(text)
+        if match:
+            return factory(match)
+    logger.warning(f"无法识别的使用条件，已忽略: {text}")
+    return None
+
+
+class CompiledItem:
+    """编译后的物品：效果处理函数与使用条件均已解析完毕"""
+    __slots__ = ("item", "handler", "stackable", "requirement")
+
+    def __init__(self, item: Item, handler: Optional[EffectHandler], stackable: bool,
+                 requirement: Optional[Requirement]):
+        self.item = item
+        self.handler = handler
+        self.stackable = stackable
+        self.requirement = requirement
+
+    @property
+    def usable(self) -> bool:
+        return self.handler is not None
+
+    def meets_requirement(self, user: User) -> bool:
+        return self.requirement is None or self.requirement(user)
+
+
+class ItemEffectEngine:
+    """物品效果引擎"""
+
+    def __init__(self, item_repo: SqliteItemRepository):
+        self.item_repo = item_repo
+        self._compiled: Dict[str, CompiledItem] = {}
+        self._loaded = False
+
+    def get(self, item_name: str) -> Optional[CompiledItem]:
+        """获取编译后的物品，目录加载后新增的物品按需编译"""
+        self._ensure_loaded()
+        compiled = self._compiled.get(item_name)
+        if compiled is None:
+            item = self.item_repo.get_by_name(item_name)
+            if item is None:
+                return None
+            compiled = self._compile(item)
+            self._compiled[item.name] = compiled
+        return compiled
+
+    def _ensure_loaded(self):
+        """首次使用时编译整个物品目录"""
+        if self._loaded:
+            return
+        for item in self.item_repo.get_all_items():
+            self._compiled[item.name] = self._compile(item)
+        self._loaded = True
+
+    def _compile(self, item: Item) -> CompiledItem:
+        handler, stackable, requires = None, True, None
+        if item.type == "丹药" and item.effect_type in _EFFECTS:
+            handler, stackable, requires = _EFFECTS[item.effect_type]
+        
+        # 物品自身的条件与效果自带的条件需同时满足
+        predicates = [p for p in (compile_requirement(item.requirement), requires) if p]
+        if not predicates:
+            requirement = None
+        elif len(predicates) == 1:
+            requirement = predicates[0]
+        else:
+            requirement = lambda user: all(p(user) for p in predicates)
+        return CompiledItem(item, handler, stackable, requirement)
@@ -0,0 +1,216 @@
+import time
+from itertools import count
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Callable, Dict, List, Set, Tuple
+from ..domain.models import User, RankEntry
+from ..repositories.sqlite_user_repo import SqliteUserRepository
+from ..repositories.sqlite_group_repo import SqliteGroupRepository
+
+# 全局递增的版本号，保证榜单被淘汰重建后也不会与旧版本号重复
+_versions = count(1)
+
+
+class _GroupBoard:
+    """单个群的修为榜，按修为降序增量维护"""
+    __slots__ = ("keys", "entries", "last_access", "version")
+
+    def __init__(self):
+        # 排序键为 (-修为, user_id)，升序即为修为降序
+        self.keys: List[Tuple[float, str]] = []
+        self.entries: Dict[str, RankEntry] = {}
+        self.last_access = time.monotonic()
+        self.version = next(_versions)
+
+    def upsert(self, entry: RankEntry) -> bool:
+        """插入或更新成员，返回排行数据是否变化"""
+        old = self.entries.get(entry.user_id)
+        if old == entry:
+            return False
+
+        if old is None:
+            insort(self.keys, (-entry.cultivation, entry.user_id))
+        elif old.cultivation != entry.cultivation:
+            self._remove_key(old)
+            insort(self.keys, (-entry.cultivation, entry.user_id))
+
+        self.entries[entry.user_id] = entry
+        self.version = next(_versions)
+        return True
+
+    def top(self, limit: int) -> List[RankEntry]:
+        """获取前 N 名（只统计修为大于0的成员）"""
+        result = []
+        for neg_cultivation, user_id in self.keys:
+            if len(result) >= limit or neg_cultivation >= 0:
+                break
+            result.append(self.entries[user_id])
+        return result
+
+    def _remove_key(self, entry: RankEntry):
+        key = (-entry.cultivation, entry.user_id)
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            del self.keys[index]
+
+
+class _GlobalTopTracker:
+    """全服榜单版本跟踪，只在写入可能影响前 N 名时递增版本"""
+    __slots__ = ("score", "user_ids", "threshold", "full", "version")
+
+    def __init__(self, score: Callable[[User], float]):
+        self.score = score
+        self.user_ids: Set[str] = set()
+        self.threshold = 0.0
+        self.full = False
+        self.version = next(_versions)
+
+    def reset(self, ranking: List[User], limit: int):
+        """记录最近一次查询得到的前 N 名"""
+        self.user_ids = {user.user_id for user in ranking}
+        self.threshold = self.score(ranking[-1]) if ranking else 0.0
+        self.full = len(ranking) >= limit
+
+    def observe(self, user: User):
+        """榜上成员变化或有人达到上榜门槛时递增版本"""
+        if user.user_id in self.user_ids or (self.score(user) > 0 and (not self.full or self.score(user) >= self.threshold)):
+            self.version = next(_versions)
+
+
+class LeaderboardService:
+    """按群划分的修为排行榜"""
+
+    # 同一用户在同一群内的活跃记录最多每隔多久写一次库（秒）
+    TOUCH_INTERVAL = 3600
+    # 最近活跃记录缓存上限
+    MAX_TOUCH_RECORDS = 10000
+
+    def __init__(self,
+                 user_repo: SqliteUserRepository,
+                 group_repo: SqliteGroupRepository,
+                 config: dict):
+        self.user_repo = user_repo
+        self.group_repo = group_repo
+        self.config = config
+
+        leaderboard_config = self.config.get("re_xiuxian", {})
+        self.max_groups = leaderboard_config.get("leaderboard_max_groups", 500)
+        self.group_idle_seconds = leaderboard_config.get("leaderboard_group_idle_seconds", 3600)
+
+        # 常驻内存的群榜单，按最近访问顺序排列
+        self._boards: "OrderedDict[str, _GroupBoard]" = OrderedDict()
+        # 用户 -> 所在的常驻群，用于写入时快速定位需要更新的榜单
+        self._user_groups: Dict[str, Set[str]] = {}
+        # (群, 用户) -> 上次写库时间
+        self._touched: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        # 全服修为榜与恶人榜的版本跟踪
+        self._global_cultivation = _GlobalTopTracker(lambda user: user.cultivation)
+        self._global_battle_win = _GlobalTopTracker(lambda user: user.total_battle_win_count)
+
+        self.user_repo.add_listener(self.on_user_updated)
+
+    def record_activity(self, group_id: str, user_id: str):
+        """记录用户在群内的活跃"""
+        now = time.monotonic()
+        key = (group_id, user_id)
+        last_touch = self._touched.get(key)
+        if last_touch is None or now - last_touch >= self.TOUCH_INTERVAL:
+            self.group_repo.touch_member(group_id, user_id)
+            self._touched[key] = now
+            self._touched.move_to_end(key)
+            while len(self._touched) > self.MAX_TOUCH_RECORDS:
+                self._touched.popitem(last=False)
+
+        board = self._boards.get(group_id)
+        if board is not None:
+            self._boards.move_to_end(group_id)
+            board.last_access = now
+            if user_id not in board.entries:
+                user = self.user_repo.get_by_user_id(user_id)
+                if user:
+                    self._add_member(group_id, board, RankEntry.from_user(user))
+
+        self._evict_idle(now)
+
+    def get_group_ranking(self, group_id: str, limit: int = 10) -> List[RankEntry]:
+        """获取群修为榜"""
+        return self._get_board(group_id).top(limit)
+
+    def get_group_version(self, group_id: str) -> int:
+        """获取群修为榜的数据版本"""
+        return self._get_board(group_id).version
+
+    def get_global_ranking(self, limit: int = 10) -> List[User]:
+        """获取全服修为榜"""
+        ranking = self.user_repo.get_cultivation_ranking(limit)
+        self._global_cultivation.reset(ranking, limit)
+        return ranking
+
+    def get_global_version(self) -> int:
+        """获取全服修为榜的数据版本"""
+        return self._global_cultivation.version
+
+    def get_evil_ranking(self, limit: int = 10) -> List[User]:
+        """获取恶人榜（按斗法胜场）"""
+        ranking = self.user_repo.get_battle_win_ranking(limit)
+        self._global_battle_win.reset(ranking, limit)
+        return ranking
+
+    def get_evil_version(self) -> int:
+        """获取恶人榜的数据版本"""
+        return self._global_battle_win.version
+
+    def on_user_updated(self, user: User):
+        """用户写入后同步更新其所在的常驻群榜单"""
+        self._global_cultivation.observe(user)
+        self._global_battle_win.observe(user)
+        
+        group_ids = self._user_groups.get(user.user_id)
+        if not group_ids:
+            return
+        entry = RankEntry.from_user(user)
+        for group_id in group_ids:
+            self._boards[group_id].upsert(entry)
+
+    def _get_board(self, group_id: str) -> _GroupBoard:
+        """获取群榜单，不在内存中时从数据库加载"""
+        now = time.monotonic()
+        board = self._boards.get(group_id)
+        if board is None:
+            board = _GroupBoard()
+            self._boards[group_id] = board
+            for entry in self.group_repo.get_member_rank_entries(group_id):
+                self._add_member(group_id, board, entry)
+            self._evict_overflow()
+        else:
+            self._boards.move_to_end(group_id)
+        board.last_access = now
+        return board
+
+    def _add_member(self, group_id: str, board: _GroupBoard, entry: RankEntry):
+        board.upsert(entry)
+        self._user_groups.setdefault(entry.user_id, set()).add(group_id)
+
+    def _drop_board(self, group_id: str):
+        board = self._boards.pop(group_id)
+        for user_id in board.entries:
+            group_ids = self._user_groups.get(user_id)
+            if group_ids is None:
+                continue
+            group_ids.discard(group_id)
+            if not group_ids:
+                del self._user_groups[user_id]
+
+    def _evict_overflow(self):
+        """超出群数量上限时淘汰最久未访问的群"""
+        while len(self._boards) > self.max_groups:
+            oldest_group_id = next(iter(self._boards))
+            self._drop_board(oldest_group_id)
+
+    def _evict_idle(self, now: float):
+        """淘汰长时间无人访问的群"""
+        while self._boards:
+            oldest_group_id, oldest_board = next(iter(self._boards.items()))
+            if now - oldest_board.last_access < self.group_idle_seconds:
+                break
+            self._drop_board(oldest_group_id)
@@ -0,0 +1,349 @@
+import bisect
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from ..domain.models import User, MarketOrder, MarketFill
+from ..repositories.sqlite_market_repo import SqliteMarketRepository
+from ..repositories.sqlite_inventory_repo import SqliteInventoryRepository
+from ..repositories.sqlite_item_repo import SqliteItemRepository
+from ..database.connection import transaction
+
+BUY = "buy"
+SELL = "sell"
+
+
+class _BookOrder:
+    """订单簿中的挂单"""
+    __slots__ = ("id", "user_id", "item_id", "side", "price", "remaining")
+
+    def __init__(self, order_id: int, user_id: str, item_id: int, side: str, price: int, remaining: int):
+        self.id = order_id
+        self.user_id = user_id
+        self.item_id = item_id
+        self.side = side
+        self.price = price
+        self.remaining = remaining
+
+
+class _OrderBook:
+    """单个物品的订单簿：按价格分档，同一价格按挂单先后排队"""
+
+    def __init__(self):
+        # 方向 -> {价格: 挂单队列}
+        self._levels: Dict[str, Dict[int, Deque[_BookOrder]]] = {BUY: {}, SELL: {}}
+        # 方向 -> 升序排列的价格档位
+        self._prices: Dict[str, List[int]] = {BUY: [], SELL: []}
+
+    def add(self, order: _BookOrder):
+        levels = self._levels[order.side]
+        queue = levels.get(order.price)
+        if queue is None:
+            queue = levels[order.price] = deque()
+            bisect.insort(self._prices[order.side], order.price)
+        queue.append(order)
+
+    def remove(self, order: _BookOrder):
+        levels = self._levels[order.side]
+        queue = levels.get(order.price)
+        if queue is None:
+            return
+        try:
+            queue.remove(order)
+        except ValueError:
+            return
+        if not queue:
+            del levels[order.price]
+            prices = self._prices[order.side]
+            del prices[bisect.bisect_left(prices, order.price)]
+
+    def match(self, side: str, user_id: str, price: int, quantity: int) -> Tuple[List[Tuple[_BookOrder, int]], bool]:
+        """按价格优先、时间优先计算新挂单可成交的对手单及是否跳过了自己的挂单，不修改订单簿"""
+        opposite = SELL if side == BUY else BUY
+        fills = []
+        skipped_own = False
+        for level_price in self._iter_prices(opposite):
+            if (side == BUY and level_price > price) or (side == SELL and level_price < price):
+                break
+            for resting in self._levels[opposite][level_price]:
+                if quantity <= 0:
+                    return fills, skipped_own
+                if resting.user_id == user_id:
+                    # 不与自己的挂单成交，继续撮合后面的对手单
+                    skipped_own = True
+                    continue
+                traded = min(quantity, resting.remaining)
+                fills.append((resting, traded))
+                quantity -= traded
+        return fills, skipped_own
+
+    def depth(self, side: str, limit: int) -> List[Tuple[int, int]]:
+        """前若干档的 (价格, 总数量)"""
+        result = []
+        for level_price in self._iter_prices(side):
+            if len(result) >= limit:
+                break
+            result.append((level_price, sum(order.remaining for order in self._levels[side][level_price])))
+        return result
+
+    def best(self, side: str) -> Optional[int]:
+        prices = self._prices[side]
+        if not prices:
+            return None
+        return prices[-1] if side == BUY else prices[0]
+
+    def _iter_prices(self, side: str):
+        """按成交优先级遍历价格：买单从高到低，卖单从低到高"""
+        prices = self._prices[side]
+        return reversed(prices) if side == BUY else iter(prices)
+
+
+class MarketService:
+    """坊市：以灵石计价的挂单撮合"""
+
+    CURRENCY = "灵石"
+    # 每位玩家最多同时挂出的订单数
+    MAX_OPEN_ORDERS = 20
+    # 坊市行情展示的档位数
+    DEPTH_LEVELS = 5
+    # 每批交割的成交记录数量
+    SETTLE_BATCH_SIZE = 500
+    # 单笔挂单的最大数量与最高单价
+    MAX_QUANTITY = 1000000
+    MAX_PRICE = 1000000000
+    # 单笔挂单的最大总价（灵石），保证托管与交割的数量不超出数据库整数范围
+    MAX_TOTAL_PRICE = 10 ** 12
+
+    def __init__(self,
+                 market_repo: SqliteMarketRepository,
+                 inventory_repo: SqliteInventoryRepository,
+                 item_repo: SqliteItemRepository,
+                 config: dict):
+        self.market_repo = market_repo
+        self.inventory_repo = inventory_repo
+        self.item_repo = item_repo
+        self.config = config
+        self.fill_retention_days = self.config.get("re_xiuxian", {}).get("market_fill_retention_days", 7)
+
+        self._books: Dict[int, _OrderBook] = {}
+        self._orders: Dict[int, _BookOrder] = {}
+        self._user_orders: Dict[str, Set[int]] = {}
+        self._item_names: Dict[int, str] = {}
+        self._currency_id: Optional[int] = None
+        self._loaded = False
+
+    def place_order(self, user: User, side: str, item_name: str, quantity: int, price: int) -> Tuple[bool, str]:
+        """挂出买单或卖单，能立即成交的部分当场撮合"""
+        if quantity <= 0:
+            return False, "数量必须大于0"
+        if price <= 0:
+            return False, "单价必须大于0"
+        if quantity > self.MAX_QUANTITY:
+            return False, f"单笔挂单最多 {self.MAX_QUANTITY} 个"
+        if price > self.MAX_PRICE:
+            return False, f"单价最高 {self.MAX_PRICE} 灵石"
+        if price * quantity > self.MAX_TOTAL_PRICE:
+            return False, f"单笔挂单总价最高 {self.MAX_TOTAL_PRICE} 灵石"
+
+        self._ensure_loaded()
+        item = self.item_repo.get_by_name(item_name)
+        if not item:
+            return False, f"未找到物品: {item_name}"
+        if self._currency_id is None or item.id == self._currency_id:
+            return False, f"{item_name}无法在坊市交易"
+        if len(self._user_orders.get(user.user_id, ())) >= self.MAX_OPEN_ORDERS:
+            return False, f"最多同时挂出 {self.MAX_OPEN_ORDERS} 个订单，请先撤销部分挂单"
+
+        book = self._books.setdefault(item.id, _OrderBook())
+        matched, skipped_own = book.match(side, user.user_id, price, quantity)
+        filled = sum(traded for _, traded in matched)
+        remaining = quantity - filled
+
+        # 未成交的部分若与自己的挂单价格交叉则不再挂出，避免订单簿出现买价不低于卖价
+        dropped = remaining if skipped_own else 0
+        if dropped and not filled:
+            return False, "该价格会与你自己的挂单成交，请先撤销自己的挂单或调整价格"
+        remaining -= dropped
+
+        # 只托管挂出的数量，撤销的部分无需托管
+        if side == SELL:
+            escrow = {item.id: quantity - dropped}
+        else:
+            escrow = {self._currency_id: price * (quantity - dropped)}
+
+        # 托管、挂单、对手单更新与成交记录在同一事务中写入
+        with transaction(self.market_repo.db_path) as tx:
+            if not self.inventory_repo.remove_items(user.user_id, escrow, tx):
+                if side == SELL:
+                    return False, f"你没有足够的 {item.name}"
+                return False, f"灵石不足，需要 {price * (quantity - dropped)} 灵石"
+
+            order_id = self.market_repo.create_order(MarketOrder(
+                id=0,
+                user_id=user.user_id,
+                item_id=item.id,
+                side=side,
+                price=price,
+                quantity=quantity,
+                remaining=remaining or dropped,
+                status="open" if remaining > 0 else ("cancelled" if dropped else "filled")
+            ), tx)
+
+            fills = []
+            updates = []
+            for resting, traded in matched:
+                # 成交价为先挂单一方的价格，买方多托管的灵石在交割时退还
+                if side == BUY:
+                    buy_order_id, sell_order_id = order_id, resting.id
+                    buyer_id, seller_id = user.user_id, resting.user_id
+                    refund = (price - resting.price) * traded
+                else:
+                    buy_order_id, sell_order_id = resting.id, order_id
+                    buyer_id, seller_id = resting.user_id, user.user_id
+                    refund = 0
+                fills.append(MarketFill(
+                    id=0,
+                    item_id=item.id,
+                    buy_order_id=buy_order_id,
+                    sell_order_id=sell_order_id,
+                    buyer_id=buyer_id,
+                    seller_id=seller_id,
+                    price=resting.price,
+                    quantity=traded,
+                    refund=refund
+                ))
+                left = resting.remaining - traded
+                updates.append((left, "open" if left > 0 else "filled", resting.id))
+            self.market_repo.add_fills(fills, tx)
+            self.market_repo.update_orders(updates, tx)
+
+        # 提交成功后再修改内存中的订单簿
+        for resting, traded in matched:
+            resting.remaining -= traded
+            if resting.remaining <= 0:
+                self._remove(resting)
+        if remaining > 0:
+            self._add(_BookOrder(order_id, user.user_id, item.id, side, price, remaining))
+
+        action = "出售" if side == SELL else "求购"
+        message = f"挂单成功（编号 {order_id}）：{action} {item.name} x{quantity}，单价 {price} 灵石"
+        if filled:
+            turnover = sum(resting.price * traded for resting, traded in matched)
+            message += f"\n立即成交 {filled} 个，成交额 {turnover} 灵石，片刻后到账"
+        if remaining > 0 and filled:
+            message += f"\n剩余 {remaining} 个继续挂单"
+        if dropped:
+            message += f"\n剩余 {dropped} 个会与你自己的挂单成交，已撤销"
+        return True, message
+
+    def cancel_order(self, user: User, order_id: int) -> Tuple[bool, str]:
+        """撤销挂单，退还未成交部分的托管物品或灵石"""
+        self._ensure_loaded()
+        order = self._orders.get(order_id)
+        if not order or order.user_id != user.user_id:
+            return False, f"未找到你的挂单 {order_id}"
+
+        if order.side == SELL:
+            refund = {order.item_id: order.remaining}
+        else:
+            refund = {self._currency_id: order.price * order.remaining}
+
+        with transaction(self.market_repo.db_path) as tx:
+            if not self.market_repo.cancel_order(order.id, tx):
+                return False, f"挂单 {order_id} 已无法撤销"
+            self.inventory_repo.add_items(user.user_id, refund, tx)
+
+        self._remove(order)
+        refund_item_id, refund_quantity = next(iter(refund.items()))
+        return True, f"已撤销挂单 {order_id}，退还 {self._item_name(refund_item_id)} x{refund_quantity}"
+
+    def get_user_orders(self, user_id: str) -> List[Tuple[str, _BookOrder]]:
+        """获取玩家未完成的挂单 [(物品名, 挂单)]"""
+        self._ensure_loaded()
+        return [(self._item_name(self._orders[order_id].item_id), self._orders[order_id])
+                for order_id in sorted(self._user_orders.get(user_id, ()))]
+
+    def get_quotes(self) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """获取各物品的最高买价与最低卖价 [(物品名, 买价, 卖价)]"""
+        self._ensure_loaded()
+        quotes = []
+        for item_id, book in self._books.items():
+            best_bid, best_ask = book.best(BUY), book.best(SELL)
+            if best_bid is not None or best_ask is not None:
+                quotes.append((self._item_name(item_id), best_bid, best_ask))
+        return sorted(quotes)
+
+    def get_depth(self, item_name: str) -> Optional[Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]]:
+        """获取物品的买卖盘口 (买盘, 卖盘)，物品不存在时返回None"""
+        self._ensure_loaded()
+        item = self.item_repo.get_by_name(item_name)
+        if not item:
+            return None
+        book = self._books.get(item.id)
+        if not book:
+            return [], []
+        return book.depth(BUY, self.DEPTH_LEVELS), book.depth(SELL, self.DEPTH_LEVELS)
+
+    def settle_step(self) -> bool:
+        """交割一批成交记录，返回是否还有待交割的记录"""
+        self._ensure_loaded()
+        with transaction(self.market_repo.db_path) as tx:
+            fills = self.market_repo.get_unsettled_fills(self.SETTLE_BATCH_SIZE, tx)
+            if not fills:
+                return False
+
+            # 同一玩家的入账合并后一次写入
+            credits: Dict[str, Dict[int, int]] = {}
+            for fill in fills:
+                buyer = credits.setdefault(fill.buyer_id, {})
+                buyer[fill.item_id] = buyer.get(fill.item_id, 0) + fill.quantity
+                if fill.refund:
+                    buyer[self._currency_id] = buyer.get(self._currency_id, 0) + fill.refund
+                seller = credits.setdefault(fill.seller_id, {})
+                seller[self._currency_id] = seller.get(self._currency_id, 0) + fill.price * fill.quantity
+
+            for user_id, items in credits.items():
+                self.inventory_repo.add_items(user_id, items, tx)
+            self.market_repo.mark_fills_settled([fill.id for fill in fills], tx)
+
+        return len(fills) >= self.SETTLE_BATCH_SIZE
+
+    def prune_step(self) -> bool:
+        """删除一批超过保留期的已交割成交记录，返回是否还有待删除的记录"""
+        if self.fill_retention_days <= 0:
+            return False
+        deleted = self.market_repo.delete_settled_fills(self.fill_retention_days, self.SETTLE_BATCH_SIZE)
+        return deleted >= self.SETTLE_BATCH_SIZE
+
+    def _add(self, order: _BookOrder):
+        self._books.setdefault(order.item_id, _OrderBook()).add(order)
+        self._orders[order.id] = order
+        self._user_orders.setdefault(order.user_id, set()).add(order.id)
+
+    def _remove(self, order: _BookOrder):
+        book = self._books.get(order.item_id)
+        if book:
+            book.remove(order)
+        self._orders.pop(order.id, None)
+        order_ids = self._user_orders.get(order.user_id)
+        if order_ids is not None:
+            order_ids.discard(order.id)
+            if not order_ids:
+                del self._user_orders[order.user_id]
+
+    def _item_name(self, item_id: int) -> str:
+        name = self._item_names.get(item_id)
+        if name is None:
+            item = self.item_repo.get_by_id(item_id)
+            name = item.name if item else f"物品{item_id}"
+            self._item_names[item_id] = name
+        return name
+
+    def _ensure_loaded(self):
+        """首次使用时从数据库加载未完成的挂单"""
+        if self._loaded:
+            return
+        self._item_names = {item.id: item.name for item in self.item_repo.get_all_items()}
+        currency = self.item_repo.get_by_name(self.CURRENCY)
+        self._currency_id = currency.id if currency else None
+        for order in self.market_repo.get_open_orders():
+            self._add(_BookOrder(order.id, order.user_id, order.item_id, order.side, order.price, order.remaining))
+        self._loaded = True
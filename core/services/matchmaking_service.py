@@ -0,0 +1,186 @@
+import math
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from ..domain.models import User
+from ..repositories.sqlite_user_repo import SqliteUserRepository
+from .arena_service import ArenaService
+from .cooldown_service import CooldownService
+
+
+class _Candidate:
+    """匹配索引中的修士"""
+    __slots__ = ("user_id", "power", "tier", "is_in_closing", "deep_closing_end_time")
+
+    def __init__(self, user: User, power: float, tier: int):
+        self.user_id = user.user_id
+        self.power = power
+        self.tier = tier
+        self.is_in_closing = user.is_in_closing
+        self.deep_closing_end_time = user.deep_closing_end_time
+
+
+class _Ticket:
+    """等待匹配的请求"""
+    __slots__ = ("user_id", "unified_msg_origin", "enqueued_at")
+
+    def __init__(self, user_id: str, unified_msg_origin: Optional[str]):
+        self.user_id = user_id
+        self.unified_msg_origin = unified_msg_origin
+        self.enqueued_at = time.monotonic()
+
+
+class MatchmakingService:
+    """匹配斗法：按有效战力分档的内存匹配索引"""
+
+    # 每个档位约为战力的 √2 倍
+    TIERS_PER_DOUBLING = 2
+    # 单个档位最多检查的候选人数
+    SCAN_LIMIT = 32
+    # 立即匹配时的档位搜索半径
+    BASE_RADIUS = 1
+    # 等待匹配时的最大档位搜索半径
+    MAX_RADIUS = 8
+
+    def __init__(self,
+                 user_repo: SqliteUserRepository,
+                 arena_service: ArenaService,
+                 cooldown_service: CooldownService,
+                 config: dict):
+        self.user_repo = user_repo
+        self.arena_service = arena_service
+        self.cooldown_service = cooldown_service
+        self.config = config
+
+        matchmaking_config = self.config.get("re_xiuxian", {})
+        self.expand_seconds = matchmaking_config.get("matchmaking_expand_seconds", 10)
+        self.max_wait_seconds = matchmaking_config.get("matchmaking_max_wait", 60)
+
+        self._candidates: Dict[str, _Candidate] = {}
+        self._tiers: Dict[int, Set[str]] = {}
+        self._waiting: "OrderedDict[str, _Ticket]" = OrderedDict()
+        self._loaded = False
+
+        self.user_repo.add_listener(self.on_user_updated)
+
+    def find_opponent(self, user: User, radius: int = BASE_RADIUS) -> Optional[str]:
+        """在相近战力档位中寻找对手"""
+        self._ensure_loaded()
+        return self._search(user.user_id, self.arena_service.get_effective_power(user), radius)
+
+    def enqueue(self, user_id: str, unified_msg_origin: Optional[str]):
+        """加入等待匹配队列"""
+        self._waiting[user_id] = _Ticket(user_id, unified_msg_origin)
+
+    def is_waiting(self, user_id: str) -> bool:
+        """是否正在等待匹配"""
+        return user_id in self._waiting
+
+    def get_waiting_count(self) -> int:
+        """等待匹配的人数"""
+        return len(self._waiting)
+
+    def cancel(self, user_id: str) -> bool:
+        """取消等待匹配"""
+        return self._waiting.pop(user_id, None) is not None
+
+    def match_waiting(self) -> Tuple[List[Tuple[str, str, Optional[str]]], List[Tuple[str, Optional[str]]]]:
+        """为等待中的请求匹配对手，搜索范围随等待时间逐步扩大
+
+        返回 (匹配成功的 [(攻击方, 对手, 会话)], 超时的 [(用户, 会话)])
+        """
+        matched = []
+        expired = []
+        now = time.monotonic()
+
+        for user_id, ticket in list(self._waiting.items()):
+            waited = now - ticket.enqueued_at
+            candidate = self._candidates.get(user_id)
+            if candidate is None:
+                # 已不可斗法（避世等），直接移出队列
+                del self._waiting[user_id]
+                continue
+
+            radius = min(self.MAX_RADIUS, self.BASE_RADIUS + int(waited // self.expand_seconds))
+            opponent_id = self._search(user_id, candidate.power, radius)
+            if opponent_id:
+                del self._waiting[user_id]
+                matched.append((user_id, opponent_id, ticket.unified_msg_origin))
+            elif waited >= self.max_wait_seconds:
+                del self._waiting[user_id]
+                expired.append((user_id, ticket.unified_msg_origin))
+
+        return matched, expired
+
+    def on_user_updated(self, user: User):
+        """用户写入后同步匹配索引"""
+        if self._loaded:
+            self._index_user(user)
+
+    def _search(self, user_id: str, power: float, radius: int) -> Optional[str]:
+        """从所在档位向两侧逐档搜索可用的对手"""
+        tier = self._get_tier(power)
+        now = datetime.now()
+
+        for distance in range(radius + 1):
+            eligible = []
+            for candidate_tier in {tier - distance, tier + distance}:
+                user_ids = self._tiers.get(candidate_tier)
+                if not user_ids:
+                    continue
+                scanned = 0
+                for candidate_id in user_ids:
+                    if scanned >= self.SCAN_LIMIT:
+                        break
+                    scanned += 1
+                    candidate = self._candidates[candidate_id]
+                    if candidate_id != user_id and self._is_available(candidate, now):
+                        eligible.append(candidate)
+            if eligible:
+                # 同一距离内选战力最接近的，战力相同时随机
+                random.shuffle(eligible)
+                return min(eligible, key=lambda candidate: abs(candidate.power - power)).user_id
+        return None
+
+    def _ensure_loaded(self):
+        """首次使用时从数据库加载匹配索引"""
+        if self._loaded:
+            return
+        for user in self.user_repo.get_battle_candidates():
+            self._index_user(user)
+        self._loaded = True
+
+    def _index_user(self, user: User):
+        self._remove(user.user_id)
+        if not user.talent or user.is_hermit:
+            return
+        power = self.arena_service.get_effective_power(user)
+        candidate = _Candidate(user, power, self._get_tier(power))
+        self._candidates[user.user_id] = candidate
+        self._tiers.setdefault(candidate.tier, set()).add(user.user_id)
+
+    def _remove(self, user_id: str):
+        candidate = self._candidates.pop(user_id, None)
+        if candidate is None:
+            return
+        user_ids = self._tiers.get(candidate.tier)
+        if user_ids is not None:
+            user_ids.discard(user_id)
+            if not user_ids:
+                del self._tiers[candidate.tier]
+
+    def _is_available(self, candidate: _Candidate, now: datetime) -> bool:
+        """对手不在闭关中且不在斗法冷却中"""
+        if candidate.is_in_closing:
+            return False
+        if candidate.deep_closing_end_time and candidate.deep_closing_end_time > now:
+            return False
+        if not self.cooldown_service.check(candidate.user_id, CooldownService.BATTLE):
+            return False
+        return True
+
+    def _get_tier(self, power: float) -> int:
+        """战力档位，按 log2 分档"""
+        return int(math.log2(max(power, 0) + 1) * self.TIERS_PER_DOUBLING)
\ No newline at end of file
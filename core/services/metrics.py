@@ -0,0 +1,163 @@
+import bisect
+import functools
+import inspect
+import time
+from typing import Callable, Dict, List, Tuple
+
+
+class Histogram:
+    """固定分桶的耗时直方图"""
+
+    # 桶上界（毫秒），最后一个桶收纳所有更慢的样本
+    BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.buckets[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """估算分位数（毫秒），不超过实际最大值"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.BOUNDS_MS, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """运行指标：指令耗时、数据库调用、缓存命中率与待处理任务"""
+
+    # 状态报告中最多列出的数据库方法数
+    TOP_QUERIES = 15
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.commands: Dict[str, Histogram] = {}
+        self.command_errors: Dict[str, int] = {}
+        # (仓储, 方法) -> [调用次数, 总耗时(秒), 最大耗时(秒)]
+        self.queries: Dict[Tuple[str, str], list] = {}
+        # 缓存名称 -> 返回 (命中次数, 未命中次数) 的回调
+        self._caches: Dict[str, Callable[[], Tuple[int, int]]] = {}
+        # 任务名称 -> 返回待处理数量的回调
+        self._backlogs: Dict[str, Callable[[], int]] = {}
+        # 启动阶段 -> 耗时(秒)
+        self.startup: Dict[str, float] = {}
+
+    def observe_command(self, command: str, seconds: float, failed: bool = False):
+        """记录一次指令耗时"""
+        histogram = self.commands.get(command)
+        if histogram is None:
+            histogram = self.commands[command] = Histogram()
+        histogram.observe(seconds)
+        if failed:
+            self.command_errors[command] = self.command_errors.get(command, 0) + 1
+
+    def observe_query(self, repo: str, method: str, seconds: float):
+        """记录一次仓储方法调用"""
+        stats = self.queries.get((repo, method))
+        if stats is None:
+            stats = self.queries[(repo, method)] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+        if seconds > stats[2]:
+            stats[2] = seconds
+
+    def instrument(self, repo) -> None:
+        """为仓储对象的公开方法加上计时"""
+        repo_name = type(repo).__name__.replace("Sqlite", "").replace("Repository", "")
+        for name, member in inspect.getmembers(type(repo), inspect.isfunction):
+            if name.startswith("_"):
+                continue
+            setattr(repo, name, self._timed(repo_name, name, getattr(repo, name)))
+
+    def _timed(self, repo_name: str, method_name: str, method):
+        observe = self.observe_query
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                observe(repo_name, method_name, time.perf_counter() - start)
+        return wrapper
+
+    def record_startup(self, phases: Dict[str, float]):
+        """记录插件启动各阶段耗时"""
+        self.startup = dict(phases)
+
+    def register_cache(self, name: str, stats: Callable[[], Tuple[int, int]]):
+        """注册缓存命中率的采集回调"""
+        self._caches[name] = stats
+
+    def register_backlog(self, name: str, size: Callable[[], int]):
+        """注册待处理任务数量的采集回调"""
+        self._backlogs[name] = size
+
+    def format_report(self) -> str:
+        """格式化运行指标"""
+        uptime = int(time.monotonic() - self.started_at)
+        lines = [f"运行时长：{uptime // 3600}小时{uptime % 3600 // 60}分"]
+
+        if self.startup:
+            lines.append("【启动耗时】")
+            lines.append(" ".join(f"{name}{seconds * 1000:.1f}ms" for name, seconds in self.startup.items()))
+
+        lines.append("【指令耗时】")
+        commands = sorted(self.commands.items(), key=lambda kv: kv[1].total, reverse=True)
+        for command, h in commands:
+            errors = self.command_errors.get(command, 0)
+            lines.append(
+                f"{command}: {h.count}次 平均{h.mean:.1f}ms p50≤{h.percentile(0.5):.0f}ms "
+                f"p99≤{h.percentile(0.99):.0f}ms 最大{h.max:.0f}ms" + (f" 出错{errors}次" if errors else "")
+            )
+        if not commands:
+            lines.append("暂无数据")
+
+        lines.append(f"【数据库调用】(按总耗时前{self.TOP_QUERIES})")
+        queries = sorted(self.queries.items(), key=lambda kv: kv[1][1], reverse=True)[:self.TOP_QUERIES]
+        for (repo, method), (count, total, longest) in queries:
+            lines.append(
+                f"{repo}.{method}: {count}次 共{total * 1000:.0f}ms "
+                f"平均{total / count * 1000:.2f}ms 最大{longest * 1000:.1f}ms"
+            )
+        if not queries:
+            lines.append("暂无数据")
+
+        lines.append("【缓存命中率】")
+        lines.extend(self._collect_caches() or ["暂无数据"])
+
+        lines.append("【待处理任务】")
+        lines.extend(self._collect_backlogs() or ["暂无数据"])
+        return "\n".join(lines)
+
+    def _collect_caches(self) -> List[str]:
+        lines = []
+        for name, stats in self._caches.items():
+            hits, misses = stats()
+            total = hits + misses
+            lines.append(f"{name}: 命中 {hits} / 未命中 {misses} (命中率 {hits / total if total else 0.0:.1%})")
+        return lines
+
+    def _collect_backlogs(self) -> List[str]:
+        return [f"{name}: {size()}" for name, size in self._backlogs.items()]
@@ -0,0 +1,74 @@
+from typing import Dict, List, Optional, Tuple
+from ..domain.models import User, Sect, Item, UserItem
+from ..repositories.sqlite_user_repo import SqliteUserRepository
+from ..repositories.sqlite_sect_repo import SqliteSectRepository
+from ..repositories.sqlite_inventory_repo import SqliteInventoryRepository
+from .cooldown_service import CooldownService
+
+
+class PlayerContext:
+    """单条指令内的玩家上下文"""
+
+    def __init__(self,
+                 user_repo: SqliteUserRepository,
+                 sect_repo: SqliteSectRepository,
+                 inventory_repo: SqliteInventoryRepository,
+                 cooldown_service: CooldownService,
+                 user_id: str,
+                 nickname: Optional[str] = None):
+        self.user_repo = user_repo
+        self.sect_repo = sect_repo
+        self.inventory_repo = inventory_repo
+        self.cooldown_service = cooldown_service
+        self.user_id = user_id
+        self.nickname = nickname
+
+        self._user: Optional[User] = None
+        self._sect: Optional[Sect] = None
+        self._inventory: Optional[List[Tuple[Item, UserItem]]] = None
+
+    @property
+    def user(self) -> User:
+        """当前用户，不存在时创建"""
+        if self._user is None:
+            self._user, self._sect = self.user_repo.get_with_sect(self.user_id)
+            if self._user is None:
+                self._user = self.user_repo.create_user(self.user_id, self.nickname)
+        return self._user
+
+    @property
+    def has_talent(self) -> bool:
+        """是否已踏入修仙之路"""
+        return bool(self.user.talent)
+
+    @property
+    def sect(self) -> Optional[Sect]:
+        """用户所在宗门，本条指令中加入或退出宗门后重新加载"""
+        user = self.user
+        if not user.sect_id:
+            return None
+        if self._sect is None or self._sect.id != user.sect_id:
+            self._sect = self.sect_repo.get_by_id(user.sect_id)
+        return self._sect
+
+    @property
+    def inventory(self) -> List[Tuple[Item, UserItem]]:
+        """储物袋中的物品"""
+        if self._inventory is None:
+            self._inventory = self.inventory_repo.get_user_inventory(self.user_id)
+        return self._inventory
+
+    def item_quantities(self) -> Dict[int, int]:
+        """储物袋中各物品的数量 {物品ID: 数量}"""
+        quantities: Dict[int, int] = {}
+        for item, user_item in self.inventory:
+            quantities[item.id] = quantities.get(item.id, 0) + user_item.quantity
+        return quantities
+
+    def cooldown_remaining(self, action: str) -> int:
+        """行动的剩余冷却时间（秒）"""
+        return self.cooldown_service.remaining(self.user_id, action)
+
+    def invalidate_inventory(self):
+        """本条指令修改储物袋后调用，下次访问时重新加载"""
+        self._inventory = None
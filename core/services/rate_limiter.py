@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class _TokenBucket:
+    """令牌桶"""
+    __slots__ = ("tokens", "updated_at", "notified")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated_at = now
+        # 本轮限流是否已提示过，避免刷屏时机器人也跟着刷屏
+        self.notified = False
+
+    def refill(self, capacity: float, rate: float, now: float):
+        self.tokens = min(capacity, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+
+
+class _BucketGroup:
+    """一类限流对象（用户或群）的令牌桶集合"""
+    __slots__ = ("capacity", "rate", "buckets")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.buckets: "OrderedDict[str, _TokenBucket]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.rate > 0
+
+    def get(self, key: str, now: float) -> _TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = _TokenBucket(self.capacity, now)
+            self.buckets[key] = bucket
+            while len(self.buckets) > RateLimiter.MAX_BUCKETS:
+                # 最久未活动的桶早已回满，丢弃与保留等价
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket.refill(self.capacity, self.rate, now)
+        return bucket
+
+
+class RateLimiter:
+    """按用户、按群的指令限流"""
+
+    # 每类限流对象最多保留的令牌桶数量
+    MAX_BUCKETS = 10000
+
+    def __init__(self, config: dict):
+        self.config = config
+        rate_limit_config = self.config.get("re_xiuxian", {})
+        self._users = _BucketGroup(
+            rate_limit_config.get("rate_limit_user_burst", 5),
+            rate_limit_config.get("rate_limit_user_per_second", 0.5)
+        )
+        self._groups = _BucketGroup(
+            rate_limit_config.get("rate_limit_group_burst", 30),
+            rate_limit_config.get("rate_limit_group_per_second", 5)
+        )
+        self.rejected_count = 0
+
+    def acquire(self, user_id: str, group_id: Optional[str] = None) -> Tuple[bool, bool]:
+        """尝试放行一条指令，返回 (是否放行, 是否需要提示用户)"""
+        now = time.monotonic()
+        buckets = []
+        if self._users.enabled:
+            buckets.append(self._users.get(user_id, now))
+        if group_id and self._groups.enabled:
+            buckets.append(self._groups.get(group_id, now))
+
+        limited = [bucket for bucket in buckets if bucket.tokens < 1]
+        if limited:
+            self.rejected_count += 1
+            notify = not any(bucket.notified for bucket in limited)
+            for bucket in limited:
+                bucket.notified = True
+            return False, notify
+
+        for bucket in buckets:
+            bucket.tokens -= 1
+            bucket.notified = False
+        return True, False
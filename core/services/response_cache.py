@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+
+class ResponseCache:
+    """渲染结果缓存（排行榜等高频查看的视图）"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        cache_config = self.config.get("re_xiuxian", {})
+        self.ttl = cache_config.get("response_cache_ttl", 30)
+        self.max_entries = cache_config.get("response_cache_max_entries", 1024)
+
+        # (视图, 范围) -> (数据版本, 过期时间, 渲染结果)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Hashable, float, str]]" = OrderedDict()
+        # 视图 -> [命中次数, 未命中次数]
+        self._stats: Dict[str, list] = {}
+
+    def get_or_render(self, view: str, scope: str, version: Hashable, render: Callable[[], str]) -> str:
+        """获取缓存的渲染结果，版本不一致或已过期时重新渲染"""
+        key = (view, scope)
+        now = time.monotonic()
+        stats = self._stats.setdefault(view, [0, 0])
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version and entry[1] > now:
+            stats[0] += 1
+            self._entries.move_to_end(key)
+            return entry[2]
+
+        stats[1] += 1
+        text = render()
+        self._entries[key] = (version, now + self.ttl, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return text
+
+    def invalidate(self, view: str, scope: str):
+        """使指定视图的缓存失效"""
+        self._entries.pop((view, scope), None)
+
+    def get_stats(self) -> Dict[str, Tuple[int, int, float]]:
+        """获取各视图的命中次数、未命中次数与命中率"""
+        result = {}
+        for view, (hits, misses) in self._stats.items():
+            total = hits + misses
+            result[view] = (hits, misses, hits / total if total else 0.0)
+        return result
+
+    def get_totals(self) -> Tuple[int, int]:
+        """获取所有视图合计的命中次数与未命中次数"""
+        return (sum(hits for hits, _ in self._stats.values()),
+                sum(misses for _, misses in self._stats.values()))
+
+    def format_stats(self) -> str:
+        """格式化命中率统计"""
+        lines = []
+        for view, (hits, misses, hit_rate) in sorted(self.get_stats().items()):
+            lines.append(f"{view}: 命中 {hits} / 未命中 {misses} (命中率 {hit_rate:.1%})")
+        return "\n".join(lines)
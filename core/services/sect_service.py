@@ -1,22 +1,50 @@
-from typing import Optional, List, Tuple
-from datetime import datetime, timedelta
-from ..domain.models import User, Sect
+from collections import OrderedDict
+from typing import Optional, List, Tuple, Dict
+from datetime import datetime
+from astrbot.api import logger
+from ..domain.models import User, Sect, SectMember
 from ..repositories.sqlite_sect_repo import SqliteSectRepository
 from ..repositories.sqlite_user_repo import SqliteUserRepository
 from ..repositories.sqlite_inventory_repo import SqliteInventoryRepository
+from .stats_service import StatsService
+from .cooldown_service import CooldownService
+from .concurrency import retry_on_conflict
+from ..database.connection import transaction
 
 
 class SectService:
+    # 宗门成员列表每页人数
+    MEMBERS_PER_PAGE = 10
+    # 对账任务每批处理的宗门数量
+    RECONCILE_BATCH_SIZE = 20
+    # 贡献流水每批结算的条数
+    SETTLE_BATCH_SIZE = 500
+    # 内存中最多缓存的贡献余额数量
+    MAX_CACHED_BALANCES = 10000
+
     def __init__(self, 
                  sect_repo: SqliteSectRepository,
                  user_repo: SqliteUserRepository,
                  inventory_repo: SqliteInventoryRepository,
-                 config: dict):
+                 cooldown_service: CooldownService,
+                 config: dict,
+                 stats_service: StatsService):
         self.sect_repo = sect_repo
         self.user_repo = user_repo
         self.inventory_repo = inventory_repo
+        self.cooldown_service = cooldown_service
         self.config = config
+        self.stats_service = stats_service
+        self.ledger_retention_days = self.config.get("re_xiuxian", {}).get("sect_ledger_retention_days", 7)
+        # 对账进度：上一批处理到的宗门ID
+        self._reconcile_cursor = 0
+        
+        # 贡献余额与宗门库房缓存（含未结算流水），所有贡献变动都经由本服务写入
+        self._balances: "OrderedDict[Tuple[str, int], float]" = OrderedDict()
+        self._treasuries: Dict[int, float] = {}
+        self._shop_items: Optional[List[Tuple[int, str, Optional[str], float]]] = None
 
+    @retry_on_conflict
     def join_sect(self, user: User, sect_name: str) -> Tuple[bool, str]:
         """加入宗门"""
         # 检查是否已经有宗门
@@ -34,13 +62,15 @@ class SectService:
         # 加入宗门
         user.sect_id = sect.id
         user.sect_position = "弟子"
-        sect.member_count += 1
         
-        self.user_repo.update_user(user)
-        self.sect_repo.update_sect(sect)
+        # 成员变动与宗门人数在同一事务中写入
+        with transaction(self.user_repo.db_path) as tx:
+            self.user_repo.update_user(user, tx)
+            self.sect_repo.add_member_count(sect.id, 1, tx)
         
         return True, f"成功加入宗门 {sect.name}"
 
+    @retry_on_conflict
     def betray_sect(self, user: User) -> Tuple[bool, str]:
         """叛出宗门"""
         # 检查是否有宗门
@@ -56,27 +86,29 @@ class SectService:
             return False, "宗门不存在"
             
         # 检查是否在冷却期
-        if user.last_sect_roll_call_time:
-            cooldown_end = user.last_sect_roll_call_time + timedelta(hours=4)
-            if datetime.now() < cooldown_end:
-                remaining = (cooldown_end - datetime.now()).seconds
-                minutes = remaining // 60
-                seconds = remaining % 60
-                return False, f"叛门冷却中，还需等待 {minutes} 分 {seconds} 秒"
+        can_betray, message = self.check_betray_cooldown(user.user_id)
+        if not can_betray:
+            return False, message
                 
         # 叛出门派
         user.sect_id = None
         user.sect_position = None
-        sect.member_count = max(0, sect.member_count - 1)
         
         # 设置叛门冷却时间
         user.last_sect_roll_call_time = datetime.now()
         
-        self.user_repo.update_user(user)
-        self.sect_repo.update_sect(sect)
+        # 成员变动与宗门人数在同一事务中写入
+        with transaction(self.user_repo.db_path) as tx:
+            self.user_repo.update_user(user, tx)
+            self.sect_repo.add_member_count(sect.id, -1, tx)
+        # 叛门后当天也不能再点卯
+        self.cooldown_service.consume(
+            user.user_id, CooldownService.BETRAY, CooldownService.ROLL_CALL, now=user.last_sect_roll_call_time
+        )
         
         return True, f"成功叛出宗门 {sect.name}，进入4小时叛门冷却期"
 
+    @retry_on_conflict
     def sect_roll_call(self, user: User) -> Tuple[bool, str]:
         """宗门点卯"""
         # 检查是否有宗门
@@ -89,34 +121,146 @@ class SectService:
             return False, "宗门不存在"
             
         # 检查是否已经点卯（每天一次）
-        if user.last_sect_roll_call_time:
-            # 检查是否是同一天
-            today = datetime.now().date()
-            last_call_date = user.last_sect_roll_call_time.date()
-            if today == last_call_date:
-                return False, "今天已经点卯过了"
+        can_roll_call, message = self.check_roll_call_cooldown(user.user_id)
+        if not can_roll_call:
+            return False, message
                 
-        # 点卯成功，给予贡献
+        # 点卯时间与贡献流水在同一事务中写入，版本冲突重试时不会重复发放贡献
+        user.last_sect_roll_call_time = datetime.now()
         contribution = self._calculate_roll_call_contribution(user)
-        self.sect_repo.add_user_contribution(user.user_id, sect.id, contribution)
+        with transaction(self.user_repo.db_path) as tx:
+            self.user_repo.update_user(user, tx)
+            self.sect_repo.append_ledger(user.user_id, sect.id, contribution, "点卯", tx)
+        self._apply_ledger(user.user_id, sect.id, contribution)
         
-        # 更新点卯时间
-        user.last_sect_roll_call_time = datetime.now()
-        self.user_repo.update_user(user)
+        # 点卯后4小时内不能叛出宗门
+        self.cooldown_service.consume(
+            user.user_id, CooldownService.ROLL_CALL, CooldownService.BETRAY, now=user.last_sect_roll_call_time
+        )
+        self.stats_service.record_safely(user.user_id, "contribution", contribution)
         
         return True, f"点卯成功，获得 {contribution} 点宗门贡献"
 
+    def get_contribution_balance(self, user_id: str, sect_id: int) -> float:
+        """获取玩家在宗门的可用贡献"""
+        key = (user_id, sect_id)
+        balance = self._balances.get(key)
+        if balance is None:
+            balance = self.sect_repo.get_contribution_balance(user_id, sect_id)
+            self._balances[key] = balance
+            while len(self._balances) > self.MAX_CACHED_BALANCES:
+                self._balances.popitem(last=False)
+        else:
+            self._balances.move_to_end(key)
+        return balance
+
+    def get_treasury(self, sect_id: int) -> float:
+        """获取宗门库房余额"""
+        treasury = self._treasuries.get(sect_id)
+        if treasury is None:
+            treasury = self.sect_repo.get_treasury(sect_id)
+            self._treasuries[sect_id] = treasury
+        return treasury
+
+    def get_shop_items(self) -> List[Tuple[int, str, Optional[str], float]]:
+        """获取贡献商店物品 (物品ID, 名称, 描述, 价格)"""
+        if self._shop_items is None:
+            self._shop_items = self.sect_repo.get_shop_items()
+        return self._shop_items
+
+    def exchange(self, user: User, item_name: str, quantity: int = 1) -> Tuple[bool, str]:
+        """在贡献商店兑换物品"""
+        if not user.sect_id:
+            return False, "你没有宗门，无法兑换"
+        if quantity <= 0:
+            return False, "兑换数量必须大于0"
+        
+        shop_item = next((entry for entry in self.get_shop_items() if entry[1] == item_name), None)
+        if not shop_item:
+            return False, f"宗门商店中没有 {item_name}"
+        item_id, name, _, price = shop_item
+        cost = price * quantity
+        
+        # 余额均来自内存缓存，无需查询数据库
+        balance = self.get_contribution_balance(user.user_id, user.sect_id)
+        if balance < cost:
+            return False, f"宗门贡献不足，需要 {int(cost)} 点，当前可用 {int(balance)} 点"
+        if self.get_treasury(user.sect_id) < cost:
+            return False, "宗门库房不足，暂时无法兑换"
+        
+        # 消耗流水与物品发放在同一事务中写入
+        with transaction(self.sect_repo.db_path) as tx:
+            self.sect_repo.append_ledger(user.user_id, user.sect_id, -cost, "兑换", tx)
+            self.inventory_repo.add_item(user.user_id, item_id, quantity, tx)
+        self._apply_ledger(user.user_id, user.sect_id, -cost)
+        
+        return True, f"兑换成功，消耗 {int(cost)} 点宗门贡献，获得 {name} x{quantity}"
+
+    def settle_step(self) -> bool:
+        """结算一批贡献流水，返回是否还有待结算的流水"""
+        return self.sect_repo.settle_ledger(self.SETTLE_BATCH_SIZE) >= self.SETTLE_BATCH_SIZE
+
+    def prune_step(self) -> bool:
+        """删除一批超过保留期的已结算流水，返回是否还有待删除的流水"""
+        if self.ledger_retention_days <= 0:
+            return False
+        deleted = self.sect_repo.delete_settled_ledger(self.ledger_retention_days, self.SETTLE_BATCH_SIZE)
+        return deleted >= self.SETTLE_BATCH_SIZE
+
+    def _apply_ledger(self, user_id: str, sect_id: int, amount: float):
+        """流水写入后同步缓存的余额（未缓存的下次从数据库加载时已包含该流水）"""
+        key = (user_id, sect_id)
+        if key in self._balances:
+            self._balances[key] += amount
+        if sect_id in self._treasuries:
+            self._treasuries[sect_id] += amount
+
+    def check_betray_cooldown(self, user_id: str) -> Tuple[bool, str]:
+        """检查叛门冷却（只查内存，无需加载用户）"""
+        remaining = self.cooldown_service.remaining(user_id, CooldownService.BETRAY)
+        if remaining > 0:
+            minutes = remaining // 60
+            seconds = remaining % 60
+            return False, f"叛门冷却中，还需等待 {minutes} 分 {seconds} 秒"
+        return True, ""
+
+    def check_roll_call_cooldown(self, user_id: str) -> Tuple[bool, str]:
+        """检查今日是否已点卯（只查内存，无需加载用户）"""
+        if not self.cooldown_service.check(user_id, CooldownService.ROLL_CALL):
+            return False, "今天已经点卯过了"
+        return True, ""
+
+    def reconcile_step(self) -> bool:
+        """对账一批宗门的成员数与总贡献，返回本轮是否还有待对账的宗门"""
+        sect_ids = self.sect_repo.get_sect_ids_after(self._reconcile_cursor, self.RECONCILE_BATCH_SIZE)
+        if not sect_ids:
+            self._reconcile_cursor = 0
+            return False
+        
+        for sect_id in sect_ids:
+            # 每个宗门单独提交，避免长时间持有写锁
+            if self.sect_repo.reconcile_sect(sect_id):
+                self._treasuries.pop(sect_id, None)
+                logger.info(f"宗门 {sect_id} 的成员数、总贡献或库房存在偏差，已修正")
+        self._reconcile_cursor = sect_ids[-1]
+        return True
+
     def get_user_sect(self, user: User) -> Optional[Sect]:
         """获取用户所在宗门"""
         if not user.sect_id:
             return None
         return self.sect_repo.get_by_id(user.sect_id)
 
-    def get_sect_members(self, sect_id: int) -> List[User]:
-        """获取宗门成员"""
-        # 这里需要在user_repo中添加根据sect_id查询的方法
-        # 简化处理，返回空列表
-        return []
+    def get_sect_members(self, sect_id: int, page: int = 1,
+                         order_by: str = "contribution") -> Tuple[List[SectMember], int, int, int]:
+        """分页获取宗门成员，返回 (当前页成员, 实际页码, 总页数, 成员总数)"""
+        total = self.user_repo.count_sect_members(sect_id)
+        total_pages = max(1, (total + self.MEMBERS_PER_PAGE - 1) // self.MEMBERS_PER_PAGE)
+        page = min(max(1, page), total_pages)
+        members = self.user_repo.get_sect_members(
+            sect_id, order_by, self.MEMBERS_PER_PAGE, (page - 1) * self.MEMBERS_PER_PAGE
+        )
+        return members, page, total_pages, total
 
     def _calculate_roll_call_contribution(self, user: User) -> float:
         """计算点卯贡献"""
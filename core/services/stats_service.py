@@ -0,0 +1,77 @@
+import time
+from typing import Optional, Dict, List, Tuple
+from astrbot.api import logger
+from ..domain.models import RankEntry
+from ..repositories.sqlite_stats_repo import SqliteStatsRepository
+from ..repositories.sqlite_user_repo import SqliteUserRepository
+
+
+class StatsService:
+    """滚动时间窗口统计（日榜/周榜）"""
+
+    # 统计项 -> 展示名称
+    METRICS = {
+        "exp": "修为",
+        "battle_win": "斗法",
+        "contribution": "贡献",
+    }
+
+    # 排行窗口 -> 小时数
+    WINDOWS = {
+        "日榜": 24,
+        "周榜": 24 * 7,
+    }
+
+    def __init__(self,
+                 stats_repo: SqliteStatsRepository,
+                 user_repo: SqliteUserRepository,
+                 config: dict):
+        self.stats_repo = stats_repo
+        self.user_repo = user_repo
+        self.config = config
+        self.retention_hours = self.config.get("re_xiuxian", {}).get("stats_retention_hours", 192)
+        # 统计项 -> 数据版本，用于排行渲染缓存失效
+        self._versions: Dict[str, int] = {}
+
+    def record(self, user_id: str, metric: str, value: float):
+        """记录一次统计增量"""
+        if not value:
+            return
+        self.stats_repo.add_to_bucket(user_id, metric, self._current_bucket(), value)
+        self._versions[metric] = self._versions.get(metric, 0) + 1
+
+    def record_safely(self, user_id: str, metric: str, value: float):
+        """记录统计增量，失败时只记日志，不影响已完成的业务操作"""
+        try:
+            self.record(user_id, metric, value)
+        except Exception as e:
+            logger.error(f"记录统计 {metric} 失败 (user_id={user_id}): {e}")
+
+    def get_version(self, metric: str) -> int:
+        """获取统计项的数据版本"""
+        return self._versions.get(metric, 0)
+
+    def get_window_ranking(self, metric: str, hours: int, limit: int = 10,
+                           group_id: Optional[str] = None) -> List[Tuple[RankEntry, float]]:
+        """获取最近 hours 小时内的排行"""
+        since_bucket = self._current_bucket() - hours + 1
+        totals = self.stats_repo.get_window_ranking(metric, since_bucket, limit, group_id)
+        if not totals:
+            return []
+
+        entries = {entry.user_id: entry for entry in self.user_repo.get_rank_entries([user_id for user_id, _ in totals])}
+        return [(entries[user_id], total) for user_id, total in totals if user_id in entries]
+
+    def expire_step(self) -> bool:
+        """清理一个过期的小时桶，返回是否还有待清理的桶"""
+        cutoff = self._current_bucket() - self.retention_hours
+        for metric in self.METRICS:
+            oldest_bucket = self.stats_repo.get_oldest_bucket(metric)
+            if oldest_bucket is not None and oldest_bucket < cutoff:
+                self.stats_repo.delete_bucket(metric, oldest_bucket)
+                return True
+        return False
+
+    def _current_bucket(self) -> int:
+        """获取当前小时桶编号"""
+        return int(time.time()) // 3600
@@ -0,0 +1,97 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set, Tuple
+from ..domain.models import User
+from ..repositories.sqlite_user_repo import SqliteUserRepository
+
+
+class TargetService:
+    """斗法、赠送等指令的目标解析"""
+
+    # 名称匹配到多人时最多列出的候选数量
+    MAX_CANDIDATES = 5
+
+    def __init__(self, user_repo: SqliteUserRepository):
+        self.user_repo = user_repo
+
+        # 名称 -> 使用该名称（道号或昵称）的用户
+        self._name_users: Dict[str, Set[str]] = {}
+        # 按字典序排列的所有名称，用于前缀匹配
+        self._sorted_names: List[str] = []
+        # 用户 -> 当前已索引的名称
+        self._user_names: Dict[str, Tuple[str, ...]] = {}
+        self._loaded = False
+
+        self.user_repo.add_listener(self.on_user_updated)
+
+    def resolve(self, mentioned_ids: List[str], name: str) -> Tuple[Optional[str], str]:
+        """解析目标用户，优先使用@提及，其次按道号/昵称精确或前缀匹配"""
+        if mentioned_ids:
+            return mentioned_ids[0], ""
+
+        name = name.strip().lstrip("@")
+        if not name:
+            return None, "请@对方或输入对方的道号"
+
+        self._ensure_loaded()
+
+        # 精确匹配
+        user_ids = self._name_users.get(name, set())
+        if not user_ids:
+            # 前缀匹配
+            user_ids = set()
+            index = bisect_left(self._sorted_names, name)
+            while index < len(self._sorted_names) and self._sorted_names[index].startswith(name):
+                user_ids |= self._name_users[self._sorted_names[index]]
+                index += 1
+
+        if not user_ids:
+            return None, f"未找到道友：{name}"
+        if len(user_ids) > 1:
+            candidates = sorted(self._display_name(user_id) for user_id in user_ids)[:self.MAX_CANDIDATES]
+            return None, f"找到多位道友，请@对方或输入完整道号：{'、'.join(candidates)}"
+        return next(iter(user_ids)), ""
+
+    def on_user_updated(self, user: User):
+        """用户写入后同步名称索引"""
+        if self._loaded:
+            self._index_user(user.user_id, user.dao_name, user.nickname)
+
+    def _ensure_loaded(self):
+        """首次使用时从数据库加载名称索引"""
+        if self._loaded:
+            return
+        for user_id, dao_name, nickname in self.user_repo.get_all_name_entries():
+            self._index_user(user_id, dao_name, nickname)
+        self._loaded = True
+
+    def _index_user(self, user_id: str, dao_name: Optional[str], nickname: Optional[str]):
+        names = tuple(name for name in (dao_name, nickname) if name)
+        old_names = self._user_names.get(user_id, ())
+        if names == old_names:
+            return
+
+        for name in old_names:
+            user_ids = self._name_users.get(name)
+            if user_ids is None:
+                continue
+            user_ids.discard(user_id)
+            if not user_ids:
+                del self._name_users[name]
+                index = bisect_left(self._sorted_names, name)
+                if index < len(self._sorted_names) and self._sorted_names[index] == name:
+                    del self._sorted_names[index]
+
+        for name in names:
+            if name not in self._name_users:
+                self._name_users[name] = set()
+                insort(self._sorted_names, name)
+            self._name_users[name].add(user_id)
+
+        if names:
+            self._user_names[user_id] = names
+        else:
+            self._user_names.pop(user_id, None)
+
+    def _display_name(self, user_id: str) -> str:
+        names = self._user_names.get(user_id, ())
+        return names[0] if names else user_id
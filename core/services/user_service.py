@@ -2,6 +2,7 @@ import random
 from typing import Optional
 from ..domain.models import User
 from ..repositories.sqlite_user_repo import SqliteUserRepository
+from .concurrency import retry_on_conflict
 
 
 class UserService:
@@ -43,6 +44,7 @@ class UserService:
             user = self.user_repo.create_user(user_id, nickname)
         return user
 
+    @retry_on_conflict
     def detect_talent(self, user: User, platform_nickname: Optional[str] = None) -> bool:
         """检测灵根，初始化修仙者"""
         if user.talent:
@@ -98,6 +100,7 @@ class UserService:
         
         return self.user_repo.update_user(user)
 
+    @retry_on_conflict
     def update_user_nickname(self, user: User, nickname: str) -> bool:
         """更新用户昵称"""
         user.nickname = nickname
@@ -1,20 +1,27 @@
 from typing import AsyncGenerator
 from astrbot.api.event import AstrMessageEvent, MessageEventResult as EventResult
 from astrbot.api import logger
+from .common import get_mentioned_user_ids, get_player_context, card_result, NO_TALENT_MESSAGE
 
 
 async def battle(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
     """斗法"""
     user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
+    
+    # 冷却中直接拒绝，无需读取数据库
+    can_battle, message = plugin.arena_service.check_battle_cooldown(user_id)
+    if not can_battle:
+        yield event.plain_result(message)
+        return
     
     # 获取攻击者
-    attacker = plugin.user_service.get_or_create_user(user_id, nickname)
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not attacker.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    attacker = ctx.user
     
     # 解析命令，获取被挑战者
     message = event.message_str.strip()
@@ -22,55 +29,158 @@ async def battle(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult,
         yield event.plain_result("命令格式错误，请使用：斗法 @对手")
         return
     
-    # 获取被挑战者ID（简化处理，实际应该从消息中解析@的用户）
-    # 这里需要根据平台具体实现解析被挑战者ID的逻辑
-    # 暂时返回提示信息
-    yield event.plain_result("斗法功能正在开发中...")
+    # 优先使用@的用户，否则按道号/昵称查找
+    defender_id, error = plugin.target_service.resolve(get_mentioned_user_ids(event), message[2:])
+    if not defender_id:
+        yield event.plain_result(error)
+        return
+    
+    success, message = plugin.arena_service.battle(attacker, defender_id)
+    yield event.plain_result(message)
 
 
-async def cultivation_ranking(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
-    """修为排行榜"""
+async def match_battle(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """匹配斗法：自动寻找实力相近的对手"""
     user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
     
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 冷却中直接拒绝，无需读取数据库
+    can_battle, message = plugin.arena_service.check_battle_cooldown(user_id)
+    if not can_battle:
+        yield event.plain_result(message)
+        return
     
-    # 获取修为排行榜
-    ranking = plugin.arena_service.get_cultivation_ranking(10)
+    ctx = get_player_context(plugin, event)
     
-    if not ranking:
-        yield event.plain_result("暂无排行数据")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    attacker = ctx.user
     
-    # 构造排行榜信息
-    ranking_info = "=== 修为排行榜 ===\n"
-    for i, rank_user in enumerate(ranking, 1):
-        name = rank_user.dao_name or rank_user.nickname or f"修士{i}"
-        ranking_info += f"第{i}名：{name} ({rank_user.realm}) - {int(rank_user.cultivation)} 修为\n"
+    can_battle, message = plugin.arena_service.check_can_battle(attacker)
+    if not can_battle:
+        yield event.plain_result(message)
+        return
     
-    yield event.plain_result(ranking_info)
+    matchmaking = plugin.matchmaking_service
+    if matchmaking.is_waiting(user_id):
+        yield event.plain_result("你已在等待匹配中，请耐心等候")
+        return
+    
+    opponent_id = matchmaking.find_opponent(attacker)
+    if not opponent_id:
+        # 暂无合适对手，进入等待队列，由后台任务逐步放宽范围继续匹配
+        matchmaking.enqueue(user_id, event.unified_msg_origin)
+        yield event.plain_result("正在寻找实力相近的对手，匹配成功后将通知你")
+        return
+    
+    success, message = plugin.arena_service.battle(attacker, opponent_id)
+    yield event.plain_result(message)
 
 
-async def evil_ranking(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
-    """恶人排行榜"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
+async def cultivation_ranking(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """修为排行榜（群聊中为本群榜单）"""
+    leaderboard = plugin.leaderboard_service
     
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 群聊中只统计本群活跃过的修士，私聊中显示全服榜单
+    if event.get_group_id():
+        scope = event.unified_msg_origin
+        ranking_info = plugin.response_cache.get_or_render(
+            "修为榜", scope, leaderboard.get_group_version(scope),
+            lambda: _format_cultivation_ranking("=== 本群修为榜 ===", leaderboard.get_group_ranking(scope, 10))
+        )
+    else:
+        ranking_info = plugin.response_cache.get_or_render(
+            "修为榜", "global", leaderboard.get_global_version(),
+            lambda: _format_cultivation_ranking("=== 修为排行榜 ===", leaderboard.get_global_ranking(10))
+        )
     
-    # 获取恶人排行榜
-    ranking = plugin.arena_service.get_evil_ranking(10)
+    yield await card_result(plugin, event, f"排行榜:{ranking_info}", ranking_info)
+
+
+async def global_cultivation_ranking(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """全服修为排行榜"""
+    leaderboard = plugin.leaderboard_service
+    ranking_info = plugin.response_cache.get_or_render(
+        "修为榜", "global", leaderboard.get_global_version(),
+        lambda: _format_cultivation_ranking("=== 修为排行榜 ===", leaderboard.get_global_ranking(10))
+    )
     
+    yield await card_result(plugin, event, f"排行榜:{ranking_info}", ranking_info)
+
+
+def _format_cultivation_ranking(title: str, ranking) -> str:
+    """构造修为排行榜信息"""
     if not ranking:
-        yield event.plain_result("暂无排行数据")
-        return
+        return "暂无排行数据"
     
-    # 构造排行榜信息
-    ranking_info = "=== 恶人排行榜 ===\n"
+    ranking_info = f"{title}\n"
     for i, rank_user in enumerate(ranking, 1):
         name = rank_user.dao_name or rank_user.nickname or f"修士{i}"
-        ranking_info += f"第{i}名：{name} - {rank_user.total_battle_win_count} 胜\n"
+        ranking_info += f"第{i}名：{name} ({rank_user.realm}) - {int(rank_user.cultivation)} 修为\n"
+    return ranking_info
+
+
+async def daily_ranking(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """近24小时排行榜"""
+    async for r in _window_ranking(plugin, event, "日榜"):
+        yield r
+
+
+async def weekly_ranking(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """近7天排行榜"""
+    async for r in _window_ranking(plugin, event, "周榜"):
+        yield r
+
+
+async def _window_ranking(plugin, event: AstrMessageEvent, window: str) -> AsyncGenerator[EventResult, None]:
+    """滚动时间窗口排行榜（修为/斗法/贡献）"""
+    stats_service = plugin.stats_service
+    
+    # 解析统计项，默认为修为
+    metric_name = event.message_str.strip()[len(window):].strip() or "修为"
+    metric = next((key for key, name in stats_service.METRICS.items() if name == metric_name), None)
+    if not metric:
+        options = "/".join(stats_service.METRICS.values())
+        yield event.plain_result(f"命令格式错误，请使用：{window} [{options}]")
+        return
+    
+    # 群聊中只统计本群活跃过的修士
+    group_id = event.unified_msg_origin if event.get_group_id() else None
+    title = f"=== {'本群' if group_id else ''}{metric_name}{window} ==="
+    
+    def render() -> str:
+        ranking = stats_service.get_window_ranking(metric, stats_service.WINDOWS[window], 10, group_id)
+        if not ranking:
+            return "暂无排行数据"
+        
+        # 构造排行榜信息
+        ranking_info = f"{title}\n"
+        for i, (rank_user, total) in enumerate(ranking, 1):
+            name = rank_user.dao_name or rank_user.nickname or f"修士{i}"
+            ranking_info += f"第{i}名：{name} - {int(total)}\n"
+        return ranking_info
+    
+    ranking_info = plugin.response_cache.get_or_render(
+        f"{metric_name}{window}", group_id or "global", stats_service.get_version(metric), render
+    )
+    yield await card_result(plugin, event, f"排行榜:{ranking_info}", ranking_info)
+
+
+async def evil_ranking(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """恶人排行榜"""
+    leaderboard = plugin.leaderboard_service
+    
+    def render() -> str:
+        ranking = leaderboard.get_evil_ranking(10)
+        if not ranking:
+            return "暂无排行数据"
+        
+        # 构造排行榜信息
+        ranking_info = "=== 恶人排行榜 ===\n"
+        for i, rank_user in enumerate(ranking, 1):
+            name = rank_user.dao_name or rank_user.nickname or f"修士{i}"
+            ranking_info += f"第{i}名：{name} - {rank_user.total_battle_win_count} 胜\n"
+        return ranking_info
     
-    yield event.plain_result(ranking_info)
\ No newline at end of file
+    ranking_info = plugin.response_cache.get_or_render("恶人榜", "global", leaderboard.get_evil_version(), render)
+    yield await card_result(plugin, event, f"排行榜:{ranking_info}", ranking_info)
@@ -0,0 +1,56 @@
+import asyncio
+from typing import List
+from astrbot.api import logger
+from astrbot.api.event import AstrMessageEvent, MessageEventResult
+from astrbot.api.message_components import At
+from ..core.services.player_context import PlayerContext
+
+NO_TALENT_MESSAGE = "你尚未踏入修仙之路，请先使用「检测灵根」命令"
+
+# 玩家上下文在事件上的存放键
+_CONTEXT_KEY = "re_xiuxian_player_context"
+
+
+def get_mentioned_user_ids(event: AstrMessageEvent) -> List[str]:
+    """获取消息中@的用户ID（排除机器人自身与@全体成员）"""
+    self_id = str(event.get_self_id())
+    mentioned_ids = []
+    for component in event.get_messages():
+        if isinstance(component, At):
+            user_id = str(component.qq)
+            if user_id and user_id != self_id and user_id != "all" and user_id not in mentioned_ids:
+                mentioned_ids.append(user_id)
+    return mentioned_ids
+
+
+def get_player_context(plugin, event: AstrMessageEvent) -> PlayerContext:
+    """获取本条指令的玩家上下文，同一事件内只构建一次"""
+    ctx = event.get_extra(_CONTEXT_KEY)
+    if ctx is None:
+        ctx = PlayerContext(
+            plugin.user_repo,
+            plugin.sect_repo,
+            plugin.inventory_repo,
+            plugin.cooldown_service,
+            event.get_sender_id(),
+            event.get_sender_name()
+        )
+        event.set_extra(_CONTEXT_KEY, ctx)
+    return ctx
+
+
+async def card_result(plugin, event: AstrMessageEvent, key: str, text: str) -> MessageEventResult:
+    """以图片卡片回复带标题的文字，无法生成图片时回复原文字"""
+    renderer = plugin.card_renderer
+    if not renderer.available or not text.startswith("==="):
+        return event.plain_result(text)
+
+    path = renderer.lookup(key)
+    if path is None:
+        # 渲染较耗时，放到线程中执行以免阻塞事件循环
+        try:
+            path = await asyncio.to_thread(renderer.render, key, text)
+        except Exception as e:
+            logger.warning(f"生成图片卡片失败: {e}")
+            path = None
+    return event.image_result(path) if path else event.plain_result(text)
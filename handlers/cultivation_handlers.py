@@ -2,15 +2,15 @@ from typing import AsyncGenerator
 from datetime import datetime
 from astrbot.api.event import AstrMessageEvent, MessageEventResult
 from astrbot.api import logger
+from .common import get_player_context, card_result, NO_TALENT_MESSAGE
 
 
 async def detect_talent(plugin, event: AstrMessageEvent) -> AsyncGenerator[MessageEventResult, None]:
     """检测灵根"""
-    user_id = event.get_sender_id()
     nickname = event.get_sender_name()
     
     # 获取或创建用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    user = get_player_context(plugin, event).user
     
     # 检查是否已检测过灵根
     if user.talent:
@@ -27,16 +27,14 @@ async def detect_talent(plugin, event: AstrMessageEvent) -> AsyncGenerator[Messa
 
 async def my_talent(plugin, event: AstrMessageEvent) -> AsyncGenerator[MessageEventResult, None]:
     """查看自己的修仙档案"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 检查闭关状态
     if user.is_in_closing:
@@ -48,12 +46,9 @@ async def my_talent(plugin, event: AstrMessageEvent) -> AsyncGenerator[MessageEv
             # 闭关已完成
             yield event.plain_result(message)
     
-    # 获取宗门信息
-    sect_name = "无"
-    if user.sect_id:
-        sect = plugin.sect_service.get_user_sect(user)
-        if sect:
-            sect_name = sect.name
+    # 宗门信息已随用户一并查出
+    sect = ctx.sect
+    sect_name = sect.name if sect else "无"
     
     # 构造档案信息
     profile = f"=== 修仙档案 ===\n"
@@ -65,35 +60,50 @@ async def my_talent(plugin, event: AstrMessageEvent) -> AsyncGenerator[MessageEv
     profile += f"总闭关次数：{user.total_closing_count}\n"
     profile += f"总斗法次数：{user.total_battle_count} (胜 {user.total_battle_win_count})\n"
     
+    statuses = []
     if user.is_hermit:
-        profile += "状态：避世中\n"
+        statuses.append("避世中")
     
     if user.deep_closing_end_time and user.deep_closing_end_time > datetime.now():
-        profile += "状态：深度闭关中\n"
+        statuses.append("深度闭关中")
     elif user.is_in_closing:
-        profile += "状态：闭关修炼中\n"
+        statuses.append("闭关修炼中")
     
-    yield event.plain_result(profile)
+    for status in statuses:
+        profile += f"状态：{status}\n"
+    
+    # 档案随用户数据版本变化，版本不变时直接复用已生成的卡片
+    card_key = f"档案:{user.user_id}:{user.version}:{sect_name}:{'/'.join(statuses)}"
+    yield await card_result(plugin, event, card_key, profile)
 
 
 async def closed_door_cultivation(plugin, event: AstrMessageEvent) -> AsyncGenerator[MessageEventResult, None]:
     """闭关修炼"""
     user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
     
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 冷却中直接拒绝，无需读取数据库
+    can_close, message = plugin.cultivation_service.check_closing_cooldown(user_id)
+    if not can_close:
+        yield event.plain_result(message)
+        return
+    
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 如果已经在闭关，检查闭关状态
     if user.is_in_closing:
         success, message = plugin.cultivation_service.check_closing_door_cultivation(user)
         yield event.plain_result(message)
     else:
+        # 保存用户的 unified_msg_origin 用于后续发送消息，随闭关状态一并写入
+        user.unified_msg_origin = event.unified_msg_origin
+        
         # 开始闭关修炼
         success, message = plugin.cultivation_service.start_closing_door_cultivation(user)
         if success:
@@ -105,15 +115,11 @@ async def closed_door_cultivation(plugin, event: AstrMessageEvent) -> AsyncGener
             end_time = user.closing_start_time + timedelta(seconds=user.closing_duration)
             delay = (end_time - plugin.cultivation_service._get_current_time()).total_seconds()
             
-            # 保存用户的 unified_msg_origin 用于后续发送消息
-            user.unified_msg_origin = event.unified_msg_origin
-            plugin.user_repo.update_user(user)
-            
             # 创建并保存定时任务
             if user_id in plugin.cultivation_tasks:
                 plugin.cultivation_tasks[user_id].cancel()
             
-            task = asyncio.create_task(plugin._cultivation_timer(user, delay, user_id))
+            task = asyncio.create_task(plugin._cultivation_timer(delay, user_id))
             plugin.cultivation_tasks[user_id] = task
             
         yield event.plain_result(message)
@@ -121,16 +127,14 @@ async def closed_door_cultivation(plugin, event: AstrMessageEvent) -> AsyncGener
 
 async def deep_closed_door(plugin, event: AstrMessageEvent) -> AsyncGenerator[MessageEventResult, None]:
     """深度闭关"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 开始深度闭关
     success, message = plugin.cultivation_service.start_deep_cultivation(user)
@@ -139,16 +143,14 @@ async def deep_closed_door(plugin, event: AstrMessageEvent) -> AsyncGenerator[Me
 
 async def check_deep_cultivation(plugin, event: AstrMessageEvent) -> AsyncGenerator[MessageEventResult, None]:
     """查看深度闭关状态"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 检查深度闭关状态
     success, message = plugin.cultivation_service.check_deep_cultivation(user)
@@ -157,16 +159,14 @@ async def check_deep_cultivation(plugin, event: AstrMessageEvent) -> AsyncGenera
 
 async def force_exit_cultivation(plugin, event: AstrMessageEvent) -> AsyncGenerator[MessageEventResult, None]:
     """强行出关"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 强行出关
     success, message = plugin.cultivation_service.force_exit_cultivation(user)
@@ -175,16 +175,14 @@ async def force_exit_cultivation(plugin, event: AstrMessageEvent) -> AsyncGenera
 
 async def hermit_mode(plugin, event: AstrMessageEvent) -> AsyncGenerator[MessageEventResult, None]:
     """开启避世模式"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 开启避世模式
     success, message = plugin.cultivation_service.toggle_hermit_mode(user, True)
@@ -193,16 +191,14 @@ async def hermit_mode(plugin, event: AstrMessageEvent) -> AsyncGenerator[Message
 
 async def return_world(plugin, event: AstrMessageEvent) -> AsyncGenerator[MessageEventResult, None]:
     """关闭避世模式"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 关闭避世模式
     success, message = plugin.cultivation_service.toggle_hermit_mode(user, False)
@@ -1,23 +1,21 @@
 from typing import AsyncGenerator
 from astrbot.api.event import AstrMessageEvent, MessageEventResult as EventResult
 from astrbot.api import logger
+from .common import get_mentioned_user_ids, get_player_context, NO_TALENT_MESSAGE
 
 
 async def inventory(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
     """查看储物袋"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
     
     # 获取用户库存
-    inventory_items = plugin.inventory_service.get_user_inventory(user_id)
+    inventory_items = ctx.inventory
     
     if not inventory_items:
         yield event.plain_result("你的储物袋空空如也")
@@ -36,16 +34,14 @@ async def inventory(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResu
 
 async def take_pill(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
     """服用丹药"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 解析命令
     message = event.message_str.strip()
@@ -58,8 +54,12 @@ async def take_pill(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResu
         yield event.plain_result("请指定要服用的丹药")
         return
     
-    # 解析物品名和数量
-    if "*" in pill_info:
+    # 解析物品名和数量：服用 丹药*数量 或 服用 丹药 数量
+    args = pill_info.split()
+    if len(args) >= 2 and args[-1].isdigit():
+        pill_name = "".join(args[:-1])
+        quantity = int(args[-1])
+    elif "*" in pill_info:
         pill_name, quantity_str = pill_info.split("*", 1)
         try:
             quantity = int(quantity_str)
@@ -78,49 +78,143 @@ async def take_pill(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResu
 async def alchemy(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
     """炼制物品"""
     user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
     
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
+        return
+    user = ctx.user
+    
+    # 解析命令：炼制 丹方名[*炉数] 或 炼制 丹方名 炉数，不带参数时列出可炼制的丹方
+    args = event.message_str.strip().split()[1:]
+    if not args:
+        craftable = plugin.alchemy_service.get_craftable(user_id, ctx.item_quantities())
+        if not craftable:
+            learned = plugin.alchemy_service.get_learned_recipes(user_id)
+            if not learned:
+                yield event.plain_result("你尚未学会任何丹方，请使用「学习」查看可学习的丹方")
+                return
+            recipe_info = "材料不足，暂时无法炼制。已学会的丹方：\n"
+            for recipe in learned:
+                recipe_info += f"{recipe.name}：{plugin.alchemy_service.describe(recipe)}\n"
+            yield event.plain_result(recipe_info)
+            return
+        
+        recipe_info = "=== 可炼制的丹方 ===\n"
+        for recipe, batches in craftable:
+            recipe_info += f"{recipe.name}：{plugin.alchemy_service.describe(recipe)}（最多 {batches} 炉）\n"
+        recipe_info += "使用「炼制 丹方名[*炉数]」开炉炼制"
+        yield event.plain_result(recipe_info)
         return
     
-    # 这里应该实现炼制逻辑，暂时简化处理
-    yield event.plain_result("炼制功能正在开发中...")
+    batches = 1
+    if len(args) >= 2 and args[-1].isdigit():
+        batches = int(args[-1])
+        args = args[:-1]
+    recipe_name = "".join(args)
+    if "*" in recipe_name:
+        recipe_name, batches_str = recipe_name.split("*", 1)
+        try:
+            batches = int(batches_str)
+        except ValueError:
+            yield event.plain_result("数量必须是数字")
+            return
+    
+    success, message = plugin.alchemy_service.craft(user, recipe_name, batches)
+    yield event.plain_result(message)
 
 
 async def learn(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
     """学习配方"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
+        return
+    user = ctx.user
+    
+    # 不带参数时列出尚未学会的丹方
+    recipe_name = event.message_str.strip()[2:].strip()
+    if not recipe_name:
+        recipes = plugin.alchemy_service.get_learnable_recipes(user)
+        if not recipes:
+            yield event.plain_result("你已学会所有丹方")
+            return
+        
+        recipe_info = "=== 可学习的丹方 ===\n"
+        for recipe in recipes:
+            recipe_info += f"{recipe.name}：{plugin.alchemy_service.describe(recipe)}"
+            if recipe.requirement:
+                recipe_info += f"（要求：{recipe.requirement}）"
+            recipe_info += "\n"
+        recipe_info += "使用「学习 丹方名」学习丹方"
+        yield event.plain_result(recipe_info)
         return
     
-    # 这里应该实现学习配方逻辑，暂时简化处理
-    yield event.plain_result("学习功能正在开发中...")
+    success, message = plugin.alchemy_service.learn(user, recipe_name)
+    yield event.plain_result(message)
 
 
 async def give_item(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
     """赠送物品"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
+        return
+    user = ctx.user
+    
+    # 解析命令：赠送 @道友 物品名[*数量] 或 赠送 道号 物品名[*数量]
+    message = event.message_str.strip()
+    if not message.startswith("赠送"):
+        yield event.plain_result("命令格式错误，请使用：赠送 @道友 <物品名>[*数量]")
+        return
+    
+    mentioned_ids = get_mentioned_user_ids(event)
+    args = message[2:].split()
+    if mentioned_ids:
+        # 部分平台会把@文本保留在消息中，需要去掉
+        args = [arg for arg in args if not arg.startswith("@")]
+        target_name = ""
+    elif len(args) >= 2:
+        target_name = args.pop(0)
+    else:
+        yield event.plain_result("命令格式错误，请使用：赠送 @道友 <物品名>[*数量]")
+        return
+    
+    if not args:
+        yield event.plain_result("请指定要赠送的物品")
+        return
+    
+    # 解析物品名和数量，可一次赠送多种：物品名[*数量] 物品名 数量 ...
+    stacks = []
+    for arg in args:
+        if arg.isdigit() and stacks and stacks[-1][2]:
+            # 紧跟在物品名后的数字是该物品的数量
+            stacks[-1] = (stacks[-1][0], int(arg), False)
+        elif "*" in arg:
+            item_name, quantity_str = arg.split("*", 1)
+            try:
+                stacks.append((item_name, int(quantity_str), False))
+            except ValueError:
+                yield event.plain_result("数量必须是数字")
+                return
+        else:
+            stacks.append((arg, 1, True))
+    
+    receiver_id, error = plugin.target_service.resolve(mentioned_ids, target_name)
+    if not receiver_id:
+        yield event.plain_result(error)
         return
     
-    # 这里应该实现赠送物品逻辑，暂时简化处理
-    yield event.plain_result("赠送功能正在开发中...")
\ No newline at end of file
+    success, message = plugin.inventory_service.give_items(
+        user, receiver_id, [(item_name, quantity) for item_name, quantity, _ in stacks]
+    )
+    yield event.plain_result(message)
\ No newline at end of file
@@ -0,0 +1,124 @@
+from typing import AsyncGenerator
+from astrbot.api.event import AstrMessageEvent, MessageEventResult as EventResult
+from ..core.services.market_service import BUY, SELL
+from .common import get_player_context, NO_TALENT_MESSAGE
+
+
+async def market(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """查看坊市行情"""
+    item_name = event.message_str.strip()[2:].strip()
+    
+    if not item_name:
+        quotes = plugin.market_service.get_quotes()
+        if not quotes:
+            yield event.plain_result("坊市冷清，暂无挂单\n使用「出售 物品名[*数量] 单价」或「求购 物品名[*数量] 单价」挂单")
+            return
+        
+        market_info = "=== 坊市行情 ===\n"
+        for name, best_bid, best_ask in quotes:
+            bid_text = f"{best_bid}" if best_bid is not None else "-"
+            ask_text = f"{best_ask}" if best_ask is not None else "-"
+            market_info += f"{name}：求购 {bid_text} / 出售 {ask_text} 灵石\n"
+        market_info += "使用「坊市 物品名」查看盘口"
+        yield event.plain_result(market_info)
+        return
+    
+    depth = plugin.market_service.get_depth(item_name)
+    if depth is None:
+        yield event.plain_result(f"未找到物品: {item_name}")
+        return
+    
+    bids, asks = depth
+    market_info = f"=== 坊市·{item_name} ===\n【出售】\n"
+    if asks:
+        for price, quantity in reversed(asks):
+            market_info += f"{price} 灵石 x{quantity}\n"
+    else:
+        market_info += "暂无\n"
+    market_info += "【求购】\n"
+    if bids:
+        for price, quantity in bids:
+            market_info += f"{price} 灵石 x{quantity}\n"
+    else:
+        market_info += "暂无\n"
+    
+    yield event.plain_result(market_info)
+
+
+async def sell_order(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """挂出卖单"""
+    async for r in _place_order(plugin, event, SELL):
+        yield r
+
+
+async def buy_order(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """挂出买单"""
+    async for r in _place_order(plugin, event, BUY):
+        yield r
+
+
+async def _place_order(plugin, event: AstrMessageEvent, side: str) -> AsyncGenerator[EventResult, None]:
+    
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
+    
+    # 检查是否已检测过灵根
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
+        return
+    user = ctx.user
+    
+    # 解析命令：出售/求购 物品名[*数量] 单价 或 出售/求购 物品名 数量 单价
+    command = "出售" if side == SELL else "求购"
+    usage = f"命令格式错误，请使用：{command} <物品名>[*数量] <单价>"
+    args = event.message_str.strip().split()[1:]
+    if len(args) < 2 or not args[-1].isdigit():
+        yield event.plain_result(usage)
+        return
+    
+    price = int(args[-1])
+    args = args[:-1]
+    quantity = 1
+    if len(args) >= 2 and args[-1].isdigit():
+        quantity = int(args[-1])
+        args = args[:-1]
+    item_name = "".join(args)
+    if "*" in item_name:
+        item_name, quantity_str = item_name.split("*", 1)
+        try:
+            quantity = int(quantity_str)
+        except ValueError:
+            yield event.plain_result("数量必须是数字")
+            return
+    
+    success, message = plugin.market_service.place_order(user, side, item_name, quantity, price)
+    yield event.plain_result(message)
+
+
+async def my_orders(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """查看我的挂单"""
+    orders = plugin.market_service.get_user_orders(event.get_sender_id())
+    if not orders:
+        yield event.plain_result("你目前没有挂单")
+        return
+    
+    order_info = "=== 我的挂单 ===\n"
+    for item_name, order in orders:
+        action = "出售" if order.side == SELL else "求购"
+        order_info += f"[{order.id}] {action} {item_name} x{order.remaining}，单价 {order.price} 灵石\n"
+    order_info += "使用「撤单 编号」撤销挂单"
+    yield event.plain_result(order_info)
+
+
+async def cancel_order(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """撤销挂单"""
+    # 获取本条指令的玩家上下文
+    user = get_player_context(plugin, event).user
+    
+    args = event.message_str.strip().split()[1:]
+    if not args or not args[0].isdigit():
+        yield event.plain_result("命令格式错误，请使用：撤单 <挂单编号>")
+        return
+    
+    success, message = plugin.market_service.cancel_order(user, int(args[0]))
+    yield event.plain_result(message)
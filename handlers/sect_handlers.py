@@ -1,20 +1,19 @@
 from typing import AsyncGenerator
 from astrbot.api.event import AstrMessageEvent, MessageEventResult as EventResult
 from astrbot.api import logger
+from .common import get_player_context, NO_TALENT_MESSAGE
 
 
 async def join_sect(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
     """加入宗门"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 解析宗门名称
     message = event.message_str.strip()
@@ -34,55 +33,83 @@ async def join_sect(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResu
 
 async def my_sect(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
     """查看宗门信息"""
-    user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
-    
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 检查是否有宗门
     if not user.sect_id:
         yield event.plain_result("你目前没有加入任何宗门")
         return
     
-    # 获取宗门信息
-    sect = plugin.sect_service.get_user_sect(user)
+    # 宗门信息已随用户一并查出
+    sect = ctx.sect
     if not sect:
         yield event.plain_result("宗门信息异常")
         return
     
-    # 获取用户在该宗门的贡献
-    contribution = plugin.sect_repo.get_user_contribution(user_id, sect.id)
-    contribution_value = contribution.contribution if contribution else 0
+    # 解析页码与排序方式：我的宗门 [页码] [贡献|修为]
+    page = 1
+    order_by = "contribution"
+    for arg in event.message_str.strip().split()[1:]:
+        if arg.isdigit():
+            page = int(arg)
+        elif arg in ("修为", "境界"):
+            order_by = "cultivation"
+    
+    # 可用贡献与库房均来自缓存（包含尚未结算的流水）
+    contribution_value = plugin.sect_service.get_contribution_balance(user.user_id, sect.id)
+    treasury = plugin.sect_service.get_treasury(sect.id)
+    
+    # 成员列表（分页，只查询当前页），成员数量与列表来自同一次统计
+    members, page, total_pages, member_count = plugin.sect_service.get_sect_members(sect.id, page, order_by)
+    order_name = "修为" if order_by == "cultivation" else "已结算贡献"
     
     # 构造宗门信息
     sect_info = f"=== 宗门信息 ===\n"
     sect_info += f"宗门名称：{sect.name}\n"
     sect_info += f"宗门描述：{sect.description}\n"
-    sect_info += f"成员数量：{sect.member_count}\n"
-    sect_info += f"宗门贡献：{int(contribution_value)}\n"
+    sect_info += f"成员数量：{member_count}\n"
+    sect_info += f"宗门库房：{int(treasury)}（含待结算）\n"
+    sect_info += f"你的可用贡献：{int(contribution_value)}（含待结算）\n"
     sect_info += f"你的职位：{user.sect_position}\n"
     
+    sect_info += f"\n=== 宗门成员（按{order_name}，第{page}/{total_pages}页）===\n"
+    start = (page - 1) * plugin.sect_service.MEMBERS_PER_PAGE
+    for i, member in enumerate(members, start + 1):
+        name = member.dao_name or member.nickname or member.user_id
+        value = member.cultivation if order_by == "cultivation" else member.contribution
+        sect_info += f"{i}. {name} [{member.sect_position or '弟子'}] {member.realm} - {order_name} {int(value)}\n"
+    if page < total_pages:
+        order_arg = " 修为" if order_by == "cultivation" else ""
+        sect_info += f"发送「我的宗门 {page + 1}{order_arg}」查看下一页\n"
+    
     yield event.plain_result(sect_info)
 
 
 async def betray_sect(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
     """叛出宗门"""
     user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
     
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 冷却中直接拒绝，无需读取数据库
+    can_betray, message = plugin.sect_service.check_betray_cooldown(user_id)
+    if not can_betray:
+        yield event.plain_result(message)
+        return
+    
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 叛出宗门
     success, message = plugin.sect_service.betray_sect(user)
@@ -92,15 +119,21 @@ async def betray_sect(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventRe
 async def sect_roll_call(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
     """宗门点卯"""
     user_id = event.get_sender_id()
-    nickname = event.get_sender_name()
     
-    # 获取用户
-    user = plugin.user_service.get_or_create_user(user_id, nickname)
+    # 今日已点卯直接拒绝，无需读取数据库
+    can_roll_call, message = plugin.sect_service.check_roll_call_cooldown(user_id)
+    if not can_roll_call:
+        yield event.plain_result(message)
+        return
+    
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
     
     # 检查是否已检测过灵根
-    if not user.talent:
-        yield event.plain_result("你尚未踏入修仙之路，请先使用「检测灵根」命令")
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
         return
+    user = ctx.user
     
     # 检查是否有宗门
     if not user.sect_id:
@@ -109,4 +142,67 @@ async def sect_roll_call(plugin, event: AstrMessageEvent) -> AsyncGenerator[Even
     
     # 宗门点卯
     success, message = plugin.sect_service.sect_roll_call(user)
+    yield event.plain_result(message)
+
+
+async def sect_shop(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """宗门商店"""
+    user_id = event.get_sender_id()
+    
+    # 获取本条指令的玩家上下文
+    user = get_player_context(plugin, event).user
+    
+    # 检查是否有宗门
+    if not user.sect_id:
+        yield event.plain_result("你目前没有加入任何宗门")
+        return
+    
+    shop_items = plugin.sect_service.get_shop_items()
+    if not shop_items:
+        yield event.plain_result("宗门商店暂无物品")
+        return
+    
+    balance = plugin.sect_service.get_contribution_balance(user_id, user.sect_id)
+    shop_info = "=== 宗门商店 ===\n"
+    for _, name, description, price in shop_items:
+        shop_info += f"{name} - {int(price)} 贡献"
+        if description:
+            shop_info += f"（{description}）"
+        shop_info += "\n"
+    shop_info += f"你的可用贡献：{int(balance)}\n"
+    shop_info += "使用「兑换 物品名[*数量]」兑换物品"
+    
+    yield event.plain_result(shop_info)
+
+
+async def exchange(plugin, event: AstrMessageEvent) -> AsyncGenerator[EventResult, None]:
+    """兑换宗门商店物品"""
+    # 获取本条指令的玩家上下文
+    ctx = get_player_context(plugin, event)
+    
+    # 检查是否已检测过灵根
+    if not ctx.has_talent:
+        yield event.plain_result(NO_TALENT_MESSAGE)
+        return
+    user = ctx.user
+    
+    # 解析物品名称与数量：兑换 物品[*数量] 或 兑换 物品 数量
+    args = event.message_str.strip().split()[1:]
+    if not args:
+        yield event.plain_result("请指定要兑换的物品，例如：兑换 聚气丹*2")
+        return
+    
+    quantity = 1
+    if len(args) > 1 and args[-1].isdigit():
+        quantity = int(args[-1])
+        args = args[:-1]
+    item_name = "".join(args)
+    if "*" in item_name:
+        item_name, count = item_name.rsplit("*", 1)
+        if not count.isdigit():
+            yield event.plain_result("兑换数量必须是正整数")
+            return
+        quantity = int(count)
+    
+    success, message = plugin.sect_service.exchange(user, item_name, quantity)
     yield event.plain_result(message)
\ No newline at end of file
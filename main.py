@@ -1,5 +1,7 @@
 import os
+import time
 import asyncio
+from functools import cached_property
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 
@@ -16,26 +18,47 @@ from .core.repositories.sqlite_item_repo import SqliteItemRepository
 from .core.repositories.sqlite_inventory_repo import SqliteInventoryRepository
 from .core.repositories.sqlite_sect_repo import SqliteSectRepository
 from .core.repositories.sqlite_log_repo import SqliteLogRepository
+from .core.repositories.sqlite_group_repo import SqliteGroupRepository
+from .core.repositories.sqlite_stats_repo import SqliteStatsRepository
+from .core.repositories.sqlite_cooldown_repo import SqliteCooldownRepository
+from .core.repositories.sqlite_recipe_repo import SqliteRecipeRepository
+from .core.repositories.sqlite_market_repo import SqliteMarketRepository
 
 from .core.services.data_setup_service import DataSetupService
 from .core.services.user_service import UserService
 from .core.services.cultivation_service import CultivationService
 from .core.services.inventory_service import InventoryService
+from .core.services.alchemy_service import AlchemyService
+from .core.services.market_service import MarketService
 from .core.services.sect_service import SectService
 from .core.services.arena_service import ArenaService # noqa: F401
-
-from .core.database.migration import run_migrations
+from .core.services.leaderboard_service import LeaderboardService
+from .core.services.stats_service import StatsService
+from .core.services.cooldown_service import CooldownService
+from .core.services.response_cache import ResponseCache
+from .core.services.target_service import TargetService
+from .core.services.matchmaking_service import MatchmakingService
+from .core.services.concurrency import UserLockStripes
+from .core.services.rate_limiter import RateLimiter
+from .core.services.card_renderer import CardRenderer
+from .core.services.metrics import Metrics
+from .core.services.backup_service import BackupService
+
+from .core.database.bootstrap import bootstrap_database
+from .core.database.migration import DataMigrationRunner
+from .core.database.profiling import SlowQueryLog, install_slow_query_log
 
 # ==========================================================
 # 导入指令函数
 # ==========================================================
-from .handlers import cultivation_handlers, sect_handlers, inventory_handlers, arena_handlers  # noqa: F401
+from .handlers import cultivation_handlers, sect_handlers, inventory_handlers, arena_handlers, market_handlers  # noqa: F401
 
 
 class XiuxianPlugin(Star):
     
     def __init__(self, context: Context, config: AstrBotConfig):
         super().__init__(context)
+        started = time.perf_counter()
         
         # 插件ID
         self.plugin_id = "astrbot_plugin_re_xiuxian"
@@ -54,15 +77,13 @@ class XiuxianPlugin(Star):
         os.makedirs(self.tmp_dir, exist_ok=True)
         
         db_path = os.path.join(self.data_dir, "re_xiuxian.db")
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
         # --- 配置 ---
         self.config = config
         
-        # 初始化数据库模式
-        plugin_root_dir = os.path.dirname(__file__)
-        migrations_path = os.path.join(plugin_root_dir, "core", "database", "migrations")
-        run_migrations(db_path, migrations_path)
+        # 慢查询日志，覆盖迁移与所有仓储的语句
+        self.slow_query_log = SlowQueryLog(self.config)
+        install_slow_query_log(self.slow_query_log)
         
         # --- 实例化仓储层 ---
         self.user_repo = SqliteUserRepository(db_path)
@@ -70,44 +91,140 @@ class XiuxianPlugin(Star):
         self.inventory_repo = SqliteInventoryRepository(db_path)
         self.sect_repo = SqliteSectRepository(db_path)
         self.log_repo = SqliteLogRepository(db_path)
+        self.group_repo = SqliteGroupRepository(db_path)
+        self.stats_repo = SqliteStatsRepository(db_path)
+        self.cooldown_repo = SqliteCooldownRepository(db_path)
+        self.recipe_repo = SqliteRecipeRepository(db_path)
+        self.market_repo = SqliteMarketRepository(db_path)
+        
+        # --- 初始化数据库：迁移与初始数据共用一个连接，已是最新时只需一次查询 ---
+        data_setup_service = DataSetupService(
+            self.item_repo, self.sect_repo, self.recipe_repo
+        )
+        migrations_path = os.path.join(os.path.dirname(__file__), "core", "database", "migrations")
+        bootstrap = bootstrap_database(
+            db_path, migrations_path, data_setup_service.seed_version(), data_setup_service.setup_initial_data
+        )
+        # 迁移中的大表数据回填由后台任务分批执行
+        self.data_migration_runner = DataMigrationRunner(db_path, migrations_path, self.config)
+        
+        # 数据库在线热备份
+        self.backup_service = BackupService(db_path, os.path.join(self.data_dir, "backups"), self.config)
+        
+        # 运行指标：仓储方法逐一计时
+        self.metrics = Metrics()
+        for repo in (self.user_repo, self.item_repo, self.inventory_repo, self.sect_repo, self.log_repo,
+                     self.group_repo, self.stats_repo, self.cooldown_repo, self.recipe_repo, self.market_repo):
+            self.metrics.instrument(repo)
         
         # --- 实例化服务层 ---
+        self.stats_service = StatsService(self.stats_repo, self.user_repo, self.config)
+        self.cooldown_service = CooldownService(self.cooldown_repo, self.config)
         self.user_service = UserService(self.user_repo, self.config)
         self.cultivation_service = CultivationService(
             self.user_repo, 
             self.inventory_repo, 
             self.log_repo, 
-            self.config
+            self.cooldown_service,
+            self.config,
+            self.stats_service
         )
         self.inventory_service = InventoryService(
             self.inventory_repo,
             self.user_repo,
             self.item_repo,
-            self.config
+            self.log_repo,
+            self.config,
+            self.stats_service
         )
         self.sect_service = SectService(
             self.sect_repo,
             self.user_repo,
             self.inventory_repo,
-            self.config
+            self.cooldown_service,
+            self.config,
+            self.stats_service
         )
         self.arena_service = ArenaService(
             self.user_repo,
             self.inventory_repo,
             self.log_repo,
-            self.config
+            self.cooldown_service,
+            self.config,
+            self.stats_service
         )
-        
-        # --- 初始化核心游戏数据 ---
-        data_setup_service = DataSetupService(
-            self.item_repo, self.sect_repo
+        self.leaderboard_service = LeaderboardService(
+            self.user_repo,
+            self.group_repo,
+            self.config
         )
-        data_setup_service.setup_initial_data()
+        self.response_cache = ResponseCache(self.config)
+        self.metrics.register_cache("排行榜渲染", self.response_cache.get_totals)
+        self.metrics.register_cache("图片卡片", self._card_cache_totals)
         
         # 添加一个任务列表来跟踪闭关用户
         self.cultivation_tasks = {}
         
-        logger.info("修仙插件初始化完成")
+        # 按用户分段的锁，同一用户的指令与定时任务串行执行
+        self.user_locks = UserLockStripes()
+        
+        # 指令限流
+        self.rate_limiter = RateLimiter(self.config)
+        
+        # 后台维护任务
+        self.background_tasks = []
+        
+        self.metrics.register_backlog("闭关定时任务", lambda: len(self.cultivation_tasks))
+        self.metrics.register_backlog("匹配队列", self._matchmaking_waiting_count)
+        self.metrics.register_backlog("事件循环任务", lambda: len(asyncio.all_tasks()))
+        self.metrics.register_backlog("数据迁移", self.data_migration_runner.get_remaining)
+        
+        # 启动耗时：数据库各阶段与插件初始化总计
+        phases = {f"数据库{name}": seconds for name, seconds in bootstrap.phases.items() if name != "总计"}
+        phases["总计"] = time.perf_counter() - started
+        self.metrics.record_startup(phases)
+        logger.info(f"修仙插件初始化完成，耗时 {phases['总计'] * 1000:.1f}ms，数据库{bootstrap.format()}")
+
+    # --- 非核心服务：首次使用时才创建，不占用插件加载时间 ---
+
+    @cached_property
+    def alchemy_service(self) -> AlchemyService:
+        """炼丹服务"""
+        return AlchemyService(self.recipe_repo, self.inventory_repo, self.item_repo, self.config)
+
+    @cached_property
+    def market_service(self) -> MarketService:
+        """坊市服务"""
+        return MarketService(self.market_repo, self.inventory_repo, self.item_repo, self.config)
+
+    @cached_property
+    def target_service(self) -> TargetService:
+        """斗法目标解析服务"""
+        return TargetService(self.user_repo)
+
+    @cached_property
+    def matchmaking_service(self) -> MatchmakingService:
+        """匹配斗法服务"""
+        return MatchmakingService(self.user_repo, self.arena_service, self.cooldown_service, self.config)
+
+    @cached_property
+    def card_renderer(self) -> CardRenderer:
+        """图片卡片渲染，创建时会扫描卡片缓存目录并查找字体"""
+        renderer = CardRenderer(os.path.join(self.tmp_dir, "cards"), self.config)
+        if renderer.enabled and not renderer.available:
+            logger.warning("未找到 Pillow 或中文字体，修仙档案与排行榜将以文字展示")
+        return renderer
+
+    def _card_cache_totals(self):
+        """图片卡片缓存的 (命中次数, 渲染次数)，尚未创建时为0"""
+        renderer = self.__dict__.get("card_renderer")
+        return (renderer.hit_count, renderer.render_count) if renderer else (0, 0)
+
+    def _matchmaking_waiting_count(self) -> int:
+        """等待匹配的人数，匹配服务尚未创建时为0"""
+        service = self.__dict__.get("matchmaking_service")
+        return service.get_waiting_count() if service else 0
+
 
     async def initialize(self):
         """插件初始化"""
@@ -124,6 +241,152 @@ class XiuxianPlugin(Star):
         
         # 启动时检查是否有正在进行的闭关
         await self._check_ongoing_cultivations()
+        
+        # 启动后台维护任务
+        self.background_tasks.append(asyncio.create_task(self._stats_expiry_loop()))
+        self.background_tasks.append(asyncio.create_task(self._metrics_report_loop()))
+        self.background_tasks.append(asyncio.create_task(self._matchmaking_loop()))
+        self.background_tasks.append(asyncio.create_task(self._sect_reconcile_loop()))
+        self.background_tasks.append(asyncio.create_task(self._sect_ledger_loop()))
+        self.background_tasks.append(asyncio.create_task(self._market_settle_loop()))
+        self.background_tasks.append(asyncio.create_task(self._data_migration_loop()))
+        self.background_tasks.append(asyncio.create_task(self._backup_loop()))
+
+    async def terminate(self):
+        """插件卸载时取消所有后台任务"""
+        for task in list(self.cultivation_tasks.values()) + self.background_tasks:
+            task.cancel()
+        self.cultivation_tasks.clear()
+        self.background_tasks.clear()
+        install_slow_query_log(None)
+
+    async def _metrics_report_loop(self):
+        """定期输出运行指标与渲染缓存命中率"""
+        interval = self.config.get("re_xiuxian", {}).get("metrics_report_interval", 600)
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                logger.info(f"修仙插件运行指标:\n{self.metrics.format_report()}")
+                slow_queries = self.slow_query_log.format_report()
+                if slow_queries:
+                    logger.info(f"数据库语句耗时排行:\n{slow_queries}")
+                stats = self.response_cache.format_stats()
+                if stats:
+                    logger.info(f"排行榜渲染缓存命中率:\n{stats}")
+            except Exception as e:
+                logger.error(f"输出运行指标时出错: {e}")
+
+    async def _stats_expiry_loop(self):
+        """定期清理过期的日榜/周榜统计桶"""
+        while True:
+            try:
+                # 每次只删除一个小时桶，删除之间让出事件循环，避免长时间占用数据库
+                while self.stats_service.expire_step():
+                    await asyncio.sleep(0.1)
+            except Exception as e:
+                logger.error(f"清理过期统计数据时出错: {e}")
+            await asyncio.sleep(3600)
+
+    async def _sect_ledger_loop(self):
+        """定期批量结算宗门贡献流水"""
+        interval = self.config.get("re_xiuxian", {}).get("sect_ledger_settle_interval", 60)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # 每批在一个事务中结算，批次之间让出事件循环
+                while self.sect_service.settle_step():
+                    await asyncio.sleep(0.1)
+                # 已结算且超过保留期的流水同样分批删除
+                while self.sect_service.prune_step():
+                    await asyncio.sleep(0.1)
+            except Exception as e:
+                logger.error(f"结算宗门贡献流水时出错: {e}")
+
+    async def _market_settle_loop(self):
+        """定期批量交割坊市成交"""
+        interval = self.config.get("re_xiuxian", {}).get("market_settle_interval", 5)
+        while True:
+            await asyncio.sleep(interval)
+            # 坊市服务按需创建，尚未有人使用坊市时不会产生新的成交
+            market_service = self.__dict__.get("market_service")
+            if market_service is None:
+                continue
+            try:
+                # 每批在一个事务中交割，批次之间让出事件循环
+                while market_service.settle_step():
+                    await asyncio.sleep(0.1)
+                # 已交割且超过保留期的成交记录同样分批删除
+                while market_service.prune_step():
+                    await asyncio.sleep(0.1)
+            except Exception as e:
+                logger.error(f"交割坊市成交时出错: {e}")
+
+    async def _data_migration_loop(self):
+        """分批执行迁移中的数据回填，完成后退出"""
+        try:
+            # 每批在一个短事务中执行，批次之间让出事件循环，指令不会被长时间阻塞
+            while self.data_migration_runner.step():
+                await asyncio.sleep(0.1)
+        except Exception as e:
+            logger.error(f"执行数据迁移时出错: {e}")
+
+    async def _backup_loop(self):
+        """定时备份数据库，上次备份已超过间隔时启动后立即备份"""
+        while True:
+            delay = self.backup_service.seconds_until_due()
+            if delay is None:
+                return
+            # 启动后稍等片刻再备份，避开插件加载时的集中读写
+            await asyncio.sleep(max(delay, 60))
+            try:
+                # 备份在线程中分步执行，不阻塞事件循环
+                await asyncio.to_thread(self.backup_service.backup)
+            except Exception as e:
+                logger.error(f"定时备份数据库时出错: {e}")
+
+    async def _sect_reconcile_loop(self):
+        """定期对账宗门成员数与总贡献"""
+        while True:
+            try:
+                # 分批对账，批次之间让出事件循环
+                while self.sect_service.reconcile_step():
+                    await asyncio.sleep(0.1)
+            except Exception as e:
+                logger.error(f"宗门对账时出错: {e}")
+            await asyncio.sleep(600)
+
+    async def _matchmaking_loop(self):
+        """定期为等待中的匹配斗法请求寻找对手"""
+        while True:
+            await asyncio.sleep(2)
+            # 匹配服务按需创建，尚未有人发起匹配时没有等待中的请求
+            matchmaking_service = self.__dict__.get("matchmaking_service")
+            if matchmaking_service is None:
+                continue
+            try:
+                matched, expired = matchmaking_service.match_waiting()
+                for attacker_id, opponent_id, unified_msg_origin in matched:
+                    async with self.user_locks.lock(attacker_id):
+                        attacker = self.user_repo.get_by_user_id(attacker_id)
+                        if not attacker:
+                            continue
+                        success, message = self.arena_service.battle(attacker, opponent_id)
+                    await self._send_notice(unified_msg_origin, message)
+                for user_id, unified_msg_origin in expired:
+                    await self._send_notice(unified_msg_origin, "未能匹配到实力相近的对手，请稍后再试")
+            except Exception as e:
+                logger.error(f"匹配斗法时出错: {e}")
+
+    async def _send_notice(self, unified_msg_origin: Optional[str], message: str):
+        """向会话发送主动消息"""
+        if not unified_msg_origin:
+            return
+        try:
+            await self.context.send_message(unified_msg_origin, MessageChain().message(message))
+        except Exception as e:
+            logger.error(f"发送主动消息失败: {e}")
 
     async def _check_ongoing_cultivations(self):
         """检查并恢复正在进行的闭关任务"""
@@ -137,19 +400,19 @@ class XiuxianPlugin(Star):
                     
                     if remaining_time <= 0:
                         # 闭关已完成，立即处理
-                        await self._complete_cultivation(user, user.user_id)
+                        await self._complete_cultivation(user.user_id)
                     else:
                         # 重新启动定时任务
-                        task = asyncio.create_task(self._cultivation_timer(user, remaining_time, user.user_id))
+                        task = asyncio.create_task(self._cultivation_timer(remaining_time, user.user_id))
                         self.cultivation_tasks[user.user_id] = task
         except Exception as e:
             logger.error(f"检查正在进行的闭关时出错: {e}")
 
-    async def _cultivation_timer(self, user: object, delay: float, user_id: str):
+    async def _cultivation_timer(self, delay: float, user_id: str):
         """闭关定时器"""
         try:
             await asyncio.sleep(delay)
-            await self._complete_cultivation(user, user_id)
+            await self._complete_cultivation(user_id)
         except asyncio.CancelledError:
             pass
         except Exception as e:
@@ -159,11 +422,17 @@ class XiuxianPlugin(Star):
             if user_id in self.cultivation_tasks:
                 del self.cultivation_tasks[user_id]
 
-    async def _complete_cultivation(self, user: object, user_id: str):
+    async def _complete_cultivation(self, user_id: str):
         """完成闭关修炼并发送消息"""
         try:
-            # 调用服务完成闭关
-            success, message = self.cultivation_service._complete_closing_door_cultivation(user)
+            async with self.user_locks.lock(user_id):
+                # 闭关期间用户数据可能已被斗法等操作修改，完成时重新加载
+                user = self.user_repo.get_by_user_id(user_id)
+                if not user or not user.is_in_closing:
+                    return
+                
+                # 调用服务完成闭关
+                success, message = self.cultivation_service._complete_closing_door_cultivation(user)
             
             # 发送通知消息给用户
             if success and user.unified_msg_origin:
@@ -178,54 +447,91 @@ class XiuxianPlugin(Star):
         except Exception as e:
             logger.error(f"完成闭关时出错: {e}")
 
+    async def _dispatch(self, event: AstrMessageEvent, handler):
+        """统一的指令分发入口"""
+        # 限流在最前面，被拒绝的指令不产生任何数据库读写
+        allowed, notify = self.rate_limiter.acquire(event.get_sender_id(), event.get_group_id())
+        if not allowed:
+            if notify:
+                yield event.plain_result("道友操作过于频繁，请稍后再试")
+            return
+        
+        # 记录指令耗时（含等待用户锁），不计入消息发送等 yield 之后的时间
+        start = time.perf_counter()
+        suspended = 0.0
+        failed = False
+        try:
+            # 同一用户的指令串行执行，不同用户并行
+            async with self.user_locks.lock(event.get_sender_id()):
+                async for r in handler(self, event):
+                    paused = time.perf_counter()
+                    yield r
+                    suspended += time.perf_counter() - paused
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.metrics.observe_command(handler.__name__, time.perf_counter() - start - suspended, failed)
+        # 指令执行后再记录群活跃：首次检测灵根的用户此时已写入，能进入常驻的群榜单
+        self._record_group_activity(event)
+
+    def _record_group_activity(self, event: AstrMessageEvent):
+        """记录用户在群内的活跃，用于群修为榜"""
+        if not event.get_group_id():
+            return
+        try:
+            self.leaderboard_service.record_activity(event.unified_msg_origin, event.get_sender_id())
+        except Exception as e:
+            logger.error(f"记录群活跃时出错: {e}")
+
     # =========== 修仙基础命令 ==========
 
     @filter.command("检测灵根")
     async def detect_talent(self, event: AstrMessageEvent):
         """开启修仙之路的唯一方式"""
-        async for r in cultivation_handlers.detect_talent(self, event):
+        async for r in self._dispatch(event, cultivation_handlers.detect_talent):
             yield r
 
     @filter.command("我的灵根")
     async def my_talent(self, event: AstrMessageEvent):
         """查看自己的修仙档案"""
-        async for r in cultivation_handlers.my_talent(self, event):
+        async for r in self._dispatch(event, cultivation_handlers.my_talent):
             yield r
 
     @filter.command("闭关修炼")
     async def closed_door_cultivation(self, event: AstrMessageEvent):
         """主动进行修炼，获取修为"""
-        async for r in cultivation_handlers.closed_door_cultivation(self, event):
+        async for r in self._dispatch(event, cultivation_handlers.closed_door_cultivation):
             yield r
 
     @filter.command("深度闭关")
     async def deep_closed_door(self, event: AstrMessageEvent):
         """开启自动挂机修炼"""
-        async for r in cultivation_handlers.deep_closed_door(self, event):
+        async for r in self._dispatch(event, cultivation_handlers.deep_closed_door):
             yield r
 
     @filter.command("查看闭关")
     async def check_deep_cultivation(self, event: AstrMessageEvent):
         """查看深度闭关剩余时间"""
-        async for r in cultivation_handlers.check_deep_cultivation(self, event):
+        async for r in self._dispatch(event, cultivation_handlers.check_deep_cultivation):
             yield r
 
     @filter.command("强行出关")
     async def force_exit_cultivation(self, event: AstrMessageEvent):
         """提前结束深度闭关"""
-        async for r in cultivation_handlers.force_exit_cultivation(self, event):
+        async for r in self._dispatch(event, cultivation_handlers.force_exit_cultivation):
             yield r
 
     @filter.command("避世")
     async def hermit_mode(self, event: AstrMessageEvent):
         """开启和平模式"""
-        async for r in cultivation_handlers.hermit_mode(self, event):
+        async for r in self._dispatch(event, cultivation_handlers.hermit_mode):
             yield r
 
     @filter.command("入世")
     async def return_world(self, event: AstrMessageEvent):
         """关闭和平模式"""
-        async for r in cultivation_handlers.return_world(self, event):
+        async for r in self._dispatch(event, cultivation_handlers.return_world):
             yield r
 
     # =========== 宗门命令 ==========
@@ -233,25 +539,37 @@ class XiuxianPlugin(Star):
     @filter.command("拜入宗门")
     async def join_sect(self, event: AstrMessageEvent):
         """尝试加入一个宗门"""
-        async for r in sect_handlers.join_sect(self, event):
+        async for r in self._dispatch(event, sect_handlers.join_sect):
             yield r
 
     @filter.command("我的宗门")
     async def my_sect(self, event: AstrMessageEvent):
         """查看当前所属宗门信息"""
-        async for r in sect_handlers.my_sect(self, event):
+        async for r in self._dispatch(event, sect_handlers.my_sect):
             yield r
 
     @filter.command("叛出宗门")
     async def betray_sect(self, event: AstrMessageEvent):
         """脱离当前宗门"""
-        async for r in sect_handlers.betray_sect(self, event):
+        async for r in self._dispatch(event, sect_handlers.betray_sect):
             yield r
 
     @filter.command("宗门点卯")
     async def sect_roll_call(self, event: AstrMessageEvent):
         """每日点卯领取贡献"""
-        async for r in sect_handlers.sect_roll_call(self, event):
+        async for r in self._dispatch(event, sect_handlers.sect_roll_call):
+            yield r
+
+    @filter.command("宗门商店")
+    async def sect_shop(self, event: AstrMessageEvent):
+        """查看宗门贡献商店"""
+        async for r in self._dispatch(event, sect_handlers.sect_shop):
+            yield r
+
+    @filter.command("兑换")
+    async def exchange(self, event: AstrMessageEvent):
+        """使用宗门贡献兑换物品"""
+        async for r in self._dispatch(event, sect_handlers.exchange):
             yield r
 
     # =========== 背包与物品命令 ==========
@@ -259,31 +577,63 @@ class XiuxianPlugin(Star):
     @filter.command("储物袋")
     async def inventory(self, event: AstrMessageEvent):
         """查看拥有的所有物品"""
-        async for r in inventory_handlers.inventory(self, event):
+        async for r in self._dispatch(event, inventory_handlers.inventory):
             yield r
 
     @filter.command("服用")
     async def take_pill(self, event: AstrMessageEvent):
         """使用储物袋中的丹药"""
-        async for r in inventory_handlers.take_pill(self, event):
+        async for r in self._dispatch(event, inventory_handlers.take_pill):
             yield r
 
     @filter.command("炼制")
     async def alchemy(self, event: AstrMessageEvent):
         """炼制已学会的丹药或法宝"""
-        async for r in inventory_handlers.alchemy(self, event):
+        async for r in self._dispatch(event, inventory_handlers.alchemy):
             yield r
 
     @filter.command("学习")
     async def learn(self, event: AstrMessageEvent):
-        """学习配方"""
-        async for r in inventory_handlers.learn(self, event):
+        """学习丹方"""
+        async for r in self._dispatch(event, inventory_handlers.learn):
             yield r
 
     @filter.command("赠送")
     async def give_item(self, event: AstrMessageEvent):
         """将物品赠送给其他道友"""
-        async for r in inventory_handlers.give_item(self, event):
+        async for r in self._dispatch(event, inventory_handlers.give_item):
+            yield r
+
+    # =========== 坊市命令 ==========
+
+    @filter.command("坊市")
+    async def market(self, event: AstrMessageEvent):
+        """查看坊市行情与盘口"""
+        async for r in self._dispatch(event, market_handlers.market):
+            yield r
+
+    @filter.command("出售")
+    async def sell_order(self, event: AstrMessageEvent):
+        """在坊市挂出卖单"""
+        async for r in self._dispatch(event, market_handlers.sell_order):
+            yield r
+
+    @filter.command("求购")
+    async def buy_order(self, event: AstrMessageEvent):
+        """在坊市挂出买单"""
+        async for r in self._dispatch(event, market_handlers.buy_order):
+            yield r
+
+    @filter.command("我的挂单")
+    async def my_orders(self, event: AstrMessageEvent):
+        """查看自己在坊市的挂单"""
+        async for r in self._dispatch(event, market_handlers.my_orders):
+            yield r
+
+    @filter.command("撤单")
+    async def cancel_order(self, event: AstrMessageEvent):
+        """撤销坊市挂单"""
+        async for r in self._dispatch(event, market_handlers.cancel_order):
             yield r
 
     # =========== 斗法命令 ==========
@@ -291,17 +641,64 @@ class XiuxianPlugin(Star):
     @filter.command("斗法")
     async def battle(self, event: AstrMessageEvent):
         """与其他修士斗法"""
-        async for r in arena_handlers.battle(self, event):
+        async for r in self._dispatch(event, arena_handlers.battle):
+            yield r
+
+    @filter.command("匹配斗法")
+    async def match_battle(self, event: AstrMessageEvent):
+        """自动匹配实力相近的对手斗法"""
+        async for r in self._dispatch(event, arena_handlers.match_battle):
             yield r
 
     @filter.command("修为榜")
     async def cultivation_ranking(self, event: AstrMessageEvent):
         """查看修为排行榜"""
-        async for r in arena_handlers.cultivation_ranking(self, event):
+        async for r in self._dispatch(event, arena_handlers.cultivation_ranking):
+            yield r
+
+    @filter.command("总修为榜")
+    async def global_cultivation_ranking(self, event: AstrMessageEvent):
+        """查看全服修为排行榜"""
+        async for r in self._dispatch(event, arena_handlers.global_cultivation_ranking):
+            yield r
+
+    @filter.command("日榜")
+    async def daily_ranking(self, event: AstrMessageEvent):
+        """查看近24小时排行榜"""
+        async for r in self._dispatch(event, arena_handlers.daily_ranking):
+            yield r
+
+    @filter.command("周榜")
+    async def weekly_ranking(self, event: AstrMessageEvent):
+        """查看近7天排行榜"""
+        async for r in self._dispatch(event, arena_handlers.weekly_ranking):
             yield r
 
     @filter.command("恶人榜")
     async def evil_ranking(self, event: AstrMessageEvent):
         """查看恶人排行榜"""
-        async for r in arena_handlers.evil_ranking(self, event):
-            yield r
\ No newline at end of file
+        async for r in self._dispatch(event, arena_handlers.evil_ranking):
+            yield r
+
+    # =========== 管理命令 ==========
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("修仙状态")
+    async def plugin_status(self, event: AstrMessageEvent):
+        """查看插件运行指标（管理员）"""
+        yield event.plain_result(f"=== 修仙状态 ===\n{self.metrics.format_report()}")
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("慢查询")
+    async def slow_queries(self, event: AstrMessageEvent):
+        """查看数据库语句耗时排行（管理员）"""
+        report = self.slow_query_log.format_report() or "暂无数据"
+        yield event.plain_result(f"=== 数据库语句耗时排行 ===\n{report}")
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("备份数据")
+    async def backup_now(self, event: AstrMessageEvent):
+        """立即备份数据库（管理员）"""
+        yield event.plain_result("开始备份数据库，完成后将返回结果")
+        success, message = await asyncio.to_thread(self.backup_service.backup)
+        yield event.plain_result(message)